@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Depends
+from app.services.supabase_client import get_supabase
+from app.services.repository import Repository
+
+router = APIRouter()
+
+@router.get("/test-supabase")
+async def check_supabase(supabase: Repository = Depends(get_supabase)):
+    # On récupère les 5 premiers cours pour le test
+    response = await supabase.table("courses").select("*").limit(5).execute()
+    return response.data
\ No newline at end of file
@@ -1,102 +1,154 @@
-from fastapi import APIRouter, HTTPException, Body, Header, status, Depends, Request
+from fastapi import APIRouter, HTTPException, Body, status, Depends, Request, Query, Response
 from app.services.supabase_client import get_supabase
+from app.services.repository import Repository
+from app.services.auth import get_current_teacher, get_optional_user
+from app.services.http_cache import catalog_response
+from app.services.fields import FIELDS_DESCRIPTION, project_rows, projection_responses, select_columns
+from app.services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, apply_keyset, paginate
+from app.services.cache import catalog_cache, invalidate_rows, row_tag, scope_tag
+from app.services.course_tree import load_course_tree
+from app.services.gradebook import get_gradebook
 from app.schemas.course import CourseCreate
 from typing import Optional
 
 router = APIRouter()
 
-# Dépendance d'authentification simulée
-TEACHER_TOKEN = "secret-teacher-token"
-def get_current_teacher(request: Request):
-    auth = request.headers.get("authorization")
-    if not auth or not auth.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Authorization header missing or invalid")
-    token = auth.split(" ", 1)[1]
-    if token != TEACHER_TOKEN:
-        raise HTTPException(status_code=403, detail="Not authorized as teacher")
-    return {"role": "teacher"}
+COURSE_KEYS = (("order_index", False), ("id", False))
 
-@router.get("/courses", tags=["Courses"])
-def list_courses(limit: int = 20, offset: int = 0):
-    supabase = get_supabase()
-    # On filtre pour ne pas retourner les cours masqués et on trie par order_index
-    response = (
-        supabase
-        .table("courses")
-        .select("*")
-        .eq("is_hidden", False)
-        .order("order_index", desc=False)
-        .range(offset, offset + limit - 1)
-        .execute()
-    )
+@router.get("/courses", responses=projection_responses("courses", many=True), tags=["Courses"])
+async def list_courses(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    offset: int = Query(0, ge=0, deprecated=True),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    supabase: Repository = Depends(get_supabase)
+):
+    # On filtre pour ne pas retourner les cours masqués et on trie par (order_index, id)
+    # Page suivante : GET /courses?cursor=<valeur de l'en-tête X-Next-Cursor>
+    # fields=summary pour les cartes de cours : seules ces colonnes sont lues et envoyées
+    columns = select_columns("courses", fields, required=[key for key, _ in COURSE_KEYS])
+    query = supabase.table("courses").select(columns).eq("is_hidden", False)
+    query = apply_keyset(query, COURSE_KEYS, cursor, limit)
+    if offset and not cursor:
+        query = query.range(offset, offset + limit)
+    response = await catalog_cache.execute(query, tags=[scope_tag("courses")])
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
-    return response.data
+    rows, next_cursor = paginate(response.data, COURSE_KEYS, limit)
+    return catalog_response(request, project_rows("courses", fields, rows), {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
 
-@router.get("/courses/{course_id}", tags=["Courses"])
-def get_course(course_id: str):
-    supabase = get_supabase()
-    response = supabase.table("courses").select("*").eq("id", course_id).single().execute()
+@router.get("/courses/{course_id}", responses=projection_responses("courses"), tags=["Courses"])
+async def get_course(request: Request, course_id: str, fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION), supabase: Repository = Depends(get_supabase)):
+    columns = select_columns("courses", fields)
+    response = await catalog_cache.execute(supabase.table("courses").select(columns).eq("id", course_id).single())
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
     if not response.data:
         raise HTTPException(status_code=404, detail="Course not found")
-    return response.data
+    return catalog_response(request, project_rows("courses", fields, response.data), precompress_tag=row_tag("courses", course_id))
+
+@router.get("/courses/{course_id}/tree", tags=["Courses"])
+async def get_course_tree(
+    request: Request,
+    course_id: str,
+    fields: str = Query("summary", pattern="^(summary|full)$"),
+    progress: bool = False,
+    user=Depends(get_optional_user),
+    supabase: Repository = Depends(get_supabase)
+):
+    """
+    Cours complet en un seul appel : leçons ordonnées avec leurs exercices, tests et projets publiés.
+    - **fields**: `summary` (défaut, sans contenu des leçons ni modèles VBA) ou `full`
+    - **progress**: ajoute la progression de l'utilisateur connecté (leçons terminées)
+    """
+    if progress and user is None:
+        raise HTTPException(status_code=401, detail="Authentification requise pour la progression")
+    try:
+        tree = await load_course_tree(supabase, course_id, fields, user["user_id"] if progress else None)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+    if tree is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    if progress:
+        # Réponse propre à l'utilisateur : pas de cache partagé
+        return tree
+    return catalog_response(request, tree)
+
+@router.get("/courses/{course_id}/gradebook", tags=["Courses"])
+async def get_course_gradebook(
+    course_id: str,
+    rule: str = Query("best", pattern="^(best|latest)$"),
+    teacher=Depends(get_current_teacher),
+    supabase: Repository = Depends(get_supabase)
+):
+    """
+    Carnet de notes : élèves x exercices puis tests, avec moyenne, médiane, percentiles et taux de complétion par élément.
+    - **rule**: `best` (meilleure tentative notée, défaut) ou `latest` (dernière tentative notée)
+    """
+    try:
+        body = await get_gradebook(supabase, course_id, rule)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+    if body is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    # Corps déjà sérialisé et mis en cache : pas de réencodage par FastAPI
+    return Response(content=body, media_type="application/json", headers={"Cache-Control": "private, no-cache"})
 
 @router.post("/courses", status_code=status.HTTP_201_CREATED, tags=["Courses"])
-def create_course(
+async def create_course(
     course: CourseCreate,
-    teacher_id: Optional[str] = Header(None)
+    teacher=Depends(get_current_teacher),
+    supabase: Repository = Depends(get_supabase)
 ):
-    supabase = get_supabase()
-    tid = teacher_id or course.teacher_id
-    if not tid:
-        raise HTTPException(status_code=400, detail="teacher_id requis (header ou body)")
     data = course.dict()
-    data["teacher_id"] = tid
-    response = supabase.table("courses").insert(data).execute()
+    # L'enseignant est celui du jeton vérifié, pas un en-tête fourni par le client
+    data["teacher_id"] = teacher["user_id"]
+    response = await supabase.table("courses").insert(data).execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
     if not response.data:
         raise HTTPException(status_code=500, detail="Erreur lors de la création du cours")
+    invalidate_rows("courses", response.data, "all")
     return response.data[0]
 
 @router.delete("/courses/{course_id}", tags=["Courses"])
-def delete_course(course_id: str, teacher=Depends(get_current_teacher)):
-    supabase = get_supabase()
+async def delete_course(course_id: str, teacher=Depends(get_current_teacher), supabase: Repository = Depends(get_supabase)):
     # On met à jour le champ is_hidden à True
-    response = supabase.table("courses").update({"is_hidden": True}).eq("id", course_id).execute()
+    response = await supabase.table("courses").update({"is_hidden": True}).eq("id", course_id).execute()
     # Gestion d'erreur basique
     error = getattr(response, "error", None)
     if error:
         raise HTTPException(status_code=500, detail=str(error))
     if not response.data:
         raise HTTPException(status_code=404, detail="Erreur lors de la suppression (hide) du cours")
+    invalidate_rows("courses", response.data)
     return {"success": True, "course": response.data[0]}
 
 @router.patch("/courses/{course_id}/restore", tags=["Courses"])
-def restore_course(course_id: str, teacher=Depends(get_current_teacher)):
-    supabase = get_supabase()
+async def restore_course(course_id: str, teacher=Depends(get_current_teacher), supabase: Repository = Depends(get_supabase)):
     # On remet le champ is_hidden à False
-    response = supabase.table("courses").update({"is_hidden": False}).eq("id", course_id).execute()
+    response = await supabase.table("courses").update({"is_hidden": False}).eq("id", course_id).execute()
     error = getattr(response, "error", None)
     if error:
         raise HTTPException(status_code=500, detail=str(error))
     if not response.data:
         raise HTTPException(status_code=404, detail="Erreur lors de la restauration du cours")
+    invalidate_rows("courses", response.data, "all")
     return {"success": True, "course": response.data[0]}
 
 @router.patch("/courses/{course_id}", tags=["Courses"])
-def update_course(
+async def update_course(
     course_id: str,
     course: CourseCreate,
-    teacher=Depends(get_current_teacher)
+    teacher=Depends(get_current_teacher),
+    supabase: Repository = Depends(get_supabase)
 ):
-    supabase = get_supabase()
     data = course.dict(exclude_unset=True)
-    response = supabase.table("courses").update(data).eq("id", course_id).execute()
+    response = await supabase.table("courses").update(data).eq("id", course_id).execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
     if not response.data:
         raise HTTPException(status_code=404, detail="Course not found or not updated")
+    invalidate_rows("courses", response.data, "all")
     return response.data[0]
\ No newline at end of file
@@ -1,29 +1,41 @@
-from fastapi import APIRouter, Depends
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi import APIRouter, Depends, HTTPException
+from app.services.supabase_client import get_supabase
+from app.services.repository import Repository
+from app.services.auth import get_current_user
+from app.services.dashboard_summary import course_progress, summary_store, upcoming_deadlines
 from typing import Dict, Any
 
 router = APIRouter()
 
-security = HTTPBearer()
-
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    return {"user_id": credentials.credentials}
-
 @router.get("/dashboard/overview", tags=["Dashboard"])
-def dashboard_overview(user=Depends(get_current_user)) -> Dict[str, Any]:
-    # Simulé, à remplacer par la vraie logique
+async def dashboard_overview(user=Depends(get_current_user), supabase: Repository = Depends(get_supabase)) -> Dict[str, Any]:
+    # Lecture du résumé maintenu à chaque écriture (reconstruit seulement s'il est absent ou expiré)
+    try:
+        summary = await summary_store.get(supabase, user["user_id"])
+        completed, total = await course_progress(supabase, summary)
+        deadlines = await upcoming_deadlines(supabase, summary)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+    progress = round(100 * completed / total) if total else 0
     return {
-        "progress": 75,
-        "average_score": 88,
-        "deadlines": ["2024-07-01", "2024-07-15"]
+        "progress": min(progress, 100),
+        "average_score": summary.average_score,
+        "deadlines": deadlines
     }
 
 @router.get("/dashboard/activity", tags=["Dashboard"])
-def dashboard_activity(user=Depends(get_current_user)) -> Dict[str, Any]:
-    # Simulé, à remplacer par la vraie logique
-    return {
-        "recent_submissions": [
-            {"id": "sub1", "date": "2024-06-01"},
-            {"id": "sub2", "date": "2024-06-02"}
-        ]
-    }
\ No newline at end of file
+async def dashboard_activity(user=Depends(get_current_user), supabase: Repository = Depends(get_supabase)) -> Dict[str, Any]:
+    try:
+        summary = await summary_store.get(supabase, user["user_id"])
+    except RuntimeError as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+    return {"recent_submissions": summary.recent_activity()}
+
+@router.post("/dashboard/rebuild", tags=["Dashboard"])
+async def dashboard_rebuild(user=Depends(get_current_user), supabase: Repository = Depends(get_supabase)) -> Dict[str, Any]:
+    # Réparation : recalcule entièrement le résumé depuis les tables
+    try:
+        summary = await summary_store.rebuild(supabase, user["user_id"])
+    except RuntimeError as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+    return {"success": True, "completed_lessons": len(summary.completed_lessons), "average_score": summary.average_score}
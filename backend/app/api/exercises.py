@@ -1,116 +1,153 @@
-from fastapi import APIRouter, HTTPException, Header, status, Depends, Request, Query
+from fastapi import APIRouter, HTTPException, Header, status, Depends, Request, Query, Response
 from app.services.supabase_client import get_supabase
+from app.services.repository import Repository
+from app.services.auth import get_current_teacher
+from app.services.http_cache import catalog_response
+from app.services.fields import FIELDS_DESCRIPTION, project_rows, projection_responses, select_columns
+from app.services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, apply_keyset, paginate
+from app.services.cache import catalog_cache, invalidate_rows, row_tag, scope_tag
+from app.services.course_stats import mark_course_dirty
+from app.services.bulk import BULK_MAX_ITEMS, bulk_insert, created_rows
 from app.schemas.exercise import ExerciseCreate
-from typing import Optional
+from app.schemas.bulk import BulkResult
+from typing import List, Optional
 
 router = APIRouter()
 
-TEACHER_TOKEN = "secret-teacher-token"
-def get_current_teacher(request: Request):
-    auth = request.headers.get("authorization")
-    if not auth or not auth.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Authorization header missing or invalid")
-    token = auth.split(" ", 1)[1]
-    if token != TEACHER_TOKEN:
-        raise HTTPException(status_code=403, detail="Not authorized as teacher")
-    return {"role": "teacher"}
+EXERCISE_KEYS = (("created_at", False), ("id", False))
 
 @router.post("/exercises", status_code=status.HTTP_201_CREATED, tags=["Exercises"])
-def create_exercise(
+async def create_exercise(
     exercise: ExerciseCreate,
-    teacher=Depends(get_current_teacher)
+    teacher=Depends(get_current_teacher),
+    supabase: Repository = Depends(get_supabase)
 ):
-    supabase = get_supabase()
     data = exercise.dict()
-    response = supabase.table("exercises").insert(data).execute()
+    response = await supabase.table("exercises").insert(data).execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
     if not response.data:
         raise HTTPException(status_code=500, detail="Erreur lors de la création de l'exercice")
+    invalidate_rows("exercises", response.data, data["course_id"], "all")
+    mark_course_dirty(*(row.get("course_id") for row in response.data))
     return response.data[0]
 
-@router.get("/exercises", tags=["Exercises"])
-def list_exercises(
-    limit: int = Query(20, ge=1, le=100),
-    offset: int = Query(0, ge=0),
+@router.post("/exercises/bulk", status_code=status.HTTP_201_CREATED, response_model=BulkResult, tags=["Exercises"])
+async def create_exercises_bulk(
+    exercises: List[ExerciseCreate],
+    http_response: Response,
+    teacher=Depends(get_current_teacher),
+    supabase: Repository = Depends(get_supabase)
+):
+    # Lot validé en entier par Pydantic, inséré par paquets ; 207 si certains éléments ont échoué
+    if len(exercises) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"{BULK_MAX_ITEMS} exercices maximum par lot")
+    result = await bulk_insert(supabase, "exercises", [exercise.dict() for exercise in exercises])
+    rows = created_rows(result)
+    course_ids = {row.get("course_id") for row in rows}
+    invalidate_rows("exercises", rows, *course_ids, "all")
+    mark_course_dirty(*course_ids)
+    if result["failed"]:
+        http_response.status_code = status.HTTP_207_MULTI_STATUS
+    return result
+
+@router.get("/exercises", responses=projection_responses("exercises", many=True), tags=["Exercises"])
+async def list_exercises(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    offset: int = Query(0, ge=0, deprecated=True),
     course_id: Optional[str] = None,
-    type: Optional[str] = None
+    type: Optional[str] = None,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    supabase: Repository = Depends(get_supabase)
 ):
     """
     Récupère la liste des exercices (non masqués).
     - **limit**: nombre maximum d'exercices à retourner (défaut: 20)
-    - **offset**: décalage pour la pagination (défaut: 0)
+    - **cursor**: curseur de la page suivante (en-tête X-Next-Cursor de la réponse précédente)
+    - **offset**: (déprécié) décalage pour la pagination, préférer **cursor**
     - **course_id**: (optionnel) filtre pour retourner uniquement les exercices d'un cours donné (recommandé pour obtenir tous les exercices d'un cours)
     - **type**: (optionnel) filtre par type d'exercice
+    - **fields**: (optionnel) `summary` pour les cartes (sans modèle VBA, cas de test ni indices), `full`, ou liste de colonnes
     
     Exemple d'usage RESTful recommandé pour obtenir tous les exercices d'un cours :
     GET /exercises?course_id=ID_DU_COURS
     """
-    supabase = get_supabase()
-    query = supabase.table("exercises").select("*").eq("is_hidden", False)
+    columns = select_columns("exercises", fields, required=[key for key, _ in EXERCISE_KEYS])
+    query = supabase.table("exercises").select(columns).eq("is_hidden", False)
     if course_id:
         query = query.eq("course_id", course_id)
     if type:
         query = query.eq("type", type)
-    response = query.range(offset, offset + limit - 1).execute()
+    query = apply_keyset(query, EXERCISE_KEYS, cursor, limit)
+    if offset and not cursor:
+        query = query.range(offset, offset + limit)
+    scope = scope_tag("exercises", course_id or "all")
+    response = await catalog_cache.execute(query, tags=[scope])
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
-    return response.data
+    rows, next_cursor = paginate(response.data, EXERCISE_KEYS, limit)
+    return catalog_response(request, project_rows("exercises", fields, rows), {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
 
-@router.get("/exercises/{exercise_id}", tags=["Exercises"])
-def get_exercise(exercise_id: str):
-    supabase = get_supabase()
-    response = supabase.table("exercises").select("*").eq("id", exercise_id).single().execute()
+@router.get("/exercises/{exercise_id}", responses=projection_responses("exercises"), tags=["Exercises"])
+async def get_exercise(request: Request, exercise_id: str, fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION), supabase: Repository = Depends(get_supabase)):
+    columns = select_columns("exercises", fields)
+    response = await catalog_cache.execute(supabase.table("exercises").select(columns).eq("id", exercise_id).single())
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
     if not response.data:
         raise HTTPException(status_code=404, detail="Exercise not found")
-    return response.data
+    return catalog_response(request, project_rows("exercises", fields, response.data), precompress_tag=row_tag("exercises", exercise_id))
 
 @router.patch("/exercises/{exercise_id}", tags=["Exercises"])
-def update_exercise(
+async def update_exercise(
     exercise_id: str,
     exercise: ExerciseCreate,
-    teacher=Depends(get_current_teacher)
+    teacher=Depends(get_current_teacher),
+    supabase: Repository = Depends(get_supabase)
 ):
-    supabase = get_supabase()
     data = exercise.dict(exclude_unset=True)
-    response = supabase.table("exercises").update(data).eq("id", exercise_id).execute()
+    response = await supabase.table("exercises").update(data).eq("id", exercise_id).execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
     if not response.data:
         raise HTTPException(status_code=404, detail="Exercise not found or not updated")
+    invalidate_rows("exercises", response.data, *{row.get("course_id") for row in response.data}, "all")
+    mark_course_dirty(*(row.get("course_id") for row in response.data))
     return response.data[0]
 
 @router.delete("/exercises/{exercise_id}", tags=["Exercises"])
-def delete_exercise(exercise_id: str, teacher=Depends(get_current_teacher)):
-    supabase = get_supabase()
-    response = supabase.table("exercises").update({"is_hidden": True}).eq("id", exercise_id).execute()
+async def delete_exercise(exercise_id: str, teacher=Depends(get_current_teacher), supabase: Repository = Depends(get_supabase)):
+    response = await supabase.table("exercises").update({"is_hidden": True}).eq("id", exercise_id).execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
     if not response.data:
         raise HTTPException(status_code=404, detail="Exercise not found or not deleted")
+    invalidate_rows("exercises", response.data)
+    mark_course_dirty(*(row.get("course_id") for row in response.data))
     return {"success": True, "exercise": response.data[0]}
 
 @router.patch("/exercises/{exercise_id}/restore", tags=["Exercises"])
-def restore_exercise(exercise_id: str, teacher=Depends(get_current_teacher)):
-    supabase = get_supabase()
-    response = supabase.table("exercises").update({"is_hidden": False}).eq("id", exercise_id).execute()
+async def restore_exercise(exercise_id: str, teacher=Depends(get_current_teacher), supabase: Repository = Depends(get_supabase)):
+    response = await supabase.table("exercises").update({"is_hidden": False}).eq("id", exercise_id).execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
     if not response.data:
         raise HTTPException(status_code=404, detail="Exercise not found or not restored")
+    invalidate_rows("exercises", response.data, *{row.get("course_id") for row in response.data}, "all")
+    mark_course_dirty(*(row.get("course_id") for row in response.data))
     return {"success": True, "exercise": response.data[0]}
 
-@router.get("/exercises/{course_id}", tags=["Exercises"])
-def get_exercises_by_course(course_id: str):
+@router.get("/exercises/{course_id}", responses=projection_responses("exercises", many=True), tags=["Exercises"])
+async def get_exercises_by_course(request: Request, course_id: str, fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION), supabase: Repository = Depends(get_supabase)):
     """
     Récupère tous les exercices d'un cours donné (non masqués).
     - **course_id**: identifiant du cours
     - **Retour**: liste des exercices (array d'objets)
     """
-    supabase = get_supabase()
-    response = supabase.table("exercises").select("*").eq("course_id", course_id).eq("is_hidden", False).execute()
+    columns = select_columns("exercises", fields)
+    response = await supabase.table("exercises").select(columns).eq("course_id", course_id).eq("is_hidden", False).execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
-    return response.data 
\ No newline at end of file
+    return catalog_response(request, project_rows("exercises", fields, response.data)) 
\ No newline at end of file
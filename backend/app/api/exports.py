@@ -0,0 +1,113 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from app.services.supabase_client import get_supabase
+from app.services.repository import Repository
+from app.services.auth import get_current_teacher
+from app.services.export import EXPORT_COLUMNS, EXPORT_CHUNK_SIZE, EXPORT_KEYS, fetch_chunks, stream_export
+from app.services.pagination import apply_keyset
+from datetime import datetime
+from typing import List, Optional
+
+router = APIRouter()
+
+# Table exportée -> (colonne de rattachement, table parente portant course_id)
+EXPORT_PARENTS = {
+    "submissions": ("exercise_id", "exercises"),
+    "test_submissions": ("test_id", "tests"),
+    "project_submissions": ("project_id", "projects"),
+}
+
+async def _course_item_ids(supabase: Repository, parent_table: str, course_id: str) -> List[str]:
+    response = await supabase.table(parent_table).select("id").eq("course_id", course_id).execute()
+    if getattr(response, "error", None):
+        raise HTTPException(status_code=500, detail=str(response.error))
+    return [row["id"] for row in response.data]
+
+async def _export(
+    supabase: Repository,
+    table: str,
+    format: str,
+    gzip: bool,
+    course_id: Optional[str],
+    item_id: Optional[str],
+    since: Optional[datetime],
+    until: Optional[datetime],
+):
+    link_column, parent_table = EXPORT_PARENTS[table]
+    item_ids = None
+    if course_id:
+        item_ids = await _course_item_ids(supabase, parent_table, course_id)
+
+    def build_query():
+        query = supabase.table(table).select(",".join(EXPORT_COLUMNS[table]))
+        if item_id:
+            query = query.eq(link_column, item_id)
+        if item_ids is not None:
+            query = query.in_(link_column, item_ids)
+        if since:
+            query = query.gte("created_at", since.isoformat())
+        if until:
+            query = query.lt("created_at", until.isoformat())
+        return query
+
+    # La première page est lue avant d'envoyer les en-têtes pour pouvoir renvoyer une vraie erreur 500
+    first = await apply_keyset(build_query(), EXPORT_KEYS, None, EXPORT_CHUNK_SIZE).execute()
+    if getattr(first, "error", None):
+        raise HTTPException(status_code=500, detail=str(first.error))
+
+    chunks = fetch_chunks(build_query, first=first)
+    media_type = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
+    filename = f"{table}.{'csv' if format == 'csv' else 'ndjson'}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        stream_export(chunks, EXPORT_COLUMNS[table], format, gzip),
+        media_type=media_type,
+        headers=headers,
+    )
+
+@router.get("/exports/submissions", tags=["Exports"])
+async def export_submissions(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    course_id: Optional[str] = None,
+    exercise_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    teacher=Depends(get_current_teacher),
+    supabase: Repository = Depends(get_supabase)
+):
+    """
+    Export en flux (CSV ou NDJSON) des soumissions d'exercices, lues par paquets.
+    - **course_id** / **exercise_id**: filtres optionnels
+    - **since** / **until**: bornes sur created_at (until exclu)
+    - **gzip**: compresse le flux à la volée
+    """
+    return await _export(supabase, "submissions", format, gzip, course_id, exercise_id, since, until)
+
+@router.get("/exports/test_submissions", tags=["Exports"])
+async def export_test_submissions(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    course_id: Optional[str] = None,
+    test_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    teacher=Depends(get_current_teacher),
+    supabase: Repository = Depends(get_supabase)
+):
+    return await _export(supabase, "test_submissions", format, gzip, course_id, test_id, since, until)
+
+@router.get("/exports/project_submissions", tags=["Exports"])
+async def export_project_submissions(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    course_id: Optional[str] = None,
+    project_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    teacher=Depends(get_current_teacher),
+    supabase: Repository = Depends(get_supabase)
+):
+    return await _export(supabase, "project_submissions", format, gzip, course_id, project_id, since, until)
@@ -1,66 +1,140 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Path
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+import asyncio
+from fastapi import APIRouter, HTTPException, status, Depends, Path, Query, Request, Response
 from app.services.supabase_client import get_supabase
+from app.services.repository import Repository
+from app.services.auth import get_current_teacher
+from app.services.http_cache import catalog_response
+from app.services.fields import FIELDS_DESCRIPTION, project_rows, projection_responses, select_columns
+from app.services.cache import catalog_cache, invalidate_rows, row_tag, scope_tag
+from app.services.course_stats import mark_course_dirty
+from app.services.progress_summary import invalidate_lesson_index
+from app.services.bulk import BULK_MAX_ITEMS, bulk_insert, created_rows
 from app.schemas.lesson import LessonCreate, LessonUpdate
-from typing import List
+from app.schemas.bulk import BulkResult, LessonOrder
+from typing import List, Optional
 
 router = APIRouter()
 
-TEACHER_TOKEN = "secret-teacher-token"
-security = HTTPBearer()
-
-def get_current_teacher(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    if token != TEACHER_TOKEN:
-        raise HTTPException(status_code=403, detail="Not authorized as teacher")
-    return {"role": "teacher"}
-
-@router.get("/courses/{course_id}/lessons", response_model=List[dict], tags=["Lessons"])
-def list_lessons(course_id: str):
-    supabase = get_supabase()
-    response = supabase.table("lessons").select("*").eq("course_id", course_id).eq("is_hidden", False).order("order_index").execute()
+@router.get("/courses/{course_id}/lessons", responses=projection_responses("lessons", many=True), tags=["Lessons"])
+async def list_lessons(request: Request, course_id: str, fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION), supabase: Repository = Depends(get_supabase)):
+    # fields=summary évite de transférer le contenu de chaque leçon pour un sommaire
+    columns = select_columns("lessons", fields)
+    query = supabase.table("lessons").select(columns).eq("course_id", course_id).eq("is_hidden", False).order("order_index")
+    response = await catalog_cache.execute(query, tags=[scope_tag("lessons", course_id)])
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
-    return response.data
+    return catalog_response(request, project_rows("lessons", fields, response.data))
 
-@router.get("/lessons/{id}", tags=["Lessons"])
-def get_lesson(id: str):
-    supabase = get_supabase()
-    response = supabase.table("lessons").select("*").eq("id", id).single().execute()
+@router.get("/lessons/{id}", responses=projection_responses("lessons"), tags=["Lessons"])
+async def get_lesson(request: Request, id: str, fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION), supabase: Repository = Depends(get_supabase)):
+    columns = select_columns("lessons", fields)
+    response = await catalog_cache.execute(supabase.table("lessons").select(columns).eq("id", id).single())
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
     if not response.data:
         raise HTTPException(status_code=404, detail="Lesson not found")
-    return response.data
+    return catalog_response(request, project_rows("lessons", fields, response.data), precompress_tag=row_tag("lessons", id))
+
+@router.post("/lessons/bulk", status_code=status.HTTP_201_CREATED, response_model=BulkResult, tags=["Lessons"])
+async def create_lessons_bulk(lessons: List[LessonCreate], http_response: Response, teacher=Depends(get_current_teacher), supabase: Repository = Depends(get_supabase)):
+    # Lot validé en entier par Pydantic, inséré par paquets ; 207 si certains éléments ont échoué
+    if len(lessons) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"{BULK_MAX_ITEMS} leçons maximum par lot")
+    result = await bulk_insert(supabase, "lessons", [lesson.dict() for lesson in lessons])
+    rows = created_rows(result)
+    course_ids = {row.get("course_id") for row in rows}
+    invalidate_rows("lessons", rows, *course_ids, "all")
+    invalidate_lesson_index(rows)
+    mark_course_dirty(*course_ids)
+    if result["failed"]:
+        http_response.status_code = status.HTTP_207_MULTI_STATUS
+    return result
+
+@router.put("/courses/{course_id}/lessons/order", tags=["Lessons"])
+async def reorder_lessons(course_id: str, order: LessonOrder, teacher=Depends(get_current_teacher), supabase: Repository = Depends(get_supabase)):
+    """
+    Réordonne les leçons d'un cours en un seul appel : order_index = position dans **lesson_ids**.
+    """
+    response = await supabase.table("lessons").select("id,order_index,is_hidden").eq("course_id", course_id).execute()
+    if getattr(response, "error", None):
+        raise HTTPException(status_code=500, detail=str(response.error))
+    lessons = {row["id"]: row for row in response.data}
+    unknown = [lesson_id for lesson_id in order.lesson_ids if lesson_id not in lessons]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Leçons inconnues pour ce cours : {', '.join(unknown)}")
+    listed = set(order.lesson_ids)
+    if len(listed) != len(order.lesson_ids):
+        raise HTTPException(status_code=400, detail="Leçons en double dans lesson_ids")
+    # Toutes les leçons visibles doivent figurer dans la liste (sinon deux leçons auraient la même position)
+    missing = [row["id"] for row in response.data if not row.get("is_hidden") and row["id"] not in listed]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Leçons absentes de lesson_ids : {', '.join(missing)}")
+    # Les leçons masquées non listées sont renumérotées à la suite, dans leur ordre actuel
+    hidden = sorted(
+        (row for row in response.data if row["id"] not in listed),
+        key=lambda row: (row.get("order_index") is None, row.get("order_index") or 0, row["id"]),
+    )
+    ordered_ids = list(order.lesson_ids) + [row["id"] for row in hidden]
+    # UPDATE de la seule colonne order_index, pour les leçons dont la position change : une modification
+    # de contenu concurrente n'est pas écrasée par les lignes lues plus haut
+    changed = [(lesson_id, index) for index, lesson_id in enumerate(ordered_ids) if lessons[lesson_id].get("order_index") != index]
+    responses = await asyncio.gather(
+        *(supabase.table("lessons").update({"order_index": index}).eq("id", lesson_id).execute() for lesson_id, index in changed)
+    )
+    rows = [row for response in responses for row in response.data or []]
+    invalidate_rows("lessons", rows, course_id)
+    invalidate_lesson_index(rows)
+    errors = [str(response.error) for response in responses if getattr(response, "error", None)]
+    if errors:
+        raise HTTPException(status_code=500, detail=errors[0])
+    return {"success": True, "updated": len(rows)}
 
 @router.post("/lessons", status_code=status.HTTP_201_CREATED, tags=["Lessons"])
-def create_lesson(lesson: LessonCreate, teacher=Depends(get_current_teacher)):
-    supabase = get_supabase()
+async def create_lesson(lesson: LessonCreate, teacher=Depends(get_current_teacher), supabase: Repository = Depends(get_supabase)):
     data = lesson.dict()
-    response = supabase.table("lessons").insert(data).execute()
+    response = await supabase.table("lessons").insert(data).execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
     if not response.data:
         raise HTTPException(status_code=500, detail="Erreur lors de la création de la leçon")
+    invalidate_rows("lessons", response.data, data["course_id"], "all")
+    invalidate_lesson_index(response.data)
+    mark_course_dirty(*(row.get("course_id") for row in response.data))
     return response.data[0]
 
 @router.put("/lessons/{id}", tags=["Lessons"])
-def update_lesson(id: str, lesson: LessonUpdate, teacher=Depends(get_current_teacher)):
-    supabase = get_supabase()
+async def update_lesson(id: str, lesson: LessonUpdate, teacher=Depends(get_current_teacher), supabase: Repository = Depends(get_supabase)):
     data = lesson.dict(exclude_unset=True)
-    response = supabase.table("lessons").update(data).eq("id", id).execute()
+    response = await supabase.table("lessons").update(data).eq("id", id).execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
     if not response.data:
         raise HTTPException(status_code=404, detail="Lesson not found or not updated")
+    invalidate_rows("lessons", response.data, *{row.get("course_id") for row in response.data}, "all")
+    invalidate_lesson_index(response.data)
+    mark_course_dirty(*(row.get("course_id") for row in response.data))
     return response.data[0]
 
 @router.delete("/lessons/{id}", tags=["Lessons"])
-def delete_lesson(id: str, teacher=Depends(get_current_teacher)):
-    supabase = get_supabase()
-    response = supabase.table("lessons").update({"is_hidden": True}).eq("id", id).execute()
+async def delete_lesson(id: str, teacher=Depends(get_current_teacher), supabase: Repository = Depends(get_supabase)):
+    response = await supabase.table("lessons").update({"is_hidden": True}).eq("id", id).execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
     if not response.data:
         raise HTTPException(status_code=404, detail="Lesson not found or not deleted")
+    invalidate_rows("lessons", response.data)
+    invalidate_lesson_index(response.data)
+    mark_course_dirty(*(row.get("course_id") for row in response.data))
+    return {"success": True, "lesson": response.data[0]}
+
+@router.patch("/lessons/{id}/restore", tags=["Lessons"])
+async def restore_lesson(id: str, teacher=Depends(get_current_teacher), supabase: Repository = Depends(get_supabase)):
+    response = await supabase.table("lessons").update({"is_hidden": False}).eq("id", id).execute()
+    if getattr(response, "error", None):
+        raise HTTPException(status_code=500, detail=str(response.error))
+    if not response.data:
+        raise HTTPException(status_code=404, detail="Lesson not found or not restored")
+    invalidate_rows("lessons", response.data, *{row.get("course_id") for row in response.data}, "all")
+    invalidate_lesson_index(response.data)
+    mark_course_dirty(*(row.get("course_id") for row in response.data))
     return {"success": True, "lesson": response.data[0]}
\ No newline at end of file
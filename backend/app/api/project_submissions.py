@@ -1,29 +1,23 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
 from app.services.supabase_client import get_supabase
+from app.services.repository import Repository
+from app.services.auth import get_current_teacher, get_current_user
+from app.services.bulk import BULK_MAX_ITEMS, bulk_grade
+from app.services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, apply_keyset, paginate
 from app.schemas.project_submission import ProjectSubmissionCreate
-from typing import List
+from app.schemas.bulk import GradeItem, GradeResult
+from typing import List, Optional
 
 router = APIRouter()
 
-TEACHER_TOKEN = "secret-teacher-token"
-security = HTTPBearer()
-
-def get_current_teacher(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    if token != TEACHER_TOKEN:
-        raise HTTPException(status_code=403, detail="Not authorized as teacher")
-    return {"role": "teacher"}
-
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    return {"user_id": credentials.credentials}
+# Plus récentes d'abord
+PAGE_KEYS = (("created_at", True), ("id", True))
 
 @router.post("/project_submissions", status_code=status.HTTP_201_CREATED, tags=["Project Submissions"])
-def create_project_submission(submission: ProjectSubmissionCreate, user=Depends(get_current_user)):
-    supabase = get_supabase()
+async def create_project_submission(submission: ProjectSubmissionCreate, user=Depends(get_current_user), supabase: Repository = Depends(get_supabase)):
     data = submission.dict()
     data["user_id"] = user["user_id"]
-    response = supabase.table("project_submissions").insert(data).execute()
+    response = await supabase.table("project_submissions").insert(data).execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
     if not response.data:
@@ -31,27 +25,46 @@ def create_project_submission(submission: ProjectSubmissionCreate, user=Depends(
     return response.data[0]
 
 @router.get("/project_submissions/me", tags=["Project Submissions"])
-def my_project_submissions(user=Depends(get_current_user)):
-    supabase = get_supabase()
-    response = supabase.table("project_submissions").select("*").eq("user_id", user["user_id"]).execute()
+async def my_project_submissions(
+    http_response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    user=Depends(get_current_user),
+    supabase: Repository = Depends(get_supabase)
+):
+    query = supabase.table("project_submissions").select("*").eq("user_id", user["user_id"])
+    response = await apply_keyset(query, PAGE_KEYS, cursor, limit).execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
-    return response.data
+    rows, next_cursor = paginate(response.data, PAGE_KEYS, limit)
+    if next_cursor:
+        http_response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return rows
 
 @router.get("/project_submissions/{id}", tags=["Project Submissions"])
-def get_project_submission(id: str, user=Depends(get_current_user)):
-    supabase = get_supabase()
-    response = supabase.table("project_submissions").select("*").eq("id", id).single().execute()
+async def get_project_submission(id: str, user=Depends(get_current_user), supabase: Repository = Depends(get_supabase)):
+    response = await supabase.table("project_submissions").select("*").eq("id", id).single().execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
     if not response.data:
         raise HTTPException(status_code=404, detail="Project submission not found")
     return response.data
 
+@router.put("/project_submissions/grade", response_model=GradeResult, tags=["Project Submissions"])
+async def grade_project_submissions_bulk(grades: List[GradeItem], http_response: Response, teacher=Depends(get_current_teacher), supabase: Repository = Depends(get_supabase)):
+    """
+    Notation en lot : liste de {id, score, feedback}, appliquée par paquets avec un statut par élément.
+    """
+    if len(grades) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"{BULK_MAX_ITEMS} notes maximum par lot")
+    result = await bulk_grade(supabase, "project_submissions", [grade.dict() for grade in grades])
+    if result["failed"]:
+        http_response.status_code = status.HTTP_207_MULTI_STATUS
+    return result
+
 @router.put("/project_submissions/{id}/grade", tags=["Project Submissions"])
-def grade_project_submission(id: str, score: int, feedback: str = "", teacher=Depends(get_current_teacher)):
-    supabase = get_supabase()
-    response = supabase.table("project_submissions").update({"score": score, "feedback": feedback}).eq("id", id).execute()
+async def grade_project_submission(id: str, score: int, feedback: str = "", teacher=Depends(get_current_teacher), supabase: Repository = Depends(get_supabase)):
+    response = await supabase.table("project_submissions").update({"score": score, "feedback": feedback}).eq("id", id).execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
     if not response.data:
@@ -1,35 +1,99 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
 from app.services.supabase_client import get_supabase
+from app.services.repository import Repository
+from app.services.auth import get_current_teacher, get_optional_user, is_teacher
+from app.services.question_pool import question_pool
+from app.services.bulk import BULK_MAX_ITEMS, bulk_insert, created_rows
 from app.schemas.question_bank import QuestionBankCreate
-from typing import List
+from app.schemas.bulk import BulkResult
+from typing import List, Optional
 
 router = APIRouter()
 
-TEACHER_TOKEN = "secret-teacher-token"
-security = HTTPBearer()
+# Colonnes visibles sans compte enseignant : le corrigé (answer) sert à noter les tests
+PUBLIC_COLUMNS = "id,question,type,choices,created_by,created_at"
 
-def get_current_teacher(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    if token != TEACHER_TOKEN:
-        raise HTTPException(status_code=403, detail="Not authorized as teacher")
-    return {"role": "teacher"}
+
+def _columns(user) -> str:
+    return "*" if user is not None and is_teacher(user) else PUBLIC_COLUMNS
 
 @router.get("/question_bank", tags=["Question Bank"])
-def search_question_bank():
-    supabase = get_supabase()
-    response = supabase.table("question_bank").select("*").execute()
+async def search_question_bank(
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    type: Optional[str] = None,
+    created_by: Optional[str] = None,
+    q: Optional[str] = None,
+    user=Depends(get_optional_user),
+    supabase: Repository = Depends(get_supabase)
+):
+    """
+    Recherche dans la banque de questions.
+    - **type**, **created_by**: filtres exacts (optionnels)
+    - **q**: texte recherché dans l'énoncé (insensible à la casse)
+    - **limit** / **offset**: pagination (100 questions maximum par page)
+
+    Le corrigé (**answer**) n'est renvoyé qu'aux enseignants.
+    """
+    query = supabase.table("question_bank").select(_columns(user))
+    if type:
+        query = query.eq("type", type)
+    if created_by:
+        query = query.eq("created_by", created_by)
+    if q:
+        # Les jokers PostgREST (*) saisis par l'utilisateur sont ignorés
+        text = q.replace("*", "").replace("%", "").strip()
+        if text:
+            query = query.ilike("question", f"*{text}*")
+    response = await query.order("created_at", desc=True).order("id").range(offset, offset + limit - 1).execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
     return response.data
 
+@router.get("/question_bank/sample", tags=["Question Bank"])
+async def sample_questions(
+    n: int = Query(10, ge=1, le=100),
+    types: Optional[List[str]] = Query(None),
+    seed: Optional[int] = None,
+    user=Depends(get_optional_user),
+    supabase: Repository = Depends(get_supabase)
+):
+    """
+    Tire n questions au hasard, réparties entre les types proportionnellement à leur nombre.
+    - **types**: restreint le tirage à ces types (paramètre répétable)
+    - **seed**: graine optionnelle pour un tirage reproductible
+
+    Le corrigé (**answer**) n'est renvoyé qu'aux enseignants.
+    """
+    try:
+        ids = await question_pool.sample(supabase, n, types, seed)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+    if not ids:
+        return []
+    response = await supabase.table("question_bank").select(_columns(user)).in_("id", ids).execute()
+    if getattr(response, "error", None):
+        raise HTTPException(status_code=500, detail=str(response.error))
+    position = {question_id: i for i, question_id in enumerate(ids)}
+    return sorted(response.data, key=lambda row: position.get(row["id"], len(ids)))
+
 @router.post("/question_bank", status_code=status.HTTP_201_CREATED, tags=["Question Bank"])
-def add_question(question: QuestionBankCreate, teacher=Depends(get_current_teacher)):
-    supabase = get_supabase()
+async def add_question(question: QuestionBankCreate, teacher=Depends(get_current_teacher), supabase: Repository = Depends(get_supabase)):
     data = question.dict()
-    response = supabase.table("question_bank").insert(data).execute()
+    response = await supabase.table("question_bank").insert(data).execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
     if not response.data:
         raise HTTPException(status_code=500, detail="Erreur lors de l'ajout de la question")
-    return response.data[0]
\ No newline at end of file
+    question_pool.add(response.data)
+    return response.data[0]
+
+@router.post("/question_bank/bulk", status_code=status.HTTP_201_CREATED, response_model=BulkResult, tags=["Question Bank"])
+async def add_questions_bulk(questions: List[QuestionBankCreate], http_response: Response, teacher=Depends(get_current_teacher), supabase: Repository = Depends(get_supabase)):
+    if len(questions) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"{BULK_MAX_ITEMS} questions maximum par lot")
+    result = await bulk_insert(supabase, "question_bank", [question.dict() for question in questions])
+    question_pool.add(created_rows(result))
+    if result["failed"]:
+        http_response.status_code = status.HTTP_207_MULTI_STATUS
+    return result
\ No newline at end of file
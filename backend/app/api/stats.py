@@ -0,0 +1,64 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from app.services.supabase_client import get_pool_stats
+from app.services.cache import catalog_cache
+from app.services.grading import grading_queue
+from app.services.auth import auth_stats
+from app.services.compression import compression_stats
+from app.services.metrics import CONTENT_TYPE, registry
+from app.services.admission import admission_stats
+from app.services.write_behind import write_buffer
+from app.services.idempotency import idempotency_stats
+from app.services.progress_summary import progress_store
+
+router = APIRouter()
+
+@router.get("/stats/pool", tags=["Monitoring"])
+async def pool_stats():
+    # Compteurs du pool de connexions Supabase de ce worker
+    return get_pool_stats()
+
+@router.get("/stats/cache", tags=["Monitoring"])
+async def cache_stats():
+    # Hits / misses du cache catalogue de ce worker
+    return catalog_cache.stats()
+
+@router.get("/stats/grading", tags=["Monitoring"])
+async def grading_stats():
+    # File de correction automatique de ce worker
+    return grading_queue.stats()
+
+@router.get("/stats/auth", tags=["Monitoring"])
+async def auth_cache_stats():
+    # Cache des jetons déjà vérifiés
+    return auth_stats()
+
+@router.get("/stats/compression", tags=["Monitoring"])
+async def compression_cache_stats():
+    # Encodages disponibles et cache des corps précompressés
+    return compression_stats()
+
+@router.get("/stats/admission", tags=["Monitoring"])
+async def admission_control_stats():
+    # Quotas par utilisateur et files d'admission par classe de routes
+    return admission_stats()
+
+@router.get("/stats/write_behind", tags=["Monitoring"])
+async def write_behind_stats():
+    # Tampon d'écriture différée : lignes en attente, retard de vidange
+    return write_buffer.stats()
+
+@router.get("/stats/idempotency", tags=["Monitoring"])
+async def idempotency_store_stats():
+    # Réponses conservées par Idempotency-Key : rejouées (hits) ou attendues (coalesced)
+    return idempotency_stats()
+
+@router.get("/stats/progress", tags=["Monitoring"])
+async def progress_summary_stats():
+    # Masques de progression en mémoire et index des leçons
+    return progress_store.stats()
+
+@router.get("/metrics", tags=["Monitoring"])
+async def metrics():
+    # Exposition Prometheus : latences par route et par table Supabase, statuts, requêtes en cours
+    return Response(registry.exposition(), media_type=CONTENT_TYPE)
@@ -1,48 +1,92 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
 from app.services.supabase_client import get_supabase
+from app.services.repository import Repository
+from app.services.auth import get_current_teacher, get_current_user, is_teacher
+from app.services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, apply_keyset, paginate
+from app.services.dashboard_summary import summary_store
+from app.services.gradebook import invalidate_gradebooks
+from app.services.bulk import BULK_MAX_ITEMS, bulk_grade, graded_rows
+from app.services.grading import QueueFullError, grading_queue
+from app.services.write_behind import write_buffer
 from app.schemas.submission import SubmissionCreate
-from typing import List
+from app.schemas.bulk import GradeItem, GradeResult
+from typing import List, Optional
 
 router = APIRouter()
 
-TEACHER_TOKEN = "secret-teacher-token"
-security = HTTPBearer()
-
-def get_current_teacher(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    if token != TEACHER_TOKEN:
-        raise HTTPException(status_code=403, detail="Not authorized as teacher")
-    return {"role": "teacher"}
-
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    # Pour la démo, on simule user_id à partir du token
-    return {"user_id": credentials.credentials}
+# Plus récentes d'abord
+PAGE_KEYS = (("created_at", True), ("id", True))
 
 @router.get("/submissions/me", tags=["Submissions"])
-def my_submissions(user=Depends(get_current_user)):
-    supabase = get_supabase()
-    response = supabase.table("submissions").select("*").eq("user_id", user["user_id"]).execute()
+async def my_submissions(
+    http_response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    user=Depends(get_current_user),
+    supabase: Repository = Depends(get_supabase)
+):
+    query = supabase.table("submissions").select("*").eq("user_id", user["user_id"])
+    response = await apply_keyset(query, PAGE_KEYS, cursor, limit).execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
-    return response.data
+    rows, next_cursor = paginate(response.data, PAGE_KEYS, limit)
+    if next_cursor:
+        http_response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return rows
 
-@router.post("/submissions", status_code=status.HTTP_201_CREATED, tags=["Submissions"])
-def create_submission(submission: SubmissionCreate, user=Depends(get_current_user)):
-    supabase = get_supabase()
+@router.post("/submissions", status_code=status.HTTP_202_ACCEPTED, tags=["Submissions"])
+async def create_submission(submission: SubmissionCreate, http_response: Response, user=Depends(get_current_user), supabase: Repository = Depends(get_supabase)):
+    """
+    Enregistre la soumission puis la met en file pour correction automatique (sortie attendue et cas de test).
+    Suivi via **job_id** : `GET /submissions/jobs/{job_id}`.
+    """
+    try:
+        job = grading_queue.reserve(submission.exercise_id, user["user_id"])
+    except QueueFullError:
+        raise HTTPException(
+            status_code=503,
+            detail="File de correction saturée, réessayez plus tard",
+            headers={"Retry-After": str(grading_queue.retry_after())},
+        )
     data = submission.dict()
     data["user_id"] = user["user_id"]
-    response = supabase.table("submissions").insert(data).execute()
-    if getattr(response, "error", None):
-        raise HTTPException(status_code=500, detail=str(response.error))
-    if not response.data:
-        raise HTTPException(status_code=500, detail="Erreur lors de la soumission")
-    return response.data[0]
+    # Score et feedback sont écrits par la correction
+    data["score"] = None
+    data["feedback"] = None
+    try:
+        # Écriture différée (si activée) : acquittée une fois journalisée, écrite dans Supabase par paquets
+        # Identifiant fixé avant le journal : réutilisé tel quel si l'on se replie sur l'écriture directe
+        data = write_buffer.prepare("submissions", data)
+        entry = await write_buffer.append("submissions", data)
+        if entry is not None:
+            row, persisted = entry.row, entry.flushed
+        else:
+            response = await supabase.table("submissions").insert(data).execute()
+            if getattr(response, "error", None):
+                raise HTTPException(status_code=500, detail=str(response.error))
+            if not response.data:
+                raise HTTPException(status_code=500, detail="Erreur lors de la soumission")
+            row, persisted = response.data[0], None
+        summary_store.record(user["user_id"], "submission", row)
+        await grading_queue.submit(job, row, persisted)
+    except BaseException as exc:
+        # Quelle que soit l'erreur (réseau, journal, annulation...), la place réservée est rendue :
+        # sinon les réservations perdues finissent par saturer la file et tout renvoie 503
+        grading_queue.release(job, str(getattr(exc, "detail", None) or f"{type(exc).__name__}: {exc}"))
+        raise
+    http_response.headers["Location"] = f"/submissions/jobs/{job.id}"
+    return {**row, "job_id": job.id, "grading_status": job.status}
+
+@router.get("/submissions/jobs/{job_id}", tags=["Submissions"])
+async def get_grading_job(job_id: str, user=Depends(get_current_user)):
+    job = grading_queue.get(job_id)
+    if job is None or (job.user_id != user["user_id"] and not is_teacher(user)):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
 
 @router.get("/submissions/{id}", tags=["Submissions"])
-def get_submission(id: str, user=Depends(get_current_user)):
-    supabase = get_supabase()
-    response = supabase.table("submissions").select("*").eq("id", id).single().execute()
+async def get_submission(id: str, user=Depends(get_current_user), supabase: Repository = Depends(get_supabase)):
+    response = await supabase.table("submissions").select("*").eq("id", id).single().execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
     if not response.data:
@@ -50,12 +94,30 @@ def get_submission(id: str, user=Depends(get_current_user)):
     # Optionnel: vérifier que user est bien owner ou teacher
     return response.data
 
+def after_grading(rows):
+    # Travail déclenché par un changement de note : appelé une fois par requête (unitaire ou lot)
+    summary_store.record_many("graded", rows)
+    invalidate_gradebooks(rows)
+
+@router.put("/submissions/grade", response_model=GradeResult, tags=["Submissions"])
+async def grade_submissions_bulk(grades: List[GradeItem], http_response: Response, teacher=Depends(get_current_teacher), supabase: Repository = Depends(get_supabase)):
+    """
+    Notation en lot : liste de {id, score, feedback}, appliquée par paquets avec un statut par élément.
+    """
+    if len(grades) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"{BULK_MAX_ITEMS} notes maximum par lot")
+    result = await bulk_grade(supabase, "submissions", [grade.dict() for grade in grades])
+    after_grading(graded_rows(result))
+    if result["failed"]:
+        http_response.status_code = status.HTTP_207_MULTI_STATUS
+    return result
+
 @router.put("/submissions/{id}/grade", tags=["Submissions"])
-def grade_submission(id: str, score: int, feedback: str = "", teacher=Depends(get_current_teacher)):
-    supabase = get_supabase()
-    response = supabase.table("submissions").update({"score": score, "feedback": feedback}).eq("id", id).execute()
+async def grade_submission(id: str, score: int, feedback: str = "", teacher=Depends(get_current_teacher), supabase: Repository = Depends(get_supabase)):
+    response = await supabase.table("submissions").update({"score": score, "feedback": feedback}).eq("id", id).execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
     if not response.data:
         raise HTTPException(status_code=404, detail="Submission not found or not graded")
+    after_grading(response.data)
     return response.data[0]
\ No newline at end of file
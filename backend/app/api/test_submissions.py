@@ -1,40 +1,69 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
 from app.services.supabase_client import get_supabase
+from app.services.repository import Repository
+from app.services.auth import get_current_user
+from app.services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, apply_keyset, paginate
+from app.services.dashboard_summary import summary_store
+from app.services.gradebook import invalidate_gradebooks
+from app.services.scoring import get_answer_key
+from app.services.write_behind import write_buffer
 from app.schemas.test_submission import TestSubmissionCreate
-from typing import List
+from typing import List, Optional
 
 router = APIRouter()
 
-security = HTTPBearer()
-
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    return {"user_id": credentials.credentials}
+# Plus récentes d'abord
+PAGE_KEYS = (("created_at", True), ("id", True))
 
 @router.post("/test_submissions", status_code=status.HTTP_201_CREATED, tags=["Test Submissions"])
-def create_test_submission(submission: TestSubmissionCreate, user=Depends(get_current_user)):
-    supabase = get_supabase()
+async def create_test_submission(submission: TestSubmissionCreate, user=Depends(get_current_user), supabase: Repository = Depends(get_supabase)):
     data = submission.dict()
     data["user_id"] = user["user_id"]
-    response = supabase.table("test_submissions").insert(data).execute()
-    if getattr(response, "error", None):
-        raise HTTPException(status_code=500, detail=str(response.error))
-    if not response.data:
-        raise HTTPException(status_code=500, detail="Erreur lors de la soumission du test")
-    return response.data[0]
+    try:
+        key = await get_answer_key(supabase, data["test_id"])
+    except RuntimeError as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+    # Score calculé côté serveur à partir du corrigé ; celui envoyé par le client est toujours ignoré
+    # (sans question corrigeable automatiquement, il reste vide jusqu'à la correction manuelle)
+    data["score"] = int(key.score([data.get("answers")])[0]) if key is not None and len(key) else None
+    # Identifiant fixé avant le journal : réutilisé tel quel si l'on se replie sur l'écriture directe
+    data = write_buffer.prepare("test_submissions", data)
+    entry = await write_buffer.append("test_submissions", data)
+    if entry is not None:
+        row = entry.row
+        # Note visible en base seulement après la vidange : le carnet est aussi invalidé à ce moment-là
+        entry.flushed.add_done_callback(lambda _: invalidate_gradebooks([row]))
+    else:
+        response = await supabase.table("test_submissions").insert(data).execute()
+        if getattr(response, "error", None):
+            raise HTTPException(status_code=500, detail=str(response.error))
+        if not response.data:
+            raise HTTPException(status_code=500, detail="Erreur lors de la soumission du test")
+        row = response.data[0]
+    summary_store.record(user["user_id"], "test_submission", row)
+    invalidate_gradebooks([row])
+    return row
 
 @router.get("/test_submissions/me", tags=["Test Submissions"])
-def my_test_submissions(user=Depends(get_current_user)):
-    supabase = get_supabase()
-    response = supabase.table("test_submissions").select("*").eq("user_id", user["user_id"]).execute()
+async def my_test_submissions(
+    http_response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    user=Depends(get_current_user),
+    supabase: Repository = Depends(get_supabase)
+):
+    query = supabase.table("test_submissions").select("*").eq("user_id", user["user_id"])
+    response = await apply_keyset(query, PAGE_KEYS, cursor, limit).execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
-    return response.data
+    rows, next_cursor = paginate(response.data, PAGE_KEYS, limit)
+    if next_cursor:
+        http_response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return rows
 
 @router.get("/test_submissions/{id}", tags=["Test Submissions"])
-def get_test_submission(id: str, user=Depends(get_current_user)):
-    supabase = get_supabase()
-    response = supabase.table("test_submissions").select("*").eq("id", id).single().execute()
+async def get_test_submission(id: str, user=Depends(get_current_user), supabase: Repository = Depends(get_supabase)):
+    response = await supabase.table("test_submissions").select("*").eq("id", id).single().execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
     if not response.data:
@@ -1,66 +1,79 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi import APIRouter, HTTPException, status, Depends, Request
 from app.services.supabase_client import get_supabase
+from app.services.repository import Repository
+from app.services.auth import get_current_teacher
+from app.services.http_cache import catalog_response
+from app.services.cache import catalog_cache, invalidate_rows, scope_tag
+from app.services.scoring import invalidate_answer_keys, rescore_test
+from app.services.dashboard_summary import summary_store
+from app.services.gradebook import invalidate_gradebooks
 from app.schemas.test import TestCreate
 from typing import List
 
 router = APIRouter()
 
-TEACHER_TOKEN = "secret-teacher-token"
-security = HTTPBearer()
-
-def get_current_teacher(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    if token != TEACHER_TOKEN:
-        raise HTTPException(status_code=403, detail="Not authorized as teacher")
-    return {"role": "teacher"}
-
 @router.get("/tests", tags=["Tests"])
-def list_tests():
-    supabase = get_supabase()
-    response = supabase.table("tests").select("*").eq("is_published", True).execute()
+async def list_tests(request: Request, supabase: Repository = Depends(get_supabase)):
+    query = supabase.table("tests").select("*").eq("is_published", True)
+    response = await catalog_cache.execute(query, tags=[scope_tag("tests")])
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
-    return response.data
+    return catalog_response(request, response.data)
 
 @router.get("/tests/{id}", tags=["Tests"])
-def get_test(id: str):
-    supabase = get_supabase()
-    response = supabase.table("tests").select("*").eq("id", id).single().execute()
+async def get_test(request: Request, id: str, supabase: Repository = Depends(get_supabase)):
+    response = await supabase.table("tests").select("*").eq("id", id).single().execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
     if not response.data:
         raise HTTPException(status_code=404, detail="Test not found")
-    return response.data
+    return catalog_response(request, response.data)
 
 @router.post("/tests", status_code=status.HTTP_201_CREATED, tags=["Tests"])
-def create_test(test: TestCreate, teacher=Depends(get_current_teacher)):
-    supabase = get_supabase()
+async def create_test(test: TestCreate, teacher=Depends(get_current_teacher), supabase: Repository = Depends(get_supabase)):
     data = test.dict()
-    response = supabase.table("tests").insert(data).execute()
+    response = await supabase.table("tests").insert(data).execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
     if not response.data:
         raise HTTPException(status_code=500, detail="Erreur lors de la création du test")
+    invalidate_rows("tests", response.data, "all")
     return response.data[0]
 
 @router.put("/tests/{id}", tags=["Tests"])
-def update_test(id: str, test: TestCreate, teacher=Depends(get_current_teacher)):
-    supabase = get_supabase()
+async def update_test(id: str, test: TestCreate, teacher=Depends(get_current_teacher), supabase: Repository = Depends(get_supabase)):
     data = test.dict(exclude_unset=True)
-    response = supabase.table("tests").update(data).eq("id", id).execute()
+    response = await supabase.table("tests").update(data).eq("id", id).execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
     if not response.data:
         raise HTTPException(status_code=404, detail="Test not found or not updated")
+    invalidate_rows("tests", response.data, "all")
+    invalidate_answer_keys("tests", [id])
     return response.data[0]
 
+@router.post("/tests/{id}/rescore", tags=["Tests"])
+async def rescore_test_submissions(id: str, teacher=Depends(get_current_teacher), supabase: Repository = Depends(get_supabase)):
+    """
+    Recharge le corrigé du test et recalcule le score de toutes ses soumissions (par exemple après correction d'une réponse).
+    """
+    try:
+        stats, updated = await rescore_test(supabase, id)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Test not found")
+    except RuntimeError as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+    summary_store.record_many("test_submission", updated)
+    invalidate_gradebooks(updated)
+    return stats
+
 @router.delete("/tests/{id}", tags=["Tests"])
-def delete_test(id: str, teacher=Depends(get_current_teacher)):
-    supabase = get_supabase()
-    response = supabase.table("tests").delete().eq("id", id).execute()
+async def delete_test(id: str, teacher=Depends(get_current_teacher), supabase: Repository = Depends(get_supabase)):
+    response = await supabase.table("tests").delete().eq("id", id).execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
     if not response.data:
         raise HTTPException(status_code=404, detail="Test not found or not deleted")
+    invalidate_rows("tests", response.data)
+    invalidate_answer_keys("tests", [id])
     return {"success": True, "test": response.data[0]}
\ No newline at end of file
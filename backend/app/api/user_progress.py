@@ -1,32 +1,65 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
 from app.services.supabase_client import get_supabase
-from app.schemas.user_progress import UserProgressCreate
-from typing import List
+from app.services.repository import Repository
+from app.services.auth import get_current_user
+from app.services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, apply_keyset, paginate
+from app.services.dashboard_summary import summary_store
+from app.services.progress_summary import progress_store
+from app.services.write_behind import write_buffer
+from app.schemas.user_progress import ProgressSummary, UserProgressCreate
+from typing import List, Optional
 
 router = APIRouter()
 
-security = HTTPBearer()
-
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    return {"user_id": credentials.credentials}
+# Plus récentes d'abord
+PAGE_KEYS = (("completed_at", True), ("id", True))
+# Une seule ligne par leçon terminée (contrainte unique côté base)
+PROGRESS_CONFLICT = "user_id,lesson_id"
 
 @router.get("/user_progress/me", tags=["User Progress"])
-def my_progress(user=Depends(get_current_user)):
-    supabase = get_supabase()
-    response = supabase.table("user_progress").select("*").eq("user_id", user["user_id"]).execute()
+async def my_progress(
+    http_response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    user=Depends(get_current_user),
+    supabase: Repository = Depends(get_supabase)
+):
+    query = supabase.table("user_progress").select("*").eq("user_id", user["user_id"])
+    response = await apply_keyset(query, PAGE_KEYS, cursor, limit).execute()
     if getattr(response, "error", None):
         raise HTTPException(status_code=500, detail=str(response.error))
-    return response.data
+    rows, next_cursor = paginate(response.data, PAGE_KEYS, limit)
+    if next_cursor:
+        http_response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return rows
+
+@router.get("/user_progress/me/summary", response_model=ProgressSummary, tags=["User Progress"])
+async def my_progress_summary(
+    course_id: Optional[List[str]] = Query(None),
+    user=Depends(get_current_user),
+    supabase: Repository = Depends(get_supabase)
+):
+    # Calculé depuis les masques en mémoire : aucune lecture de user_progress tant qu'ils sont chargés
+    try:
+        return await progress_store.summary(supabase, user["user_id"], course_id)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
 
 @router.post("/user_progress", status_code=status.HTTP_201_CREATED, tags=["User Progress"])
-def mark_lesson_completed(progress: UserProgressCreate, user=Depends(get_current_user)):
-    supabase = get_supabase()
-    data = progress.dict()
+async def mark_lesson_completed(progress: UserProgressCreate, user=Depends(get_current_user), supabase: Repository = Depends(get_supabase)):
+    # completed_at absent : la date de la première validation est conservée
+    data = progress.dict(exclude_none=True)
     data["user_id"] = user["user_id"]
-    response = supabase.table("user_progress").insert(data).execute()
-    if getattr(response, "error", None):
-        raise HTTPException(status_code=500, detail=str(response.error))
-    if not response.data:
-        raise HTTPException(status_code=500, detail="Erreur lors de la progression")
-    return response.data[0]
\ No newline at end of file
+    entry = await write_buffer.append("user_progress", data, on_conflict=PROGRESS_CONFLICT)
+    if entry is not None:
+        row = entry.row
+    else:
+        response = await supabase.table("user_progress").upsert(data, on_conflict=PROGRESS_CONFLICT).execute()
+        if getattr(response, "error", None):
+            raise HTTPException(status_code=500, detail=str(response.error))
+        if not response.data:
+            raise HTTPException(status_code=500, detail="Erreur lors de la progression")
+        row = response.data[0]
+    summary_store.record(user["user_id"], "lesson_completed", row)
+    progress_store.record(user["user_id"], row["lesson_id"])
+    return row
\ No newline at end of file
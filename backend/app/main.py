@@ -1,5 +1,15 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app.services.supabase_client import init_supabase, close_supabase
+from app.services.course_stats import course_stats_loop, stats_enabled
+from app.services.grading import grading_queue
+from app.services.write_behind import WRITE_BEHIND_ENABLED, write_buffer
+from app.services.compression import CompressionMiddleware
+from app.services.metrics import MetricsMiddleware
+from app.services.admission import AdmissionMiddleware
+from app.services.idempotency import IdempotencyMiddleware
 
 tags_metadata = [
     {"name": "Courses", "description": "Gestion des cours"},
@@ -13,9 +23,37 @@ tags_metadata = [
     {"name": "User Progress", "description": "Progression utilisateur"},
     {"name": "Question Bank", "description": "Banque de questions"},
     {"name": "Dashboard", "description": "Tableau de bord"},
+    {"name": "Exports", "description": "Exports des soumissions (enseignants)"},
+    {"name": "Monitoring", "description": "Statistiques internes"},
 ]
 
-app = FastAPI(openapi_tags=tags_metadata)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Un client Supabase partagé par worker, connexions keep-alive fermées à l'arrêt
+    supabase = init_supabase()
+    # Correction automatique des soumissions d'exercices (pool de processus)
+    await grading_queue.start(supabase)
+    # Écriture différée des soumissions (optionnelle) : reprise des journaux d'un arrêt précédent
+    if WRITE_BEHIND_ENABLED:
+        replayed = await write_buffer.start(supabase)
+        await grading_queue.resubmit([(entry.row, entry.flushed) for entry in replayed if entry.table == "submissions"])
+    # Recalcul incrémental des compteurs de cours (si DATABASE_URL est configurée)
+    stats_task = asyncio.create_task(course_stats_loop()) if stats_enabled() else None
+    yield
+    if stats_task:
+        stats_task.cancel()
+    await write_buffer.stop()
+    await grading_queue.stop()
+    await close_supabase()
+
+app = FastAPI(openapi_tags=tags_metadata, lifespan=lifespan)
+
+# Contrôle d'admission (quota par utilisateur, concurrence bornée par classe de routes) :
+# ajouté en premier, donc derrière CORS, pour que les 429 restent lisibles par le navigateur
+app.add_middleware(AdmissionMiddleware)
+
+# Idempotency-Key sur les POST : placé devant l'admission, une répétition ne consomme ni quota ni écriture
+app.add_middleware(IdempotencyMiddleware)
 
 # Ajout du middleware CORS avec wildcard pour tous les sous-domaines Vercel
 app.add_middleware(
@@ -25,16 +63,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Retry-After", "Idempotent-Replayed"],
 )
 
+# Compression gzip / brotli négociée (les réponses déjà encodées ne sont pas recompressées)
+app.add_middleware(CompressionMiddleware)
+
+# Métriques Prometheus (GET /metrics) : ajouté en dernier, donc le plus externe, pour tout mesurer
+app.add_middleware(MetricsMiddleware)
+
 from app.api import (
-    courses, test_supabase, exercises, lessons,
+    courses, check_supabase, exercises, lessons,
     submissions, tests, test_submissions, projects,
-    project_submissions, user_progress, question_bank, dashboard
+    project_submissions, user_progress, question_bank, dashboard,
+    stats, exports
 )
 
 app.include_router(courses.router)
-app.include_router(test_supabase.router)
+app.include_router(check_supabase.router)
 app.include_router(exercises.router)
 app.include_router(lessons.router)
 app.include_router(submissions.router)
@@ -45,6 +91,8 @@ app.include_router(project_submissions.router)
 app.include_router(user_progress.router)
 app.include_router(question_bank.router)
 app.include_router(dashboard.router)
+app.include_router(exports.router)
+app.include_router(stats.router)
 
 @app.get("/ping")
 def ping():
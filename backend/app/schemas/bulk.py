@@ -0,0 +1,26 @@
+from pydantic import BaseModel
+from typing import Optional, List, Dict, Any
+
+class BulkItemResult(BaseModel):
+    index: int
+    status: str  # "created", "graded", "not_found" ou "error"
+    data: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+class BulkResult(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkItemResult]
+
+class LessonOrder(BaseModel):
+    lesson_ids: List[str]
+
+class GradeItem(BaseModel):
+    id: str
+    score: int
+    feedback: Optional[str] = ""
+
+class GradeResult(BaseModel):
+    graded: int
+    failed: int
+    results: List[BulkItemResult]
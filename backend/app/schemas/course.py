@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 from typing import Optional, Any
+from datetime import datetime
 
 class CourseCreate(BaseModel):
     title: str
@@ -10,4 +11,23 @@ class CourseCreate(BaseModel):
     is_published: Optional[bool] = False
     difficulty: Optional[str] = "beginner"
     estimated_hours: Optional[int] = 1
-    teacher_id: Optional[str] = None 
\ No newline at end of file
+    teacher_id: Optional[str] = None 
+
+class CourseRead(CourseCreate):
+    id: str
+    is_hidden: Optional[bool] = False
+    nblessons: Optional[int] = 0
+    nbexercices: Optional[int] = 0
+    created_at: Optional[datetime] = None
+
+
+class CourseSummary(BaseModel):
+    id: str
+    title: str
+    description: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    order_index: Optional[int] = 0
+    difficulty: Optional[str] = None
+    estimated_hours: Optional[int] = None
+    nblessons: Optional[int] = 0
+    nbexercices: Optional[int] = 0
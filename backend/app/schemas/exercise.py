@@ -21,4 +21,14 @@ class ExerciseCreate(ExerciseBase):
 
 class ExerciseRead(ExerciseBase):
     id: str
-    created_at: Optional[datetime] = None 
\ No newline at end of file
+    created_at: Optional[datetime] = None 
+
+class ExerciseSummary(BaseModel):
+    id: str
+    title: str
+    course_id: str
+    lesson_id: Optional[str] = None
+    type: str
+    difficulty: Optional[str] = None
+    max_score: Optional[int] = None
+    created_at: Optional[datetime] = None
@@ -17,4 +17,10 @@ class LessonUpdate(LessonBase):
 
 class LessonRead(LessonBase):
     id: str
-    created_at: Optional[datetime] = None
\ No newline at end of file
+    created_at: Optional[datetime] = None
+
+class LessonSummary(BaseModel):
+    id: str
+    title: str
+    course_id: str
+    order_index: Optional[int] = None
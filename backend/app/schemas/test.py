@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class TestBase(BaseModel):
@@ -9,6 +9,8 @@ class TestBase(BaseModel):
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
     is_published: Optional[bool] = False
+    # Questions de la banque composant le test (corrigé utilisé pour la notation automatique)
+    question_ids: Optional[List[str]] = None
 
 class TestCreate(TestBase):
     pass
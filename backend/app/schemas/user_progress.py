@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class UserProgressBase(BaseModel):
@@ -11,4 +11,15 @@ class UserProgressCreate(UserProgressBase):
     pass
 
 class UserProgressRead(UserProgressBase):
-    id: str
\ No newline at end of file
+    id: str
+
+class CourseProgress(BaseModel):
+    course_id: str
+    completed_lessons: int
+    total_lessons: int
+    percent: float
+    next_lesson_id: Optional[str] = None
+
+class ProgressSummary(BaseModel):
+    completed_lessons: int
+    courses: List[CourseProgress]
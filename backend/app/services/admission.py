@@ -0,0 +1,212 @@
+import asyncio
+import hashlib
+import math
+import os
+import re
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.services.metrics import UPSTREAM_BUCKETS, registry
+
+# Contrôle d'admission : quota par utilisateur sur les soumissions, et concurrence bornée par classe
+# de routes (soumissions / lectures du catalogue) avec une file d'attente limitée.
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+ADMISSION_USER_RATE = float(os.getenv("ADMISSION_USER_RATE", "1"))
+ADMISSION_USER_BURST = float(os.getenv("ADMISSION_USER_BURST", "5"))
+ADMISSION_MAX_USERS = int(os.getenv("ADMISSION_MAX_USERS", "100000"))
+ADMISSION_SUBMISSIONS_CONCURRENCY = int(os.getenv("ADMISSION_SUBMISSIONS_CONCURRENCY", "32"))
+ADMISSION_SUBMISSIONS_QUEUE = int(os.getenv("ADMISSION_SUBMISSIONS_QUEUE", "256"))
+ADMISSION_CATALOG_CONCURRENCY = int(os.getenv("ADMISSION_CATALOG_CONCURRENCY", "64"))
+ADMISSION_CATALOG_QUEUE = int(os.getenv("ADMISSION_CATALOG_QUEUE", "512"))
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "2"))
+
+SUBMISSION_PATHS = re.compile(r"^/(submissions|test_submissions|project_submissions)/?$")
+CATALOG_PATHS = re.compile(r"^/(courses|lessons|exercises|tests|projects|question_bank)(/|$)")
+
+admission_in_flight = registry.gauge("admission_in_flight", "Requêtes admises en cours, par classe de routes.", ("class",))
+admission_queue_depth = registry.gauge("admission_queue_depth", "Requêtes en attente d'admission, par classe de routes.", ("class",))
+admission_wait = registry.histogram("admission_wait_seconds", "Attente avant admission, par classe de routes.", ("class",), UPSTREAM_BUCKETS)
+admission_rejected = registry.counter("admission_rejected_total", "Requêtes refusées (429), par classe et motif.", ("class", "reason"))
+
+
+class TokenBuckets:
+    """Seau à jetons par clé (utilisateur) : `rate` jetons par seconde, au plus `burst` en réserve."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Any, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, key: Any) -> float:
+        """Consomme un jeton ; renvoie 0 si la requête passe, sinon le délai (s) avant le prochain jeton."""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = self.burst
+        else:
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            self._buckets.move_to_end(key)
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now)
+            wait = 0.0
+        else:
+            self._buckets[key] = (tokens, now)
+            wait = (1 - tokens) / self.rate
+        # Les clés les moins récentes sont oubliées : un seau oublié repart plein
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class ConcurrencyLimiter:
+    """Au plus `limit` requêtes simultanées ; les suivantes attendent en FIFO (au plus `queue_size`, `max_wait` secondes)."""
+
+    def __init__(self, name: str, limit: int, queue_size: int, max_wait: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.active = 0
+        self.admitted = 0
+        self.service_time = 0.05
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def _publish(self):
+        admission_in_flight.set((self.name,), self.active)
+        admission_queue_depth.set((self.name,), len(self._waiters))
+
+    async def acquire(self) -> Optional[str]:
+        """None si la requête est admise, sinon le motif du refus."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            self._publish()
+            admission_wait.observe((self.name,), 0.0)
+            return None
+        if len(self._waiters) >= self.queue_size:
+            return "queue_full"
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._publish()
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.max_wait)
+        except asyncio.TimeoutError:
+            return "timeout"
+        except asyncio.CancelledError:
+            # Client parti : si la place venait d'être transmise, elle passe au suivant
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self._publish()
+        self.admitted += 1
+        admission_wait.observe((self.name,), time.perf_counter() - started)
+        return None
+
+    def release(self, duration: Optional[float] = None):
+        if duration is not None:
+            # Moyenne glissante du temps de service, pour estimer Retry-After
+            self.service_time += 0.1 * (duration - self.service_time)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # La place passe directement au premier en attente
+                waiter.set_result(None)
+                self._publish()
+                return
+        self.active -= 1
+        self._publish()
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.service_time * (len(self._waiters) + 1) / self.limit))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": len(self._waiters),
+            "queue_size": self.queue_size,
+            "max_wait": self.max_wait,
+            "admitted": self.admitted,
+            "service_time": round(self.service_time, 4),
+        }
+
+
+user_buckets = TokenBuckets(ADMISSION_USER_RATE, ADMISSION_USER_BURST, ADMISSION_MAX_USERS)
+limiters = {
+    "submissions": ConcurrencyLimiter("submissions", ADMISSION_SUBMISSIONS_CONCURRENCY, ADMISSION_SUBMISSIONS_QUEUE, ADMISSION_MAX_WAIT),
+    "catalog": ConcurrencyLimiter("catalog", ADMISSION_CATALOG_CONCURRENCY, ADMISSION_CATALOG_QUEUE, ADMISSION_MAX_WAIT),
+}
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    if method == "POST" and SUBMISSION_PATHS.match(path):
+        return "submissions"
+    if method in ("GET", "HEAD") and CATALOG_PATHS.match(path):
+        return "catalog"
+    return None
+
+
+def _user_key(scope: Scope) -> Any:
+    # Jeton non vérifié ici (l'authentification reste dans les routes) : seule son empreinte sert de clé
+    authorization = Headers(scope=scope).get("authorization")
+    if authorization:
+        return hashlib.sha256(authorization.encode()).digest()
+    client = scope.get("client")
+    return client[0] if client else None
+
+
+def _rejection(route: str, reason: str, retry_after: float) -> JSONResponse:
+    admission_rejected.inc((route, reason))
+    detail = "Trop de soumissions, réessayez plus tard" if reason == "rate_limited" else "Serveur saturé, réessayez plus tard"
+    return JSONResponse({"detail": detail}, status_code=429, headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+
+class AdmissionMiddleware:
+    """Refuse en 429 (avec Retry-After) plutôt que de laisser un pic de soumissions saturer tout le worker."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        route = route_class(scope["method"], scope["path"]) if scope["type"] == "http" and ADMISSION_ENABLED else None
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+        if route == "submissions" and user_buckets.rate > 0:
+            wait = user_buckets.take(_user_key(scope))
+            if wait:
+                await _rejection(route, "rate_limited", wait)(scope, receive, send)
+                return
+        limiter = limiters[route]
+        reason = await limiter.acquire()
+        if reason is not None:
+            await _rejection(route, reason, limiter.retry_after())(scope, receive, send)
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.perf_counter() - started)
+
+
+def admission_stats() -> Dict[str, Any]:
+    return {
+        "enabled": ADMISSION_ENABLED,
+        "user_rate": ADMISSION_USER_RATE,
+        "user_burst": ADMISSION_USER_BURST,
+        "tracked_users": len(user_buckets),
+        "classes": {name: limiter.stats() for name, limiter in limiters.items()},
+    }
@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+import jwt
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from app.services.cache import TTLCache
+
+# Vérification locale des JWT Supabase : secret HS256 du projet, ou clés publiques (JWKS) mises en cache
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+SUPABASE_JWKS_URL = os.getenv("SUPABASE_JWKS_URL") or (
+    f"{os.getenv('SUPABASE_URL', '').rstrip('/')}/auth/v1/.well-known/jwks.json" if os.getenv("SUPABASE_URL") else None
+)
+JWT_AUDIENCE = os.getenv("JWT_AUDIENCE", "authenticated")
+JWT_LEEWAY = int(os.getenv("JWT_LEEWAY", "30"))
+JWKS_TTL = float(os.getenv("JWKS_TTL", "3600"))
+# Rôle applicatif lu dans app_metadata (non modifiable par l'utilisateur, contrairement à user_metadata)
+ROLE_CLAIM = os.getenv("AUTH_ROLE_CLAIM", "role")
+TEACHER_ROLES = {role.strip() for role in os.getenv("AUTH_TEACHER_ROLES", "teacher,admin").split(",") if role.strip()}
+AUTH_CACHE_MAXSIZE = int(os.getenv("AUTH_CACHE_MAXSIZE", "10000"))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "300"))
+# Mode démonstration (ancien comportement) : jeton enseignant fixe, tout autre jeton = user_id
+AUTH_DEV_TOKENS = os.getenv("AUTH_DEV_TOKENS", "false").lower() in ("1", "true", "yes")
+AUTH_DEV_TEACHER_TOKEN = os.getenv("AUTH_DEV_TEACHER_TOKEN", "secret-teacher-token")
+
+HMAC_ALGORITHMS = ["HS256"]
+JWKS_ALGORITHMS = ["RS256", "ES256"]
+
+
+class AuthError(Exception):
+    pass
+
+
+class JWKSCache:
+    """Clés publiques du projet, rechargées après JWKS_TTL ou quand un kid inconnu apparaît (au plus une fois par minute)."""
+
+    def __init__(self, url: Optional[str], ttl: float = 3600, min_refresh_interval: float = 60):
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self._keys: Dict[str, Any] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    async def _refresh(self):
+        async with httpx.AsyncClient(timeout=5) as client:
+            response = await client.get(self.url)
+            response.raise_for_status()
+        keys = {}
+        for jwk in response.json().get("keys", []):
+            try:
+                keys[jwk.get("kid")] = jwt.PyJWK(jwk).key
+            except jwt.PyJWKError:
+                continue
+        self._keys = keys
+        self._loaded_at = time.monotonic()
+
+    async def get(self, kid: Optional[str]) -> Any:
+        if not self.url:
+            raise AuthError("Aucune méthode de vérification des jetons configurée")
+        age = time.monotonic() - self._loaded_at if self._loaded_at is not None else None
+        if age is None or age > self.ttl or (kid not in self._keys and age > self.min_refresh_interval):
+            async with self._lock:
+                age = time.monotonic() - self._loaded_at if self._loaded_at is not None else None
+                if age is None or age > self.ttl or (kid not in self._keys and age > self.min_refresh_interval):
+                    try:
+                        await self._refresh()
+                    except (httpx.HTTPError, ValueError) as exc:
+                        if not self._keys:
+                            raise AuthError(f"JWKS indisponible : {exc}")
+        key = self._keys.get(kid)
+        if key is None:
+            raise AuthError("Clé de signature inconnue")
+        return key
+
+
+jwks_cache = JWKSCache(SUPABASE_JWKS_URL, ttl=JWKS_TTL)
+# Claims déjà vérifiés, indexés par empreinte du jeton et expirés avec lui
+claims_cache = TTLCache(maxsize=AUTH_CACHE_MAXSIZE, ttl=AUTH_CACHE_TTL)
+
+
+def _decode(token: str, key: Any, algorithms: List[str]) -> Dict[str, Any]:
+    try:
+        return jwt.decode(
+            token, key, algorithms=algorithms, audience=JWT_AUDIENCE or None, leeway=JWT_LEEWAY,
+            options={"require": ["exp", "sub"], "verify_aud": bool(JWT_AUDIENCE)},
+        )
+    except jwt.PyJWTError as exc:
+        raise AuthError(str(exc))
+
+
+async def verify_token(token: str) -> Dict[str, Any]:
+    """Renvoie les claims d'un JWT valide (signature, expiration, audience) ; AuthError sinon."""
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    found, claims = claims_cache.get(digest)
+    if found:
+        claims_cache.hits += 1
+        return claims
+    claims_cache.misses += 1
+    try:
+        header = jwt.get_unverified_header(token)
+    except jwt.PyJWTError as exc:
+        raise AuthError(str(exc))
+    algorithm = header.get("alg")
+    if algorithm in HMAC_ALGORITHMS and SUPABASE_JWT_SECRET:
+        claims = _decode(token, SUPABASE_JWT_SECRET, HMAC_ALGORITHMS)
+    elif algorithm in JWKS_ALGORITHMS:
+        claims = _decode(token, await jwks_cache.get(header.get("kid")), JWKS_ALGORITHMS)
+    else:
+        raise AuthError(f"Algorithme non accepté : {algorithm}")
+    claims_cache.set(digest, claims, ttl=claims["exp"] - time.time())
+    return claims
+
+
+def user_from_claims(claims: Dict[str, Any]) -> Dict[str, Any]:
+    role = (claims.get("app_metadata") or {}).get(ROLE_CLAIM) or claims.get("user_role")
+    return {"user_id": claims["sub"], "email": claims.get("email"), "role": role or "student"}
+
+
+security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+
+async def _user_from_token(token: str) -> Dict[str, Any]:
+    if AUTH_DEV_TOKENS and "." not in token:
+        return {"user_id": token, "email": None, "role": "teacher" if token == AUTH_DEV_TEACHER_TOKEN else "student"}
+    try:
+        claims = await verify_token(token)
+    except AuthError as exc:
+        raise HTTPException(status_code=401, detail=f"Jeton invalide : {exc}", headers={"WWW-Authenticate": "Bearer"})
+    return user_from_claims(claims)
+
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, Any]:
+    return await _user_from_token(credentials.credentials)
+
+
+async def get_optional_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)) -> Optional[Dict[str, Any]]:
+    # Routes publiques enrichies pour un utilisateur connecté ; un jeton présent mais invalide reste refusé
+    if credentials is None:
+        return None
+    return await _user_from_token(credentials.credentials)
+
+
+async def get_current_teacher(user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+    if user["role"] not in TEACHER_ROLES:
+        raise HTTPException(status_code=403, detail="Not authorized as teacher")
+    return user
+
+
+def is_teacher(user: Dict[str, Any]) -> bool:
+    return user.get("role") in TEACHER_ROLES
+
+
+def auth_stats() -> Dict[str, Any]:
+    return claims_cache.stats()
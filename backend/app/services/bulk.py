@@ -0,0 +1,89 @@
+import asyncio
+import os
+import uuid
+from typing import Any, Dict, List, Tuple
+
+from app.services.repository import Repository
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "100"))
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "1000"))
+
+
+async def _insert_chunk(supabase: Repository, table: str, start: int, rows: List[Dict[str, Any]], retry: bool = False) -> List[Dict[str, Any]]:
+    # Nouvel essai en upsert sur l'id : si le paquet avait été écrit mais la réponse perdue, pas de doublon
+    query = supabase.table(table).upsert(rows, on_conflict="id") if retry else supabase.table(table).insert(rows)
+    response = await query.execute()
+    if not getattr(response, "error", None) and response.data and len(response.data) == len(rows):
+        return [{"index": start + i, "status": "created", "data": row} for i, row in enumerate(response.data)]
+    if len(rows) == 1:
+        error = getattr(response, "error", None) or "Aucune ligne créée"
+        return [{"index": start, "status": "error", "error": str(error)}]
+    # Un INSERT multi-lignes échoue en bloc : on réessaie ligne par ligne pour isoler les éléments fautifs
+    results = await asyncio.gather(*(_insert_chunk(supabase, table, start + i, [row], retry=True) for i, row in enumerate(rows)))
+    return [item for chunk in results for item in chunk]
+
+
+async def bulk_insert(supabase: Repository, table: str, rows: List[Dict[str, Any]], chunk_size: int = BULK_CHUNK_SIZE) -> Dict[str, Any]:
+    """Insère les lignes par paquets multi-lignes et renvoie un résultat par élément (échecs partiels inclus)."""
+    # Identifiants fixés avant le premier essai, pour que les nouvelles tentatives soient idempotentes
+    rows = [{**row, "id": row.get("id") or str(uuid.uuid4())} for row in rows]
+    chunks = [rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size)]
+    results = await asyncio.gather(*(_insert_chunk(supabase, table, i * chunk_size, chunk) for i, chunk in enumerate(chunks)))
+    items = [item for chunk in results for item in chunk]
+    created = sum(1 for item in items if item["status"] == "created")
+    return {"created": created, "failed": len(items) - created, "results": items}
+
+
+def created_rows(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [item["data"] for item in result["results"] if item["status"] == "created"]
+
+
+async def _grade_group(supabase: Repository, table: str, values: Dict[str, Any], items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # UPDATE des seules colonnes de note : les autres colonnes (et une note automatique concurrente
+    # sur une autre soumission) ne sont pas réécrites, et une soumission supprimée n'est pas recréée
+    response = await supabase.table(table).update(values).in_("id", [item["id"] for item in items]).execute()
+    if getattr(response, "error", None):
+        return [{"index": item["index"], "status": "error", "error": str(response.error)} for item in items]
+    updated = {row["id"]: row for row in response.data or []}
+    return [
+        {"index": item["index"], "status": "graded", "data": updated[item["id"]]}
+        if item["id"] in updated
+        else {"index": item["index"], "status": "not_found", "error": "Soumission introuvable"}
+        for item in items
+    ]
+
+
+async def _grade_chunk(supabase: Repository, table: str, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Un seul UPDATE ... WHERE id IN (...) par couple (score, feedback) du paquet : une requête pour tout
+    # un paquet de même note, au pire une par ligne si toutes les notes diffèrent
+    groups: Dict[Tuple[Any, Any], List[Dict[str, Any]]] = {}
+    for item in items:
+        groups.setdefault((item["score"], item["feedback"]), []).append(item)
+    results = await asyncio.gather(
+        *(_grade_group(supabase, table, {"score": score, "feedback": feedback}, group) for (score, feedback), group in groups.items())
+    )
+    return [item for group in results for item in group]
+
+
+async def bulk_grade(supabase: Repository, table: str, grades: List[Dict[str, Any]], chunk_size: int = BULK_CHUNK_SIZE) -> Dict[str, Any]:
+    """Applique une liste de notes {id, score, feedback} par paquets (UPDATE de score et feedback, groupé par note identique) avec un statut par élément."""
+    # En cas de doublon, la dernière note d'un même id l'emporte
+    latest: Dict[str, Dict[str, Any]] = {}
+    for index, grade in enumerate(grades):
+        latest[grade["id"]] = {**grade, "index": index}
+    items = list(latest.values())
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    results = await asyncio.gather(*(_grade_chunk(supabase, table, chunk) for chunk in chunks))
+    by_index = {item["index"]: item for chunk in results for item in chunk}
+    ordered = []
+    for index, grade in enumerate(grades):
+        if index in by_index:
+            ordered.append(by_index[index])
+        else:
+            ordered.append({"index": index, "status": "error", "error": "Remplacée par une note ultérieure du même lot"})
+    graded = sum(1 for item in ordered if item["status"] == "graded")
+    return {"graded": graded, "failed": len(ordered) - graded, "results": ordered}
+
+
+def graded_rows(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [item["data"] for item in result["results"] if item["status"] == "graded"]
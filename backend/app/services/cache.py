@@ -0,0 +1,201 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from app.services.repository import QueryBuilder, QueryResponse
+
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "60"))
+CATALOG_CACHE_MAXSIZE = int(os.getenv("CATALOG_CACHE_MAXSIZE", "1024"))
+
+
+def row_tag(table: str, row_id: Any) -> str:
+    return f"{table}:id:{row_id}"
+
+
+def scope_tag(table: str, scope: Any = "all") -> str:
+    return f"{table}:scope:{scope}"
+
+
+class TTLCache:
+    """Cache LRU avec expiration, invalidé par tags, qui fusionne les chargements concurrents d'une même clé."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any, Set[str]]]" = OrderedDict()
+        self._tags: Dict[str, Set[Hashable]] = {}
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires, value, _ = entry
+        if expires < time.monotonic():
+            self._remove(key)
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[str] = (), ttl: Optional[float] = None):
+        if key in self._entries:
+            self._remove(key)
+        tag_set = set(tags)
+        # ttl propre à l'entrée (ex. expiration d'un jeton), borné par celui du cache
+        lifetime = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._entries[key] = (time.monotonic() + lifetime, value, tag_set)
+        for tag in tag_set:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, *tags: str) -> int:
+        """Supprime toutes les entrées portant l'un des tags ; renvoie le nombre d'entrées supprimées."""
+        self._generation += 1
+        removed = 0
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+                removed += 1
+        self.invalidations += removed
+        return removed
+
+    def clear(self):
+        self._generation += 1
+        self._entries.clear()
+        self._tags.clear()
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Tuple[Any, Optional[List[str]]]]]) -> Any:
+        """Renvoie la valeur en cache ou la charge une seule fois pour tous les appelants concurrents.
+
+        loader renvoie (valeur, tags) ; tags=None signifie que la valeur ne doit pas être mise en cache.
+        """
+        found, value = self.get(key)
+        if found:
+            self.hits += 1
+            return value
+        pending = self._pending.get(key)
+        if pending is not None:
+            # Une requête identique est déjà en cours : on attend son résultat
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        generation = self._generation
+        try:
+            value, tags = await loader()
+            if tags is not None and generation == self._generation:
+                self.set(key, value, tags)
+            future.set_result(value)
+            return value
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Évite l'avertissement "exception never retrieved" si personne n'attendait
+            future.exception()
+            raise
+        finally:
+            del self._pending[key]
+
+    async def execute(self, query: QueryBuilder, tags: Iterable[str] = ()) -> QueryResponse:
+        """Exécute une requête de lecture en passant par le cache (clé = table, filtres, tri et plage)."""
+        key = (query.table, query.is_single, tuple(query.build_params()))
+
+        async def load() -> Tuple[QueryResponse, Optional[List[str]]]:
+            response = await query.execute()
+            if getattr(response, "error", None) or response.data is None:
+                return response, None
+            return response, self._tags_for(query.table, response.data, tags)
+
+        return await self.get_or_load(key, load)
+
+    @staticmethod
+    def _tags_for(table: str, data: Any, tags: Iterable[str]) -> List[str]:
+        # Chaque entrée est aussi taguée par les lignes qu'elle contient, pour invalider précisément
+        result = list(tags)
+        rows = data if isinstance(data, list) else [data]
+        for row in rows:
+            if isinstance(row, dict) and "id" in row:
+                result.append(row_tag(table, row["id"]))
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Cache du catalogue (cours, leçons, exercices, tests, projets) partagé par le worker
+catalog_cache = TTLCache(maxsize=CATALOG_CACHE_MAXSIZE, ttl=CATALOG_CACHE_TTL)
+
+# Caches dérivés des lignes du catalogue, invalidés avec lui
+_row_caches: List[TTLCache] = [catalog_cache]
+
+
+def register_row_cache(cache: TTLCache):
+    _row_caches.append(cache)
+
+
+def invalidate_rows(table: str, rows: Optional[List[Dict[str, Any]]], *scopes: Any):
+    """Invalide les lignes écrites ainsi que les listes (scopes) dans lesquelles elles peuvent apparaître."""
+    tags = [row_tag(table, row["id"]) for row in rows or [] if isinstance(row, dict) and "id" in row]
+    tags.extend(scope_tag(table, scope) for scope in scopes)
+    for cache in _row_caches:
+        cache.invalidate(*tags)
+
+
+class KeyedLocks:
+    """Un verrou asyncio par clé, supprimé dès que plus personne ne l'attend (pas de croissance sans borne)."""
+
+    def __init__(self):
+        self._locks: Dict[Hashable, Tuple[asyncio.Lock, int]] = {}
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable) -> AsyncIterator[None]:
+        lock, users = self._locks.get(key, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._locks[key] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._locks[key]
+            if users == 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, users - 1)
+
+    def __len__(self) -> int:
+        return len(self._locks)
@@ -0,0 +1,187 @@
+import gzip
+import os
+import zlib
+from typing import Any, Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.cache import TTLCache, register_row_cache
+
+try:
+    import brotli
+except ImportError:  # brotli optionnel : sans lui, seul gzip est proposé
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+# Les corps précompressés ne sont calculés qu'une fois : on peut viser la compression maximale
+PRECOMPRESSED_GZIP_LEVEL = int(os.getenv("PRECOMPRESSED_GZIP_LEVEL", "9"))
+PRECOMPRESSED_BROTLI_QUALITY = int(os.getenv("PRECOMPRESSED_BROTLI_QUALITY", "11"))
+PRECOMPRESSED_CACHE_TTL = float(os.getenv("PRECOMPRESSED_CACHE_TTL", "3600"))
+PRECOMPRESSED_CACHE_MAXSIZE = int(os.getenv("PRECOMPRESSED_CACHE_MAXSIZE", "2048"))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/x-ndjson", "application/javascript")
+
+
+def supported_encodings() -> List[str]:
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Encodage préféré parmi ceux acceptés par le client (valeurs q respectées, br prioritaire à q égal)."""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in supported_encodings():
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(body: bytes, encoding: str, precompressed: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=PRECOMPRESSED_BROTLI_QUALITY if precompressed else BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=PRECOMPRESSED_GZIP_LEVEL if precompressed else GZIP_LEVEL, mtime=0)
+
+
+# Corps précompressés des lectures unitaires, indexés par (ETag, encodage) et invalidés avec la ligne
+precompressed_cache = TTLCache(maxsize=PRECOMPRESSED_CACHE_MAXSIZE, ttl=PRECOMPRESSED_CACHE_TTL)
+register_row_cache(precompressed_cache)
+
+
+def precompressed_body(body: bytes, etag: str, encoding: str, tags: List[str]) -> bytes:
+    key = (etag, encoding)
+    found, value = precompressed_cache.get(key)
+    if found:
+        precompressed_cache.hits += 1
+        return value
+    precompressed_cache.misses += 1
+    value = compress(body, encoding, precompressed=True)
+    precompressed_cache.set(key, value, tags)
+    return value
+
+
+class _StreamCompressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+class CompressionMiddleware:
+    """Compression gzip / brotli négociée des réponses, au-delà d'une taille minimale.
+
+    Les réponses déjà encodées (exports gzip, corps précompressés) passent telles quelles.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressionResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send: Send = None
+        self.start: Optional[Message] = None
+        self.passthrough = False
+        self.compressor: Optional[_StreamCompressor] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.send = send
+        await self.app(scope, receive, self._send)
+
+    def _eligible(self, headers: Headers) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return any(content_type.startswith(prefix) for prefix in COMPRESSIBLE_TYPES)
+
+    def _set_encoding_headers(self, headers: MutableHeaders):
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        # La représentation encodée n'est plus identique octet pour octet : ETag faible
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = "W/" + etag
+
+    async def _send(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            self.passthrough = not self._eligible(Headers(raw=message["headers"]))
+            if self.passthrough:
+                await self.send(message)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        headers = MutableHeaders(raw=self.start["headers"])
+        if self.compressor is None and not more_body:
+            # Réponse complète : compressée seulement au-delà du seuil
+            if len(body) < self.minimum_size:
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send(message)
+                return
+            body = compress(body, self.encoding)
+            self._set_encoding_headers(headers)
+            headers["Content-Length"] = str(len(body))
+            await self.send(self.start)
+            await self.send({"type": "http.response.body", "body": body})
+            return
+        if self.compressor is None:
+            # Réponse en flux : compression au fil de l'eau
+            self.compressor = _StreamCompressor(self.encoding)
+            self._set_encoding_headers(headers)
+            if "content-length" in headers:
+                del headers["content-length"]
+            await self.send(self.start)
+        data = self.compressor.compress(body)
+        if not more_body:
+            data += self.compressor.flush()
+        if data or not more_body:
+            await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+
+def compression_stats() -> Dict[str, Any]:
+    return {"encodings": supported_encodings(), "minimum_size": COMPRESSION_MIN_SIZE, "precompressed": precompressed_cache.stats()}
@@ -0,0 +1,73 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from app.services.cache import catalog_cache, scope_tag
+from app.services.fields import select_columns
+from app.services.repository import QueryResponse, Repository
+
+
+async def _progress(supabase: Repository, user_id: str) -> QueryResponse:
+    # Progression propre à l'utilisateur : jamais mise en cache partagé
+    return await supabase.table("user_progress").select("lesson_id,completed_at").eq("user_id", user_id).execute()
+
+
+async def load_course_tree(supabase: Repository, course_id: str, fields: Optional[str] = "summary", user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Cours avec ses leçons ordonnées (et leurs exercices), ses tests et projets publiés ; None si le cours n'existe pas.
+
+    Les requêtes partent en parallèle (mêmes clés et tags de cache que les routes unitaires) :
+    la latence est celle de la plus lente.
+    """
+    lesson_columns = select_columns("lessons", fields, required=["id", "order_index"])
+    exercise_columns = select_columns("exercises", fields, required=["id", "lesson_id"])
+    queries = [
+        catalog_cache.execute(supabase.table("courses").select(select_columns("courses", fields)).eq("id", course_id).single()),
+        catalog_cache.execute(
+            supabase.table("lessons").select(lesson_columns).eq("course_id", course_id).eq("is_hidden", False).order("order_index"),
+            tags=[scope_tag("lessons", course_id)],
+        ),
+        catalog_cache.execute(
+            supabase.table("exercises").select(exercise_columns).eq("course_id", course_id).eq("is_hidden", False).order("created_at").order("id"),
+            tags=[scope_tag("exercises", course_id)],
+        ),
+        catalog_cache.execute(
+            supabase.table("tests").select("*").eq("course_id", course_id).eq("is_published", True),
+            tags=[scope_tag("tests")],
+        ),
+        catalog_cache.execute(
+            supabase.table("projects").select("*").eq("course_id", course_id).eq("is_published", True),
+            tags=[scope_tag("projects")],
+        ),
+    ]
+    if user_id:
+        queries.append(_progress(supabase, user_id))
+    responses = await asyncio.gather(*queries)
+    for response in responses:
+        if getattr(response, "error", None):
+            raise RuntimeError(str(response.error))
+    course, lessons, exercises, tests, projects = (response.data for response in responses[:5])
+    if not course:
+        return None
+
+    by_lesson: Dict[str, List[Dict[str, Any]]] = {}
+    course_exercises: List[Dict[str, Any]] = []
+    lesson_ids = {lesson["id"] for lesson in lessons}
+    for exercise in exercises:
+        if exercise.get("lesson_id") in lesson_ids:
+            by_lesson.setdefault(exercise["lesson_id"], []).append(exercise)
+        else:
+            course_exercises.append(exercise)
+    tree_lessons = [{**lesson, "exercises": by_lesson.get(lesson["id"], [])} for lesson in lessons]
+    tree = {**course, "lessons": tree_lessons, "exercises": course_exercises, "tests": tests, "projects": projects}
+
+    if user_id:
+        completed = {row["lesson_id"]: row.get("completed_at") for row in responses[5].data if row.get("lesson_id") in lesson_ids}
+        for lesson in tree_lessons:
+            lesson["completed"] = lesson["id"] in completed
+            lesson["completed_at"] = completed.get(lesson["id"])
+        total = len(tree_lessons)
+        tree["progress"] = {
+            "completed_lessons": len(completed),
+            "total_lessons": total,
+            "percent": round(100 * len(completed) / total) if total else 0,
+        }
+    return tree
@@ -0,0 +1,163 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.cache import KeyedLocks, catalog_cache, scope_tag
+from app.services.pagination import fetch_all
+from app.services.progress_summary import load_course_indexes, load_lesson_courses
+from app.services.repository import Repository
+
+DASHBOARD_SUMMARY_TTL = float(os.getenv("DASHBOARD_SUMMARY_TTL", "300"))
+DASHBOARD_SUMMARY_MAXSIZE = int(os.getenv("DASHBOARD_SUMMARY_MAXSIZE", "10000"))
+RECENT_ACTIVITY_SIZE = 10
+UPCOMING_DEADLINES_SIZE = 5
+
+
+class UserSummary:
+    """Résumé du tableau de bord d'un utilisateur, mis à jour à chaque écriture."""
+
+    def __init__(self):
+        self.completed_lessons: set = set()
+        self.submitted_tests: set = set()
+        # Score par soumission, pour pouvoir corriger la moyenne quand une note change
+        self.scores: Dict[Tuple[str, str], float] = {}
+        self.score_total = 0.0
+        self.activity: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.built_at = time.monotonic()
+
+    def set_score(self, kind: str, row_id: str, score: Optional[float]):
+        key = (kind, row_id)
+        previous = self.scores.pop(key, None)
+        if previous is not None:
+            self.score_total -= previous
+        if score is not None:
+            self.scores[key] = score
+            self.score_total += score
+
+    def add_activity(self, kind: str, row: Dict[str, Any], key: Optional[str] = None):
+        self.activity[(kind, key or row["id"])] = {"id": row.get("id"), "type": kind, "date": row.get("created_at")}
+        if len(self.activity) > RECENT_ACTIVITY_SIZE:
+            oldest = min(self.activity, key=lambda k: self.activity[k]["date"] or "")
+            del self.activity[oldest]
+
+    def apply(self, event: str, row: Dict[str, Any]):
+        # Chaque évènement est idempotent (clé = id de la ligne), on peut donc le rejouer
+        if event == "lesson_completed":
+            self.completed_lessons.add(row["lesson_id"])
+            # Une ligne par (utilisateur, leçon) : l'activité est indexée par leçon (l'id manque tant que l'écriture est différée)
+            self.add_activity("lesson", {**row, "created_at": row.get("completed_at") or row.get("created_at")}, key=row["lesson_id"])
+        elif event == "submission":
+            self.add_activity("submission", row)
+            self.set_score("submission", row["id"], row.get("score"))
+        elif event == "graded":
+            self.set_score("submission", row["id"], row.get("score"))
+        elif event == "test_submission":
+            self.submitted_tests.add(row["test_id"])
+            self.add_activity("test_submission", row)
+            self.set_score("test_submission", row["id"], row.get("score"))
+
+    @property
+    def average_score(self) -> Optional[float]:
+        if not self.scores:
+            return None
+        return round(self.score_total / len(self.scores), 2)
+
+    def recent_activity(self) -> List[Dict[str, Any]]:
+        return sorted(self.activity.values(), key=lambda a: a["date"] or "", reverse=True)
+
+
+class SummaryStore:
+    """Résumés par utilisateur en mémoire (LRU + TTL), reconstruits depuis les tables en cas d'absence."""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._summaries: "OrderedDict[str, UserSummary]" = OrderedDict()
+        self._rebuilding: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+        self._locks = KeyedLocks()
+
+    def record(self, user_id: str, event: str, row: Dict[str, Any]):
+        """Applique une écriture au résumé de l'utilisateur s'il est chargé (sinon la reconstruction la verra)."""
+        if user_id in self._rebuilding:
+            self._rebuilding[user_id].append((event, row))
+        summary = self._summaries.get(user_id)
+        if summary is not None:
+            summary.apply(event, row)
+
+    def record_many(self, event: str, rows: List[Dict[str, Any]]):
+        for row in rows:
+            if row.get("user_id"):
+                self.record(row["user_id"], event, row)
+
+    def invalidate(self, user_id: str):
+        self._summaries.pop(user_id, None)
+
+    async def get(self, supabase: Repository, user_id: str) -> UserSummary:
+        summary = self._summaries.get(user_id)
+        if summary is not None and time.monotonic() - summary.built_at < self.ttl:
+            self._summaries.move_to_end(user_id)
+            return summary
+        return await self.rebuild(supabase, user_id, force=False)
+
+    async def rebuild(self, supabase: Repository, user_id: str, force: bool = True) -> UserSummary:
+        """Reconstruction complète depuis user_progress, submissions et test_submissions (chemin de réparation)."""
+        async with self._locks.hold(user_id):
+            summary = self._summaries.get(user_id)
+            if not force and summary is not None and time.monotonic() - summary.built_at < self.ttl:
+                # Reconstruit entre-temps par une requête concurrente
+                return summary
+            self._rebuilding[user_id] = []
+            try:
+                # Pages keyset : un utilisateur très actif dépasse le plafond de lignes de PostgREST
+                progress, submissions, test_submissions = await asyncio.gather(
+                    fetch_all(lambda: supabase.table("user_progress").select("id,lesson_id,completed_at").eq("user_id", user_id)),
+                    fetch_all(lambda: supabase.table("submissions").select("id,score,created_at").eq("user_id", user_id)),
+                    fetch_all(lambda: supabase.table("test_submissions").select("id,test_id,score,created_at").eq("user_id", user_id)),
+                )
+                summary = UserSummary()
+                for row in progress:
+                    summary.apply("lesson_completed", row)
+                for row in submissions:
+                    summary.apply("submission", row)
+                for row in test_submissions:
+                    summary.apply("test_submission", row)
+                # Rejoue les écritures arrivées pendant la lecture
+                for event, row in self._rebuilding[user_id]:
+                    summary.apply(event, row)
+            finally:
+                del self._rebuilding[user_id]
+            self._summaries[user_id] = summary
+            self._summaries.move_to_end(user_id)
+            while len(self._summaries) > self.maxsize:
+                self._summaries.popitem(last=False)
+            return summary
+
+
+summary_store = SummaryStore(maxsize=DASHBOARD_SUMMARY_MAXSIZE, ttl=DASHBOARD_SUMMARY_TTL)
+
+
+async def course_progress(supabase: Repository, summary: UserSummary) -> Tuple[int, int]:
+    """(leçons terminées, leçons au total) sur les cours commencés par l'utilisateur, leçons visibles uniquement."""
+    lesson_courses = await load_lesson_courses(supabase)
+    completed = [(lesson_courses[lesson_id], lesson_id) for lesson_id in summary.completed_lessons if lesson_id in lesson_courses]
+    indexes = await load_course_indexes(supabase, sorted({course_id for course_id, _ in completed}))
+    visible = [course_id for course_id, lesson_id in completed if lesson_id in indexes[course_id].positions]
+    return len(visible), sum(len(indexes[course_id].lesson_ids) for course_id in set(visible))
+
+
+async def upcoming_deadlines(supabase: Repository, summary: UserSummary) -> List[str]:
+    # Même requête que GET /tests : partage l'entrée du cache catalogue
+    query = supabase.table("tests").select("*").eq("is_published", True)
+    response = await catalog_cache.execute(query, tags=[scope_tag("tests")])
+    if getattr(response, "error", None):
+        raise RuntimeError(str(response.error))
+    now = datetime.now(timezone.utc).isoformat()
+    deadlines = sorted(
+        test["end_date"]
+        for test in response.data
+        if test.get("end_date") and test["end_date"] >= now and test["id"] not in summary.submitted_tests
+    )
+    return deadlines[:UPCOMING_DEADLINES_SIZE]
@@ -0,0 +1,88 @@
+import csv
+import io
+import json
+import logging
+import os
+import zlib
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from app.services.pagination import apply_keyset, batch_size, paginate
+from app.services.repository import QueryBuilder, QueryResponse
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK_SIZE = batch_size(int(os.getenv("EXPORT_CHUNK_SIZE", "500")))
+EXPORT_KEYS = (("created_at", False), ("id", False))
+
+# Colonnes exportées par table (ordre des colonnes CSV)
+EXPORT_COLUMNS = {
+    "submissions": ["id", "user_id", "exercise_id", "score", "feedback", "created_at", "code", "output"],
+    "test_submissions": ["id", "user_id", "test_id", "score", "answers", "created_at"],
+    "project_submissions": ["id", "user_id", "project_id", "score", "feedback", "content", "created_at"],
+}
+
+
+class ExportError(Exception):
+    pass
+
+
+async def fetch_chunks(build_query: Callable[[], QueryBuilder], chunk_size: int = EXPORT_CHUNK_SIZE, first: Optional[QueryResponse] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Parcourt la table par pages keyset ; une seule page est en mémoire à la fois."""
+    chunk_size = batch_size(chunk_size)
+    cursor = None
+    response = first
+    while True:
+        if response is None:
+            response = await apply_keyset(build_query(), EXPORT_KEYS, cursor, chunk_size).execute()
+        if getattr(response, "error", None):
+            raise ExportError(str(response.error))
+        rows, cursor = paginate(response.data, EXPORT_KEYS, chunk_size)
+        if rows:
+            yield rows
+        if not cursor:
+            return
+        response = None
+
+
+def _cell(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return "" if value is None else value
+
+
+def encode_csv(rows: List[Dict[str, Any]], columns: List[str], header: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_cell(row.get(column)) for column in columns])
+    return buffer.getvalue().encode("utf-8")
+
+
+def encode_ndjson(rows: List[Dict[str, Any]], columns: List[str]) -> bytes:
+    return "".join(json.dumps({c: row.get(c) for c in columns}, ensure_ascii=False, default=str) + "\n" for row in rows).encode("utf-8")
+
+
+async def stream_export(chunks: AsyncIterator[List[Dict[str, Any]]], columns: List[str], fmt: str, gzip: bool) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=31) if gzip else None
+    try:
+        if fmt == "csv":
+            # En-tête émis même si l'export est vide
+            yield _compress(compressor, encode_csv([], columns, header=True))
+        async for rows in chunks:
+            data = encode_csv(rows, columns, header=False) if fmt == "csv" else encode_ndjson(rows, columns)
+            output = _compress(compressor, data)
+            if output:
+                yield output
+    except ExportError:
+        # Le statut HTTP est déjà envoyé : on coupe la connexion (sans fin gzip ni dernier bloc chunked)
+        # pour que le téléchargement échoue côté client au lieu de livrer un fichier tronqué mais valide
+        logger.exception("Export interrompu")
+        raise
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def _compress(compressor, data: bytes) -> bytes:
+    return compressor.compress(data) if compressor is not None else data
@@ -0,0 +1,81 @@
+from typing import Any, Dict, Iterable, List, Optional, Type, Union
+
+from fastapi import HTTPException
+from pydantic import BaseModel, create_model
+
+from app.schemas.course import CourseRead, CourseSummary
+from app.schemas.exercise import ExerciseRead, ExerciseSummary
+from app.schemas.lesson import LessonRead, LessonSummary
+
+# Projections nommées par table : "summary" pour les cartes et listes, "full" pour toutes les colonnes
+PROJECTIONS: Dict[str, Dict[str, Type[BaseModel]]] = {
+    "courses": {"summary": CourseSummary, "full": CourseRead},
+    "lessons": {"summary": LessonSummary, "full": LessonRead},
+    "exercises": {"summary": ExerciseSummary, "full": ExerciseRead},
+}
+
+FIELDS_DESCRIPTION = "Projection (`summary`, `full`) ou liste de colonnes séparées par des virgules"
+
+# Modèles des listes de colonnes : celles du modèle complet, toutes facultatives
+_PARTIAL_MODELS: Dict[str, Type[BaseModel]] = {}
+
+
+def model_columns(model: Type[BaseModel]) -> List[str]:
+    fields = getattr(model, "model_fields", None) or model.__fields__
+    return list(fields)
+
+
+def select_columns(table: str, fields: Optional[str], required: Iterable[str] = ("id",)) -> str:
+    """Traduit le paramètre fields= en select PostgREST ; les colonnes requises (id, clés de tri) sont toujours incluses."""
+    projections = PROJECTIONS[table]
+    if not fields or fields == "full":
+        return "*"
+    if fields in projections:
+        columns = model_columns(projections[fields])
+    else:
+        allowed = set(model_columns(projections["full"]))
+        columns = [column.strip() for column in fields.split(",") if column.strip()]
+        unknown = [column for column in columns if column not in allowed]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Champs inconnus : {', '.join(unknown)}")
+    for column in required:
+        if column not in columns:
+            columns.append(column)
+    return ",".join(dict.fromkeys(columns))
+
+
+def projection_model(table: str, fields: Optional[str]) -> Type[BaseModel]:
+    projections = PROJECTIONS[table]
+    if not fields:
+        return projections["full"]
+    if fields in projections:
+        return projections[fields]
+    if table not in _PARTIAL_MODELS:
+        full = projections["full"]
+        model_fields = getattr(full, "model_fields", None) or full.__fields__
+        columns = {name: (Optional[getattr(field, "annotation", None) or field.outer_type_], None) for name, field in model_fields.items()}
+        _PARTIAL_MODELS[table] = create_model(f"{full.__name__}Columns", **columns)
+    return _PARTIAL_MODELS[table]
+
+
+def projection_responses(table: str, many: bool = False) -> Dict[int, Dict[str, Any]]:
+    """Documentation OpenAPI des routes à projection : la réponse suit le modèle `full` ou `summary` selon fields=."""
+    projections = PROJECTIONS[table]
+    model: Any = Union[projections["full"], projections["summary"]]
+    return {200: {"model": List[model] if many else model, "description": "Lignes projetées selon fields="}}
+
+
+def project_rows(table: str, fields: Optional[str], data: Union[Dict[str, Any], List[Dict[str, Any]]]) -> Any:
+    """Valide les lignes avec le modèle de la projection et ne garde que ses colonnes (rôle de response_model
+    pour les routes qui renvoient directement une Response encodée en orjson)."""
+    model = projection_model(table, fields)
+    # Liste de colonnes : seules celles lues sont renvoyées, sans valeurs par défaut
+    partial = model is _PARTIAL_MODELS.get(table)
+    validate = getattr(model, "model_validate", None) or model.parse_obj
+
+    def project(row: Dict[str, Any]) -> Dict[str, Any]:
+        instance = validate(row)
+        dump = getattr(instance, "model_dump", None) or instance.dict
+        return dump(exclude_unset=partial)
+
+    return [project(row) for row in data] if isinstance(data, list) else project(data)
@@ -0,0 +1,177 @@
+import asyncio
+import os
+import warnings
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import orjson
+
+from app.services.cache import TTLCache, catalog_cache, register_row_cache, row_tag, scope_tag
+from app.services.export import ExportError, fetch_chunks
+from app.services.repository import Repository
+
+GRADEBOOK_CACHE_TTL = float(os.getenv("GRADEBOOK_CACHE_TTL", "300"))
+GRADEBOOK_CACHE_MAXSIZE = int(os.getenv("GRADEBOOK_CACHE_MAXSIZE", "64"))
+PERCENTILES = (25, 50, 75, 90)
+
+# Carnets de notes sérialisés, par (cours, règle) : invalidés quand une note change ou que les exercices / tests du cours changent
+gradebook_cache = TTLCache(maxsize=GRADEBOOK_CACHE_MAXSIZE, ttl=GRADEBOOK_CACHE_TTL)
+register_row_cache(gradebook_cache)
+
+
+def _item_codes(item_ids: np.ndarray, values: np.ndarray) -> np.ndarray:
+    # Colonne de chaque note dans la matrice, sans dictionnaire : recherche dichotomique dans les identifiants triés
+    order = np.argsort(item_ids)
+    return order[np.searchsorted(item_ids[order], values)]
+
+
+def score_matrix(users: np.ndarray, items: np.ndarray, scores: np.ndarray, shape: Tuple[int, int], rule: str = "best") -> np.ndarray:
+    """Matrice (élèves x éléments) des notes retenues ; NaN sans tentative notée.
+
+    Les tentatives doivent être triées chronologiquement : `latest` garde la dernière de chaque case.
+    """
+    matrix = np.full(shape, np.nan)
+    if rule == "best":
+        np.fmax.at(matrix, (users, items), scores)
+    else:
+        cells = users * shape[1] + items
+        _, from_end = np.unique(cells[::-1], return_index=True)
+        last = len(cells) - 1 - from_end
+        matrix[users[last], items[last]] = scores[last]
+    return matrix
+
+
+def item_stats(matrix: np.ndarray) -> Dict[str, np.ndarray]:
+    """Statistiques par colonne sur les cases notées (NaN pour une colonne sans note)."""
+    graded = ~np.isnan(matrix)
+    counts = graded.sum(axis=0)
+    students = matrix.shape[0]
+    with warnings.catch_warnings():
+        # Colonne sans aucune note : NaN attendu, sans avertissement
+        warnings.simplefilter("ignore", RuntimeWarning)
+        percentiles = np.nanpercentile(matrix, PERCENTILES, axis=0) if students else np.full((len(PERCENTILES), matrix.shape[1]), np.nan)
+        stats = {
+            "mean": np.nanmean(matrix, axis=0),
+            "min": np.nanmin(matrix, axis=0) if students else np.full(matrix.shape[1], np.nan),
+            "max": np.nanmax(matrix, axis=0) if students else np.full(matrix.shape[1], np.nan),
+        }
+    stats.update({f"p{p}": values for p, values in zip(PERCENTILES, percentiles)})
+    stats["median"] = stats.pop("p50")
+    stats["graded"] = counts
+    stats["completion_rate"] = counts / students if students else np.zeros(matrix.shape[1])
+    return stats
+
+
+def _nullable(values: np.ndarray, decimals: int = 2) -> List[Any]:
+    # NaN -> null en JSON, sans boucle Python sur les valeurs
+    result = np.round(values, decimals).astype(object)
+    result[np.isnan(values)] = None
+    return result.tolist()
+
+
+def _columns(rows: List[Dict[str, Any]], item_column: str, item_ids: np.ndarray, offset: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    users = np.array([row["user_id"] for row in rows], dtype=object)
+    items = _item_codes(item_ids, np.array([row[item_column] for row in rows], dtype=object)) + offset if rows else np.zeros(0, dtype=np.int64)
+    scores = np.array([row.get("score") for row in rows], dtype=float)
+    return users, items, scores
+
+
+async def _fetch_scores(supabase: Repository, table: str, item_column: str, item_ids: List[str]) -> List[Dict[str, Any]]:
+    if not item_ids:
+        return []
+    rows: List[Dict[str, Any]] = []
+    try:
+        # Pages keyset triées par created_at : l'ordre chronologique sert à la règle `latest`
+        build = lambda: supabase.table(table).select(f"id,user_id,{item_column},score,created_at").in_(item_column, item_ids)
+        async for chunk in fetch_chunks(build):
+            rows.extend(chunk)
+    except ExportError as exc:
+        raise RuntimeError(str(exc))
+    return rows
+
+
+async def build_gradebook(supabase: Repository, course_id: str, rule: str = "best") -> Optional[Dict[str, Any]]:
+    """Carnet de notes du cours (None si le cours n'existe pas) : élèves x exercices puis tests, et statistiques par élément."""
+    course, exercises, tests = await asyncio.gather(
+        catalog_cache.execute(supabase.table("courses").select("id").eq("id", course_id).single()),
+        catalog_cache.execute(
+            supabase.table("exercises").select("id,title").eq("course_id", course_id).eq("is_hidden", False).order("created_at").order("id"),
+            tags=[scope_tag("exercises", course_id)],
+        ),
+        catalog_cache.execute(
+            supabase.table("tests").select("id,title").eq("course_id", course_id).order("created_at").order("id"),
+            tags=[scope_tag("tests")],
+        ),
+    )
+    for response in (course, exercises, tests):
+        if getattr(response, "error", None):
+            raise RuntimeError(str(response.error))
+    if not course.data:
+        return None
+
+    exercise_ids = [row["id"] for row in exercises.data]
+    test_ids = [row["id"] for row in tests.data]
+    items = [{"id": row["id"], "type": "exercise", "title": row.get("title")} for row in exercises.data]
+    items += [{"id": row["id"], "type": "test", "title": row.get("title")} for row in tests.data]
+    submissions, test_submissions = await asyncio.gather(
+        _fetch_scores(supabase, "submissions", "exercise_id", exercise_ids),
+        _fetch_scores(supabase, "test_submissions", "test_id", test_ids),
+    )
+
+    # Colonnes : utilisateur, élément (exercices puis tests), note ; chaque table reste en ordre chronologique
+    parts = [
+        _columns(submissions, "exercise_id", np.array(exercise_ids, dtype=object), 0),
+        _columns(test_submissions, "test_id", np.array(test_ids, dtype=object), len(exercise_ids)),
+    ]
+    users, item_codes, scores = (np.concatenate(column) for column in zip(*parts))
+    graded = ~np.isnan(scores)
+    # Élèves : ceux qui ont au moins une tentative notée dans le cours
+    students, user_codes = np.unique(users[graded].astype(str), return_inverse=True)
+    matrix = score_matrix(user_codes, item_codes[graded], scores[graded], (len(students), len(items)), rule)
+    stats = item_stats(matrix)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        averages = np.nanmean(matrix, axis=1) if len(items) else np.full(len(students), np.nan)
+
+    stat_columns = {name: _nullable(values) if name != "graded" else values.tolist() for name, values in stats.items()}
+    rows = _nullable(matrix)
+    average_values = _nullable(averages)
+    return {
+        "course_id": course_id,
+        "rule": rule,
+        "items": items,
+        "students": [
+            {"user_id": user_id, "scores": rows[i], "average": average_values[i]}
+            for i, user_id in enumerate(students.tolist())
+        ],
+        "stats": [
+            {"item_id": item["id"], **{name: values[j] for name, values in stat_columns.items()}}
+            for j, item in enumerate(items)
+        ],
+    }
+
+
+async def get_gradebook(supabase: Repository, course_id: str, rule: str = "best") -> Optional[bytes]:
+    """Carnet de notes sérialisé (JSON), calculé une fois puis servi depuis le cache jusqu'au prochain changement de note."""
+
+    async def load() -> Tuple[Optional[bytes], Optional[List[str]]]:
+        gradebook = await build_gradebook(supabase, course_id, rule)
+        if gradebook is None:
+            return None, None
+        tags = [row_tag("courses", course_id), scope_tag("exercises", course_id), scope_tag("tests")]
+        tags += [row_tag("exercises" if item["type"] == "exercise" else "tests", item["id"]) for item in gradebook["items"]]
+        return orjson.dumps(gradebook), tags
+
+    return await gradebook_cache.get_or_load((course_id, rule), load)
+
+
+def invalidate_gradebooks(rows: List[Dict[str, Any]]):
+    """À appeler quand des notes changent (lignes de submissions ou test_submissions)."""
+    tags = set()
+    for row in rows:
+        if row.get("exercise_id"):
+            tags.add(row_tag("exercises", row["exercise_id"]))
+        if row.get("test_id"):
+            tags.add(row_tag("tests", row["test_id"]))
+    if tags:
+        gradebook_cache.invalidate(*tags)
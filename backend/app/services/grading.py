@@ -0,0 +1,344 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from app.services.cache import catalog_cache, row_tag
+from app.services.dashboard_summary import summary_store
+from app.services.gradebook import invalidate_gradebooks
+from app.services.metrics import registry
+from app.services.repository import Repository
+
+logger = logging.getLogger(__name__)
+
+GRADING_PROCESSES = int(os.getenv("GRADING_PROCESSES", "2"))
+GRADING_CONCURRENCY = int(os.getenv("GRADING_CONCURRENCY", "4"))
+GRADING_QUEUE_SIZE = int(os.getenv("GRADING_QUEUE_SIZE", "1000"))
+GRADING_MAX_PER_EXERCISE = int(os.getenv("GRADING_MAX_PER_EXERCISE", "2"))
+GRADING_MAX_ATTEMPTS = int(os.getenv("GRADING_MAX_ATTEMPTS", "3"))
+GRADING_RETRY_DELAY = float(os.getenv("GRADING_RETRY_DELAY", "1"))
+GRADING_JOB_HISTORY = int(os.getenv("GRADING_JOB_HISTORY", "10000"))
+
+
+# --- Correction (exécutée dans les processus du pool : fonctions pures, arguments sérialisables) ---
+
+def normalize_output(text: Any) -> str:
+    """Fins de ligne unifiées, espaces de fin de ligne et lignes vides en début/fin ignorés."""
+    lines = str(text or "").replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    lines = [line.rstrip() for line in lines]
+    while lines and not lines[-1]:
+        lines.pop()
+    while lines and not lines[0]:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def _contains_block(output: str, expected: str) -> bool:
+    # Le bloc de lignes attendu doit apparaître tel quel dans la sortie
+    if not expected:
+        return True
+    haystack, needle = output.split("\n"), expected.split("\n")
+    return any(haystack[i:i + len(needle)] == needle for i in range(len(haystack) - len(needle) + 1))
+
+
+def _case_outputs(output: Optional[str], count: int) -> Optional[List[Any]]:
+    # Sortie structurée : tableau JSON avec une sortie par cas de test
+    try:
+        parsed = json.loads(output or "")
+    except ValueError:
+        return None
+    return parsed if isinstance(parsed, list) and len(parsed) == count else None
+
+
+def grade_output(output: Optional[str], expected_output: Optional[str], test_cases: Optional[List[Dict[str, Any]]], max_score: Optional[int]) -> Tuple[Optional[int], str]:
+    """Compare la sortie d'une soumission à la sortie attendue et aux cas de test ; renvoie (score, feedback)."""
+    test_cases = [case for case in test_cases or [] if case.get("expected_output") is not None]
+    checks: List[Tuple[str, str, str, bool]] = []
+    actual = normalize_output(output)
+    if expected_output is not None:
+        expected = normalize_output(expected_output)
+        checks.append(("Sortie", expected, actual, actual == expected))
+    per_case = _case_outputs(output, len(test_cases))
+    for index, case in enumerate(test_cases, start=1):
+        expected = normalize_output(case["expected_output"])
+        if per_case is not None:
+            case_actual = normalize_output(per_case[index - 1])
+            checks.append((f"Cas {index}", expected, case_actual, case_actual == expected))
+        else:
+            checks.append((f"Cas {index}", expected, actual, _contains_block(actual, expected)))
+    if not checks:
+        return None, "Aucune sortie attendue : correction manuelle"
+    passed = sum(1 for check in checks if check[3])
+    score = round((max_score if max_score is not None else 100) * passed / len(checks))
+    feedback = f"{passed}/{len(checks)} vérifications réussies"
+    failed = next((check for check in checks if not check[3]), None)
+    if failed:
+        label, expected, got, _ = failed
+        feedback += f". {label} : attendu « {expected[:200]} », obtenu « {got[:200]} »"
+    return score, feedback
+
+
+# --- File d'attente ---
+
+class QueueFullError(Exception):
+    pass
+
+
+class GradingJob:
+    def __init__(self, exercise_id: str, user_id: str):
+        self.id = uuid.uuid4().hex
+        self.exercise_id = exercise_id
+        self.user_id = user_id
+        self.submission_id: Optional[str] = None
+        self.submission: Dict[str, Any] = {}
+        # Écriture différée : résolu (True) quand la soumission est dans Supabase
+        self.persisted: Optional[asyncio.Future] = None
+        self.status = "reserved"  # reserved, queued, running, retrying, done, skipped, failed
+        self.attempts = 0
+        self.error: Optional[str] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "skipped", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "submission_id": self.submission_id,
+            "exercise_id": self.exercise_id,
+            "status": self.status,
+            "attempts": self.attempts,
+            "error": self.error,
+            "result": self.result,
+        }
+
+
+class GradingQueue:
+    """Correction asynchrone des soumissions : file bornée, pool de processus, limite par exercice et reprises."""
+
+    def __init__(self, processes: int = 2, concurrency: int = 4, max_queued: int = 1000, per_exercise: int = 2, max_attempts: int = 3, retry_delay: float = 1, history: int = 10000):
+        self.processes = processes
+        self.concurrency = concurrency
+        self.max_queued = max_queued
+        self.per_exercise = per_exercise
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.history = history
+        self._jobs: "OrderedDict[str, GradingJob]" = OrderedDict()
+        # Une file par exercice, servies à tour de rôle
+        self._waiting: "OrderedDict[str, Deque[GradingJob]]" = OrderedDict()
+        self._running: Dict[str, int] = {}
+        self._backlog = 0
+        self._wakeup: Optional[asyncio.Condition] = None
+        self._workers: List[asyncio.Task] = []
+        self._retries: Set[asyncio.Task] = set()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._supabase: Optional[Repository] = None
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.rejected = 0
+
+    async def start(self, supabase: Repository):
+        self._supabase = supabase
+        self._wakeup = asyncio.Condition()
+        self._pool = ProcessPoolExecutor(max_workers=self.processes) if self.processes > 0 else None
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for task in self._workers + list(self._retries):
+            task.cancel()
+        await asyncio.gather(*self._workers, *self._retries, return_exceptions=True)
+        self._workers = []
+        self._retries.clear()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def reserve(self, exercise_id: str, user_id: str) -> GradingJob:
+        """Réserve une place dans la file avant l'écriture de la soumission ; QueueFullError si la file est pleine."""
+        if self._backlog >= self.max_queued:
+            self.rejected += 1
+            raise QueueFullError()
+        self._backlog += 1
+        job = GradingJob(exercise_id, user_id)
+        self._jobs[job.id] = job
+        self._trim_history()
+        return job
+
+    def release(self, job: GradingJob, error: str):
+        # Réservation abandonnée (la soumission n'a pas pu être enregistrée)
+        job.status = "failed"
+        job.error = error
+        self._finish(job)
+
+    async def submit(self, job: GradingJob, submission: Dict[str, Any], persisted: Optional[asyncio.Future] = None):
+        job.submission_id = submission["id"]
+        job.submission = submission
+        job.persisted = persisted
+        await self._enqueue(job)
+
+    async def resubmit(self, submissions: List[Tuple[Dict[str, Any], Optional[asyncio.Future]]]):
+        # Soumissions rejouées depuis le journal d'écriture différée après un redémarrage
+        for submission, persisted in submissions:
+            if submission.get("score") is not None:
+                continue
+            try:
+                job = self.reserve(submission["exercise_id"], submission["user_id"])
+            except QueueFullError:
+                logger.warning("File pleine : soumission rejouée %s non corrigée", submission["id"])
+                continue
+            await self.submit(job, submission, persisted)
+
+    def get(self, job_id: str) -> Optional[GradingJob]:
+        return self._jobs.get(job_id)
+
+    async def _enqueue(self, job: GradingJob):
+        job.status = "queued"
+        async with self._wakeup:
+            self._waiting.setdefault(job.exercise_id, deque()).append(job)
+            self._wakeup.notify()
+
+    def _next_job(self) -> Optional[GradingJob]:
+        for exercise_id, jobs in self._waiting.items():
+            if self._running.get(exercise_id, 0) < self.per_exercise:
+                job = jobs.popleft()
+                if jobs:
+                    self._waiting.move_to_end(exercise_id)
+                else:
+                    del self._waiting[exercise_id]
+                return job
+        return None
+
+    async def _worker(self):
+        while True:
+            async with self._wakeup:
+                job = self._next_job()
+                while job is None:
+                    await self._wakeup.wait()
+                    job = self._next_job()
+                self._running[job.exercise_id] = self._running.get(job.exercise_id, 0) + 1
+            try:
+                await self._run(job)
+            finally:
+                async with self._wakeup:
+                    self._running[job.exercise_id] -= 1
+                    if not self._running[job.exercise_id]:
+                        del self._running[job.exercise_id]
+                    # Une place s'est libérée pour cet exercice
+                    self._wakeup.notify_all()
+
+    async def _run(self, job: GradingJob):
+        job.status = "running"
+        job.attempts += 1
+        try:
+            exercise = await self._load_exercise(job.exercise_id)
+            loop = asyncio.get_running_loop()
+            score, feedback = await loop.run_in_executor(
+                self._pool, grade_output,
+                job.submission.get("output"), exercise.get("expected_output"), exercise.get("test_cases"), exercise.get("max_score"),
+            )
+            if score is None:
+                job.status = "skipped"
+                job.result = {"score": None, "feedback": feedback}
+                self._finish(job)
+                return
+            if job.persisted is not None and not await job.persisted:
+                raise LookupError("Soumission refusée par Supabase")
+            response = await self._supabase.table("submissions").update({"score": score, "feedback": feedback}).eq("id", job.submission_id).execute()
+            if getattr(response, "error", None):
+                raise RuntimeError(str(response.error))
+            summary_store.record_many("graded", response.data or [])
+            invalidate_gradebooks(response.data or [])
+            job.status = "done"
+            job.result = {"score": score, "feedback": feedback}
+            self.completed += 1
+            self._finish(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            job.error = f"{type(exc).__name__}: {exc}"
+            # Exercice introuvable : inutile de réessayer
+            if job.attempts < self.max_attempts and not isinstance(exc, LookupError):
+                # Reprise différée avec attente exponentielle, sans bloquer un worker
+                job.status = "retrying"
+                self.retried += 1
+                task = asyncio.create_task(self._retry_later(job, self.retry_delay * 2 ** (job.attempts - 1)))
+                self._retries.add(task)
+                task.add_done_callback(self._retries.discard)
+            else:
+                logger.warning("Correction abandonnée pour la soumission %s : %s", job.submission_id, job.error)
+                job.status = "failed"
+                self.failed += 1
+                self._finish(job)
+
+    async def _retry_later(self, job: GradingJob, delay: float):
+        await asyncio.sleep(delay)
+        await self._enqueue(job)
+
+    async def _load_exercise(self, exercise_id: str) -> Dict[str, Any]:
+        query = self._supabase.table("exercises").select("id,expected_output,test_cases,max_score").eq("id", exercise_id).single()
+        response = await catalog_cache.execute(query, tags=[row_tag("exercises", exercise_id)])
+        if getattr(response, "error", None):
+            raise RuntimeError(str(response.error))
+        if not response.data:
+            raise LookupError(f"Exercice {exercise_id} introuvable")
+        return response.data
+
+    def _finish(self, job: GradingJob):
+        job.finished_at = time.time()
+        job.submission = {}
+        job.persisted = None
+        self._backlog -= 1
+
+    def _trim_history(self):
+        # On ne garde que les derniers travaux terminés
+        while len(self._jobs) > self.history:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if not oldest.finished:
+                break
+            del self._jobs[oldest_id]
+
+    def retry_after(self) -> int:
+        # Estimation grossière du temps nécessaire pour vider une partie de la file
+        return max(1, round(self._backlog / max(1, self.concurrency) * 0.1))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backlog": self._backlog,
+            "max_queued": self.max_queued,
+            "waiting": sum(len(jobs) for jobs in self._waiting.values()),
+            "running": sum(self._running.values()),
+            "processes": self.processes,
+            "concurrency": self.concurrency,
+            "per_exercise": self.per_exercise,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "rejected": self.rejected,
+        }
+
+
+grading_queue = GradingQueue(
+    processes=GRADING_PROCESSES,
+    concurrency=GRADING_CONCURRENCY,
+    max_queued=GRADING_QUEUE_SIZE,
+    per_exercise=GRADING_MAX_PER_EXERCISE,
+    max_attempts=GRADING_MAX_ATTEMPTS,
+    retry_delay=GRADING_RETRY_DELAY,
+    history=GRADING_JOB_HISTORY,
+)
+
+registry.callback_gauge("grading_queue_backlog", "Soumissions en attente ou en cours de correction.", lambda: grading_queue._backlog)
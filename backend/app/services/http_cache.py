@@ -0,0 +1,50 @@
+import hashlib
+import os
+from typing import Any, Dict, Optional
+
+import orjson
+from fastapi import Request, Response
+
+from app.services.compression import COMPRESSION_MIN_SIZE, choose_encoding, precompressed_body
+
+# Durées de cache navigateur / CDN pour les lectures publiques du catalogue
+CATALOG_MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", "30"))
+CATALOG_STALE_WHILE_REVALIDATE = int(os.getenv("CATALOG_STALE_WHILE_REVALIDATE", "300"))
+
+
+def catalog_cache_control() -> str:
+    return f"public, max-age={CATALOG_MAX_AGE}, stale-while-revalidate={CATALOG_STALE_WHILE_REVALIDATE}"
+
+
+def compute_etag(body: bytes) -> str:
+    # ETag fort : empreinte du contenu sérialisé
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Comparaison faible (RFC 9110) : on ignore le préfixe W/
+    candidates = {value.strip().removeprefix("W/") for value in header.split(",")}
+    return etag in candidates
+
+
+def catalog_response(request: Request, data: Any, headers: Optional[Dict[str, str]] = None, precompress_tag: Optional[str] = None) -> Response:
+    """Réponse JSON (orjson) avec ETag et Cache-Control ; renvoie 304 si le client possède déjà cette version.
+
+    Avec precompress_tag (lectures unitaires), le corps compressé est mis en cache par version et invalidé avec la ligne.
+    """
+    body = orjson.dumps(data)
+    etag = compute_etag(body)
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": catalog_cache_control()}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    encoding = choose_encoding(request.headers.get("accept-encoding")) if precompress_tag else None
+    if encoding and len(body) >= COMPRESSION_MIN_SIZE:
+        body = precompressed_body(body, etag, encoding, [precompress_tag])
+        # ETag faible : même contenu, représentation encodée différente
+        headers.update({"ETag": "W/" + etag, "Content-Encoding": encoding, "Vary": "Accept-Encoding"})
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,117 @@
+import hashlib
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.cache import TTLCache
+from app.services.metrics import registry
+
+# Clés d'idempotence des POST : une réponse stockée par (utilisateur, clé), rejouée aux nouvelles tentatives
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "3600"))
+IDEMPOTENCY_MAXSIZE = int(os.getenv("IDEMPOTENCY_MAXSIZE", "10000"))
+IDEMPOTENCY_MAX_KEY_LENGTH = 255
+
+idempotency_requests = registry.counter("idempotency_requests_total", "POST avec Idempotency-Key, par résultat.", ("result",))
+
+# Réponse stockée : (empreinte de la requête, statut, en-têtes, corps)
+StoredResponse = Tuple[str, int, List[Tuple[bytes, bytes]], bytes]
+
+idempotency_store = TTLCache(maxsize=IDEMPOTENCY_MAXSIZE, ttl=IDEMPOTENCY_TTL)
+
+
+def _owner(headers: Headers) -> Optional[str]:
+    # Les clés sont propres à chaque appelant : empreinte du jeton (pas d'adresse IP, partagée derrière un NAT)
+    authorization = headers.get("authorization")
+    return hashlib.sha256(authorization.encode()).hexdigest() if authorization else None
+
+
+async def _read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+class IdempotencyMiddleware:
+    """POST portant `Idempotency-Key` : la première requête s'exécute, ses répétitions (même concurrentes)
+    reçoivent la même réponse sans toucher à la base. Les 5xx et 429 ne sont pas conservés.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        key = headers.get("idempotency-key")
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > IDEMPOTENCY_MAX_KEY_LENGTH:
+            await JSONResponse({"detail": "Idempotency-Key invalide"}, status_code=400)(scope, receive, send)
+            return
+        owner = _owner(headers)
+        if owner is None:
+            # Sans jeton, pas d'appelant identifiable : la requête s'exécute normalement
+            idempotency_requests.inc(("unauthenticated",))
+            await self.app(scope, receive, send)
+            return
+
+        body = await _read_body(receive)
+        request = b"\0".join((scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""), body))
+        fingerprint = hashlib.sha256(request).hexdigest()
+        executed = False
+
+        async def replay_receive() -> Message:
+            nonlocal body
+            if body is not None:
+                message = {"type": "http.request", "body": body, "more_body": False}
+                body = None
+                return message
+            return await receive()
+
+        async def load() -> Tuple[StoredResponse, Optional[List[str]]]:
+            nonlocal executed
+            executed = True
+            response: Dict[str, Any] = {"status": 500, "headers": [], "body": []}
+
+            async def capture(message: Message):
+                if message["type"] == "http.response.start":
+                    response["status"] = message["status"]
+                    response["headers"] = list(message.get("headers", []))
+                elif message["type"] == "http.response.body":
+                    response["body"].append(message.get("body", b""))
+
+            await self.app(scope, replay_receive, capture)
+            stored = (fingerprint, response["status"], response["headers"], b"".join(response["body"]))
+            # Erreurs transitoires : une nouvelle tentative doit pouvoir s'exécuter
+            transient = response["status"] >= 500 or response["status"] == 429
+            return stored, None if transient else []
+
+        stored_fingerprint, status, response_headers, response_body = await idempotency_store.get_or_load((owner, key), load)
+        if stored_fingerprint != fingerprint:
+            idempotency_requests.inc(("mismatch",))
+            detail = "Idempotency-Key déjà utilisée pour une autre requête"
+            await JSONResponse({"detail": detail}, status_code=422)(scope, receive, send)
+            return
+        if executed:
+            idempotency_requests.inc(("executed",))
+        else:
+            idempotency_requests.inc(("replayed",))
+            response_headers = response_headers + [(b"idempotent-replayed", b"true")]
+        await send({"type": "http.response.start", "status": status, "headers": response_headers})
+        await send({"type": "http.response.body", "body": response_body})
+
+
+def idempotency_stats() -> Dict[str, Any]:
+    return idempotency_store.stats()
@@ -0,0 +1,215 @@
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Métriques Prometheus de ce worker, sans dépendance ni verrou : elles ne sont modifiées
+# que depuis la boucle d'événements (middleware et Repository), jamais depuis un thread.
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UPSTREAM_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, labels: LabelValues = (), amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: LabelValues = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: LabelValues = (), amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set(self, labels: LabelValues, value: float):
+        self._values[labels] = value
+
+
+class CallbackGauge(_Metric):
+    """Valeur lue au moment de la collecte (taille de file, requêtes Supabase en vol...)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float]):
+        super().__init__(name, documentation)
+        self.callback = callback
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {_number(self.callback())}"]
+
+
+class _Series:
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self, size: int):
+        self.buckets = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = HTTP_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(buckets))
+        self._series: Dict[LabelValues, _Series] = {}
+
+    def observe(self, labels: LabelValues, value: float):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = _Series(len(self.bounds) + 1)
+        # Un seul compteur incrémenté par observation ; le cumul est fait à la collecte
+        series.buckets[bisect_left(self.bounds, value)] += 1
+        series.sum += value
+        series.count += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), series.buckets):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(series.sum)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {series.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> Any:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = HTTP_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback_gauge(self, name: str, documentation: str, callback: Callable[[], float]) -> CallbackGauge:
+        return self.register(CallbackGauge(name, documentation, callback))
+
+    def exposition(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter("http_requests_total", "Requêtes HTTP terminées, par route et statut.", ("method", "route", "status"))
+http_duration = registry.histogram("http_request_duration_seconds", "Durée des requêtes HTTP, par route.", ("method", "route"))
+http_in_flight = registry.gauge("http_requests_in_flight", "Requêtes HTTP en cours de traitement.", ("method",))
+
+supabase_duration = registry.histogram(
+    "supabase_request_duration_seconds", "Durée des appels PostgREST, par table et opération.", ("table", "operation"), UPSTREAM_BUCKETS
+)
+supabase_rows = registry.counter("supabase_rows_total", "Lignes renvoyées par PostgREST, par table et opération.", ("table", "operation"))
+supabase_wait = registry.histogram(
+    "supabase_queue_wait_seconds", "Attente d'une place parmi les requêtes Supabase en vol (SUPABASE_MAX_IN_FLIGHT).", (), UPSTREAM_BUCKETS
+)
+supabase_errors = registry.counter("supabase_errors_total", "Appels PostgREST en erreur (HTTP ou réseau), par table et opération.", ("table", "operation"))
+
+
+def observe_upstream(table: str, operation: str, seconds: float, data: Any, error: Optional[str]):
+    labels = (table, operation)
+    supabase_duration.observe(labels, seconds)
+    if error:
+        supabase_errors.inc(labels)
+    elif data is not None:
+        supabase_rows.inc(labels, len(data) if isinstance(data, list) else 1)
+
+
+def _route_label(scope: Scope) -> str:
+    # Gabarit de la route (/lessons/{id}) plutôt que le chemin, pour borner la cardinalité
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Latence, statut et requêtes en cours par route ; mesure jusqu'au dernier octet envoyé."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_in_flight.inc((method,))
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_in_flight.dec((method,))
+            route = _route_label(scope)
+            http_duration.observe((method, route), elapsed)
+            http_requests.inc((method, route, str(status)))
@@ -0,0 +1,103 @@
+import base64
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+from app.services.repository import QueryBuilder
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Plafond de lignes d'une réponse PostgREST (db-max-rows) : au-delà, la réponse est tronquée sans erreur
+UPSTREAM_MAX_ROWS = int(os.getenv("UPSTREAM_MAX_ROWS", "1000"))
+
+# Clés de tri (colonne, décroissant) ; la dernière doit être unique (id)
+Keys = Sequence[Tuple[str, bool]]
+
+
+def encode_cursor(values: List[Any]) -> str:
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+    return values
+
+
+def _quote(value: Any) -> str:
+    # Les valeurs sont entre guillemets pour ne pas casser l'arbre logique PostgREST
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _after(column: str, desc: bool, value: Any) -> Optional[str]:
+    """Condition « strictement après value » pour une colonne (NULLS LAST en asc, NULLS FIRST en desc, comme Postgres)."""
+    if value is None:
+        return f"{column}.not.is.null" if desc else None
+    condition = f"{column}.{'lt' if desc else 'gt'}.{_quote(value)}"
+    return condition if desc else f"or({condition},{column}.is.null)"
+
+
+def _equal(column: str, value: Any) -> str:
+    return f"{column}.is.null" if value is None else f"{column}.eq.{_quote(value)}"
+
+
+def keyset_condition(keys: Keys, values: List[Any]) -> str:
+    """(k1, k2, ...) > (v1, v2, ...) décomposé en : k1 > v1 OU (k1 = v1 ET (k2, ...) > (v2, ...))."""
+    branches = []
+    for i, (column, desc) in enumerate(keys):
+        after = _after(column, desc, values[i])
+        if after is None:
+            continue
+        prefix = [_equal(c, values[j]) for j, (c, _) in enumerate(keys[:i])]
+        branches.append(f"and({','.join(prefix + [after])})" if prefix else after)
+    return ",".join(branches)
+
+
+def apply_keyset(query: QueryBuilder, keys: Keys, cursor: Optional[str], limit: int) -> QueryBuilder:
+    """Trie selon les clés, reprend après le curseur et lit une ligne de plus pour savoir s'il reste une page."""
+    if cursor:
+        query = query.or_(keyset_condition(keys, decode_cursor(cursor, len(keys))))
+    for column, desc in keys:
+        query = query.order(column, desc=desc)
+    return query.limit(limit + 1)
+
+
+def batch_size(size: int) -> int:
+    """Taille de lot bornée : apply_keyset lit une ligne de plus, qui doit tenir sous le plafond de PostgREST.
+
+    Sinon une page pleine revient tronquée à UPSTREAM_MAX_ROWS lignes, paginate n'y voit pas de page suivante
+    et la lecture s'arrête en silence.
+    """
+    return max(1, min(size, UPSTREAM_MAX_ROWS - 1))
+
+
+def paginate(rows: List[Dict[str, Any]], keys: Keys, limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([last.get(column) for column, _ in keys])
+
+
+async def fetch_all(build_query: Callable[[], QueryBuilder], keys: Keys = (("id", False),), page_size: int = 500) -> List[Dict[str, Any]]:
+    """Toutes les lignes d'une requête, par pages keyset : PostgREST plafonne le nombre de lignes d'une réponse."""
+    page_size = batch_size(page_size)
+    rows: List[Dict[str, Any]] = []
+    cursor = None
+    while True:
+        response = await apply_keyset(build_query(), keys, cursor, page_size).execute()
+        if getattr(response, "error", None):
+            raise RuntimeError(str(response.error))
+        page, cursor = paginate(response.data, keys, page_size)
+        rows.extend(page)
+        if not cursor:
+            return rows
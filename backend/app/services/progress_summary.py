@@ -0,0 +1,224 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.services.cache import KeyedLocks, TTLCache, scope_tag
+from app.services.pagination import fetch_all
+from app.services.repository import Repository
+from app.services.write_behind import write_buffer
+
+PROGRESS_SUMMARY_TTL = float(os.getenv("PROGRESS_SUMMARY_TTL", "300"))
+PROGRESS_SUMMARY_MAXSIZE = int(os.getenv("PROGRESS_SUMMARY_MAXSIZE", "10000"))
+LESSON_INDEX_TTL = float(os.getenv("LESSON_INDEX_TTL", "600"))
+LESSON_INDEX_MAXSIZE = int(os.getenv("LESSON_INDEX_MAXSIZE", "1024"))
+
+# Index des leçons de chaque cours et cours de chaque leçon : invalidés seulement quand l'ordre, la visibilité
+# ou le cours d'une leçon change (invalidate_lesson_index), pas à chaque modification de contenu
+lesson_index_cache = TTLCache(maxsize=LESSON_INDEX_MAXSIZE + 1, ttl=LESSON_INDEX_TTL)
+LESSON_COURSES_KEY = "lesson_courses"
+LESSON_COURSES_TAG = scope_tag("lessons", "membership")
+
+
+def _order_tag(course_id: str) -> str:
+    return scope_tag("lessons", f"order:{course_id}")
+
+
+def _position_tag(lesson_id: str) -> str:
+    return scope_tag("lessons", f"position:{lesson_id}")
+
+
+class CourseIndex:
+    """Leçons visibles d'un cours dans l'ordre du cours : le bit n d'un masque correspond à la n-ième leçon."""
+
+    def __init__(self, course_id: str, lessons: Iterable[Dict[str, Any]]):
+        self.course_id = course_id
+        ordered = sorted(lessons, key=lambda l: (l.get("order_index") is None, l.get("order_index") or 0, l["id"]))
+        self.lesson_ids: List[str] = [lesson["id"] for lesson in ordered]
+        self.positions: Dict[str, int] = {lesson_id: bit for bit, lesson_id in enumerate(self.lesson_ids)}
+        self.order_index: Dict[str, Optional[int]] = {lesson["id"]: lesson.get("order_index") for lesson in ordered}
+
+    def changed_by(self, row: Dict[str, Any]) -> bool:
+        """Vrai si la ligne écrite modifie l'ordre ou la visibilité des leçons du cours."""
+        visible = not row.get("is_hidden")
+        if (row["id"] in self.positions) != visible:
+            return True
+        return visible and self.order_index[row["id"]] != row.get("order_index")
+
+
+async def load_lesson_courses(supabase: Repository) -> Dict[str, str]:
+    """Cours de chaque leçon (masquées comprises) : change seulement à la création d'une leçon ou si elle change de cours."""
+
+    async def load() -> Tuple[Dict[str, str], Optional[List[str]]]:
+        lessons = await fetch_all(lambda: supabase.table("lessons").select("id,course_id"))
+        return {lesson["id"]: lesson["course_id"] for lesson in lessons if lesson.get("course_id")}, [LESSON_COURSES_TAG]
+
+    return await lesson_index_cache.get_or_load(LESSON_COURSES_KEY, load)
+
+
+async def load_course_index(supabase: Repository, course_id: str) -> CourseIndex:
+    async def load() -> Tuple[CourseIndex, Optional[List[str]]]:
+        lessons = await fetch_all(lambda: supabase.table("lessons").select("id,order_index").eq("course_id", course_id).eq("is_hidden", False))
+        index = CourseIndex(course_id, lessons)
+        return index, [_order_tag(course_id)] + [_position_tag(lesson_id) for lesson_id in index.lesson_ids]
+
+    return await lesson_index_cache.get_or_load(("course", course_id), load)
+
+
+async def load_course_indexes(supabase: Repository, course_ids: Iterable[str]) -> Dict[str, CourseIndex]:
+    course_ids = list(dict.fromkeys(course_ids))
+    indexes = await asyncio.gather(*(load_course_index(supabase, course_id) for course_id in course_ids))
+    return dict(zip(course_ids, indexes))
+
+
+def invalidate_lesson_index(rows: Optional[List[Dict[str, Any]]]):
+    """À appeler après une écriture de leçons ; sans effet si ni l'ordre, ni la visibilité, ni le cours n'a changé."""
+    found, lesson_courses = lesson_index_cache.get(LESSON_COURSES_KEY)
+    tags = set()
+    for row in rows or []:
+        if not isinstance(row, dict) or "id" not in row:
+            continue
+        course_id = row.get("course_id")
+        if found and lesson_courses.get(row["id"]) != course_id:
+            # Leçon créée ou déplacée : table des cours et index de l'ancien cours
+            tags.update((LESSON_COURSES_TAG, _position_tag(row["id"])))
+        cached, index = lesson_index_cache.get(("course", course_id))
+        if cached and index.changed_by(row):
+            tags.add(_order_tag(course_id))
+    if tags:
+        lesson_index_cache.invalidate(*tags)
+
+
+class UserProgressBits:
+    """Leçons terminées d'un utilisateur, par cours, et un entier par cours utilisé comme ensemble de bits.
+
+    Les masques sont recalculés en mémoire quand l'index d'un cours change : user_progress n'est pas relu.
+    """
+
+    def __init__(self, lesson_courses: Dict[str, str]):
+        self.lesson_courses = lesson_courses
+        self.lessons: Dict[str, Set[str]] = {}
+        # Leçons absentes de la table des cours (créées après son chargement) : placées au prochain rattachement
+        self.unplaced: Set[str] = set()
+        self._masks: Dict[str, Tuple[CourseIndex, int]] = {}
+        self.built_at = time.monotonic()
+
+    def add(self, lesson_id: str):
+        course_id = self.lesson_courses.get(lesson_id)
+        if course_id is None:
+            self.unplaced.add(lesson_id)
+            return
+        self.lessons.setdefault(course_id, set()).add(lesson_id)
+        cached = self._masks.get(course_id)
+        if cached is not None and lesson_id in cached[0].positions:
+            index, mask = cached
+            self._masks[course_id] = (index, mask | (1 << index.positions[lesson_id]))
+
+    def attach(self, lesson_courses: Dict[str, str]):
+        """Reclasse les leçons terminées selon une nouvelle table des cours, sans relire user_progress."""
+        if lesson_courses is self.lesson_courses:
+            return
+        lesson_ids = self.unplaced.union(*self.lessons.values())
+        self.lesson_courses = lesson_courses
+        self.lessons, self.unplaced, self._masks = {}, set(), {}
+        for lesson_id in lesson_ids:
+            self.add(lesson_id)
+
+    def mask(self, index: CourseIndex) -> int:
+        cached = self._masks.get(index.course_id)
+        if cached is not None and cached[0] is index:
+            return cached[1]
+        # Leçon masquée : sans effet sur la progression
+        mask = 0
+        for lesson_id in self.lessons.get(index.course_id, ()):
+            if lesson_id in index.positions:
+                mask |= 1 << index.positions[lesson_id]
+        self._masks[index.course_id] = (index, mask)
+        return mask
+
+    def course(self, index: CourseIndex) -> Optional[Dict[str, Any]]:
+        lesson_ids = index.lesson_ids
+        if not lesson_ids:
+            return None
+        mask = self.mask(index)
+        completed = mask.bit_count()
+        # Première leçon non terminée : bit le plus faible à zéro
+        first_missing = (~mask & (mask + 1)).bit_length() - 1
+        return {
+            "course_id": index.course_id,
+            "completed_lessons": completed,
+            "total_lessons": len(lesson_ids),
+            "percent": round(100 * completed / len(lesson_ids), 1),
+            "next_lesson_id": lesson_ids[first_missing] if first_missing < len(lesson_ids) else None,
+        }
+
+
+class ProgressStore:
+    """Masques de progression par utilisateur (LRU + TTL), mis à jour à chaque leçon terminée.
+
+    Reconstruits depuis user_progress en cas d'absence ou d'expiration seulement.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._bits: "OrderedDict[str, UserProgressBits]" = OrderedDict()
+        self._rebuilding: Dict[str, List[str]] = {}
+        self._locks = KeyedLocks()
+
+    def record(self, user_id: str, lesson_id: str):
+        if user_id in self._rebuilding:
+            self._rebuilding[user_id].append(lesson_id)
+        bits = self._bits.get(user_id)
+        if bits is not None:
+            bits.add(lesson_id)
+
+    def _fresh(self, bits: Optional[UserProgressBits]) -> bool:
+        return bits is not None and time.monotonic() - bits.built_at < self.ttl
+
+    async def get(self, supabase: Repository, user_id: str) -> UserProgressBits:
+        lesson_courses = await load_lesson_courses(supabase)
+        bits = self._bits.get(user_id)
+        if self._fresh(bits):
+            self._bits.move_to_end(user_id)
+            bits.attach(lesson_courses)
+            return bits
+        async with self._locks.hold(user_id):
+            bits = self._bits.get(user_id)
+            if self._fresh(bits):
+                # Reconstruit entre-temps par une requête concurrente
+                bits.attach(lesson_courses)
+                return bits
+            # Lignes acquittées mais encore dans le tampon d'écriture différée : lues avant la table
+            self._rebuilding[user_id] = [row["lesson_id"] for row in write_buffer.pending("user_progress") if row.get("user_id") == user_id]
+            try:
+                rows = await fetch_all(lambda: supabase.table("user_progress").select("id,lesson_id").eq("user_id", user_id))
+                bits = UserProgressBits(lesson_courses)
+                for row in rows:
+                    bits.add(row["lesson_id"])
+                # Rejoue les écritures arrivées pendant la lecture
+                for lesson_id in self._rebuilding[user_id]:
+                    bits.add(lesson_id)
+            finally:
+                del self._rebuilding[user_id]
+            self._bits[user_id] = bits
+            self._bits.move_to_end(user_id)
+            while len(self._bits) > self.maxsize:
+                self._bits.popitem(last=False)
+            return bits
+
+    async def summary(self, supabase: Repository, user_id: str, course_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Par défaut les cours commencés ; `course_ids` force une liste de cours (même sans progression)."""
+        bits = await self.get(supabase, user_id)
+        started = sorted(bits.lessons)
+        indexes = await load_course_indexes(supabase, started + list(course_ids or []))
+        wanted = course_ids if course_ids is not None else [course_id for course_id in started if bits.mask(indexes[course_id])]
+        courses = [progress for progress in (bits.course(indexes[course_id]) for course_id in wanted) if progress is not None]
+        return {"completed_lessons": sum(bits.mask(indexes[course_id]).bit_count() for course_id in started), "courses": courses}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"users": len(self._bits), "maxsize": self.maxsize, "ttl": self.ttl, "lesson_index": lesson_index_cache.stats()}
+
+
+progress_store = ProgressStore(maxsize=PROGRESS_SUMMARY_MAXSIZE, ttl=PROGRESS_SUMMARY_TTL)
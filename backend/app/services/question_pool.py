@@ -0,0 +1,80 @@
+import asyncio
+import os
+import random
+import time
+from typing import Dict, Iterable, List, Optional
+
+from app.services.pagination import fetch_all
+from app.services.repository import Repository
+
+QUESTION_POOL_TTL = float(os.getenv("QUESTION_POOL_TTL", "300"))
+
+
+class QuestionPool:
+    """Identifiants de la banque de questions regroupés par type, pour un tirage aléatoire sans parcourir la table."""
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self._buckets: Dict[str, List[str]] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    async def buckets(self, supabase: Repository) -> Dict[str, List[str]]:
+        if self._fresh():
+            return self._buckets
+        async with self._lock:
+            if not self._fresh():
+                # Seules les colonnes id et type sont lues, par pages keyset : toute la banque peut être tirée
+                rows = await fetch_all(lambda: supabase.table("question_bank").select("id,type"))
+                buckets: Dict[str, List[str]] = {}
+                for row in rows:
+                    buckets.setdefault(row["type"], []).append(row["id"])
+                self._buckets = buckets
+                self._loaded_at = time.monotonic()
+        return self._buckets
+
+    def add(self, rows: Iterable[dict]):
+        # Nouvelle question : ajout direct dans son seau, sans recharger le pool
+        if self._loaded_at is None:
+            return
+        for row in rows:
+            self._buckets.setdefault(row["type"], []).append(row["id"])
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    @staticmethod
+    def allocate(sizes: Dict[str, int], n: int) -> Dict[str, int]:
+        """Répartit n tirages entre les types proportionnellement à leur taille (méthode du plus fort reste)."""
+        total = sum(sizes.values())
+        n = min(n, total)
+        if not n:
+            return {t: 0 for t in sizes}
+        quotas = {t: n * size / total for t, size in sizes.items()}
+        allocation = {t: int(q) for t, q in quotas.items()}
+        remaining = n - sum(allocation.values())
+        for t in sorted(quotas, key=lambda t: quotas[t] - allocation[t], reverse=True):
+            if remaining <= 0:
+                break
+            if allocation[t] < sizes[t]:
+                allocation[t] += 1
+                remaining -= 1
+        return allocation
+
+    async def sample(self, supabase: Repository, n: int, types: Optional[List[str]] = None, seed: Optional[int] = None) -> List[str]:
+        buckets = await self.buckets(supabase)
+        if types:
+            buckets = {t: ids for t, ids in buckets.items() if t in types}
+        rng = random.Random(seed)
+        allocation = self.allocate({t: len(ids) for t, ids in buckets.items()}, n)
+        picked: List[str] = []
+        for t, count in allocation.items():
+            picked.extend(rng.sample(buckets[t], count))
+        rng.shuffle(picked)
+        return picked
+
+
+question_pool = QuestionPool(ttl=QUESTION_POOL_TTL)
@@ -0,0 +1,263 @@
+import asyncio
+import json
+import time
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import httpx
+
+from app.services.metrics import observe_upstream, supabase_wait
+
+
+class QueryResponse:
+    """Résultat d'une requête PostgREST, compatible avec les anciens objets du client supabase."""
+
+    def __init__(self, data: Any = None, count: Optional[int] = None, error: Optional[str] = None):
+        self.data = data
+        self.count = count
+        self.error = error
+
+
+def _format_value(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _format_list(values: Iterable[Any]) -> str:
+    items = []
+    for value in values:
+        text = _format_value(value)
+        # Les valeurs contenant des séparateurs doivent être entre guillemets
+        if any(c in text for c in ',()"'):
+            text = '"' + text.replace('"', '\\"') + '"'
+        items.append(text)
+    return "(" + ",".join(items) + ")"
+
+
+class QueryBuilder:
+    """Sous-ensemble asynchrone du query builder postgrest-py (select/eq/order/range/single/insert/update...)."""
+
+    def __init__(self, repository: "Repository", table: str):
+        self._repository = repository
+        self.table = table
+        self.operation = "select"
+        self.columns = "*"
+        self.filters: List[tuple] = []
+        self.orders: List[tuple] = []
+        self.offset: Optional[int] = None
+        self.limit_value: Optional[int] = None
+        self.is_single = False
+        self.payload: Any = None
+        self.on_conflict: Optional[str] = None
+        self.count: Optional[str] = None
+
+    # --- opérations ---
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "QueryBuilder":
+        self.operation = "select"
+        self.columns = columns
+        self.count = count
+        return self
+
+    def insert(self, data: Union[Dict[str, Any], List[Dict[str, Any]]]) -> "QueryBuilder":
+        self.operation = "insert"
+        self.payload = data
+        return self
+
+    def upsert(self, data: Union[Dict[str, Any], List[Dict[str, Any]]], on_conflict: Optional[str] = None) -> "QueryBuilder":
+        self.operation = "upsert"
+        self.payload = data
+        self.on_conflict = on_conflict
+        return self
+
+    def update(self, data: Dict[str, Any]) -> "QueryBuilder":
+        self.operation = "update"
+        self.payload = data
+        return self
+
+    def delete(self) -> "QueryBuilder":
+        self.operation = "delete"
+        return self
+
+    # --- filtres (valeurs gardées telles quelles, formatées par le backend) ---
+    def _filter(self, column: str, operator: str, value: Any) -> "QueryBuilder":
+        self.filters.append((column, operator, value))
+        return self
+
+    def eq(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter(column, "eq", value)
+
+    def neq(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter(column, "neq", value)
+
+    def gt(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter(column, "gt", value)
+
+    def gte(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter(column, "gte", value)
+
+    def lt(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter(column, "lt", value)
+
+    def lte(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter(column, "lte", value)
+
+    def in_(self, column: str, values: Iterable[Any]) -> "QueryBuilder":
+        return self._filter(column, "in", tuple(values))
+
+    def ilike(self, column: str, pattern: str) -> "QueryBuilder":
+        return self._filter(column, "ilike", pattern)
+
+    def is_(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter(column, "is", value)
+
+    def or_(self, conditions: str) -> "QueryBuilder":
+        # Arbre logique PostgREST, ex. "a.gt.1,and(a.eq.1,id.gt.x)"
+        return self._filter("or", "", f"({conditions})")
+
+    # --- tri et pagination ---
+    def order(self, column: str, desc: bool = False) -> "QueryBuilder":
+        self.orders.append((column, desc))
+        return self
+
+    def range(self, start: int, end: int) -> "QueryBuilder":
+        self.offset = start
+        self.limit_value = end - start + 1
+        return self
+
+    def limit(self, size: int) -> "QueryBuilder":
+        self.limit_value = size
+        return self
+
+    def single(self) -> "QueryBuilder":
+        # Contrairement à postgrest-py, une absence de ligne renvoie data=None (=> 404 côté route)
+        self.is_single = True
+        self.limit_value = 1
+        return self
+
+    # --- exécution ---
+    def build_params(self) -> List[tuple]:
+        params: List[tuple] = []
+        if self.operation in ("select", "insert", "upsert", "update", "delete"):
+            params.append(("select", self.columns))
+        for column, operator, value in self.filters:
+            if operator == "in":
+                value = _format_list(value)
+            elif operator not in ("", "ilike"):
+                value = _format_value(value)
+            params.append((column, f"{operator}.{value}" if operator else value))
+        if self.orders:
+            params.append(("order", ",".join(f"{c}.{'desc' if d else 'asc'}" for c, d in self.orders)))
+        if self.offset:
+            params.append(("offset", str(self.offset)))
+        if self.limit_value is not None and self.operation == "select":
+            params.append(("limit", str(self.limit_value)))
+        if self.on_conflict:
+            params.append(("on_conflict", self.on_conflict))
+        return params
+
+    def build_request(self) -> tuple:
+        headers: Dict[str, str] = {}
+        body = None
+        if self.operation == "select":
+            method = "GET"
+            if self.count:
+                headers["Prefer"] = f"count={self.count}"
+        elif self.operation in ("insert", "upsert"):
+            method = "POST"
+            prefer = ["return=representation"]
+            if self.operation == "upsert":
+                prefer.append("resolution=merge-duplicates")
+            headers["Prefer"] = ",".join(prefer)
+            body = self.payload
+        elif self.operation == "update":
+            method = "PATCH"
+            headers["Prefer"] = "return=representation"
+            body = self.payload
+        else:
+            method = "DELETE"
+            headers["Prefer"] = "return=representation"
+        return method, self.build_params(), headers, body
+
+    async def execute(self) -> QueryResponse:
+        return await self._repository.execute(self)
+
+
+class Repository:
+    """Backend de stockage : fabrique les QueryBuilder des routes et les exécute (PostgREST, SQLite...)."""
+
+    in_flight = 0
+    max_in_flight = 0
+
+    def table(self, name: str) -> QueryBuilder:
+        return QueryBuilder(self, name)
+
+    async def execute(self, query: QueryBuilder) -> QueryResponse:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class PostgrestRepository(Repository):
+    """Accès asynchrone aux tables Supabase via PostgREST, borné par une limite globale de requêtes en vol."""
+
+    def __init__(self, http_client: httpx.AsyncClient, rest_url: str, api_key: str, max_in_flight: int = 100):
+        self._http = http_client
+        self._rest_url = rest_url.rstrip("/")
+        self._headers = {
+            "apikey": api_key,
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+        }
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+
+    async def close(self):
+        await self._http.aclose()
+
+    async def execute(self, query: QueryBuilder) -> QueryResponse:
+        method, params, headers, body = query.build_request()
+        content = json.dumps(body, default=str) if body is not None else None
+        queued = time.perf_counter()
+        async with self._semaphore:
+            started = time.perf_counter()
+            supabase_wait.observe((), started - queued)
+            self.in_flight += 1
+            try:
+                response = await self._http.request(
+                    method,
+                    f"{self._rest_url}/{query.table}",
+                    params=params,
+                    headers={**self._headers, **headers},
+                    content=content,
+                )
+                result = self._parse(query, response)
+            except httpx.HTTPError as exc:
+                result = QueryResponse(error=f"{type(exc).__name__}: {exc}")
+            finally:
+                self.in_flight -= 1
+        observe_upstream(query.table, query.operation, time.perf_counter() - started, result.data, result.error)
+        return result
+
+    @staticmethod
+    def _parse(query: QueryBuilder, response: httpx.Response) -> QueryResponse:
+        if response.status_code >= 400:
+            try:
+                detail = response.json()
+                message = detail.get("message") or str(detail)
+            except ValueError:
+                message = response.text
+            return QueryResponse(error=f"{response.status_code}: {message}")
+        data = response.json() if response.content else []
+        count = None
+        content_range = response.headers.get("content-range")
+        if content_range and "/" in content_range:
+            total = content_range.split("/", 1)[1]
+            count = int(total) if total.isdigit() else None
+        if query.is_single:
+            data = data[0] if data else None
+        return QueryResponse(data=data, count=count)
@@ -0,0 +1,156 @@
+import asyncio
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.cache import TTLCache, row_tag
+from app.services.export import ExportError, fetch_chunks
+from app.services.pagination import batch_size
+from app.services.repository import Repository
+
+ANSWER_KEY_CACHE_TTL = float(os.getenv("ANSWER_KEY_CACHE_TTL", "600"))
+ANSWER_KEY_CACHE_MAXSIZE = int(os.getenv("ANSWER_KEY_CACHE_MAXSIZE", "256"))
+RESCORE_CHUNK_SIZE = batch_size(int(os.getenv("RESCORE_CHUNK_SIZE", "500")))
+
+# Codes des réponses encodées : question sans réponse, réponse hors des choix possibles
+MISSING = -1
+UNKNOWN = -2
+
+
+def _normalize(value: Any) -> str:
+    return str(value).strip().casefold()
+
+
+class AnswerKey:
+    """Corrigé d'un test sous forme de tableaux : une colonne par question notée automatiquement."""
+
+    def __init__(self, test_id: str, question_ids: List[str], vocabularies: List[Dict[str, int]], expected: List[int], choice_codes: List[List[int]]):
+        self.test_id = test_id
+        self.question_ids = question_ids
+        self.vocabularies = vocabularies
+        self.expected = np.asarray(expected, dtype=np.int16)
+        # Code de chaque choix affiché, par indice : le vocabulaire fusionne les choix identiques une fois normalisés,
+        # une réponse par indice est donc bornée par le nombre de choix et non par la taille du vocabulaire
+        self.choice_codes = choice_codes
+
+    @classmethod
+    def from_questions(cls, test_id: str, question_ids: List[str], questions: List[Dict[str, Any]]) -> "AnswerKey":
+        by_id = {str(q["id"]): q for q in questions}
+        ids, vocabularies, expected, choice_codes = [], [], [], []
+        for question_id in question_ids:
+            question = by_id.get(str(question_id))
+            if question is None or question.get("answer") is None:
+                # Question supprimée ou sans corrigé (texte libre, code) : correction manuelle
+                continue
+            choices = question.get("choices") or [question["answer"]]
+            vocabulary: Dict[str, int] = {}
+            for index, choice in enumerate(choices):
+                vocabulary.setdefault(_normalize(choice), index)
+            answer = vocabulary.get(_normalize(question["answer"]))
+            if answer is None:
+                continue
+            ids.append(str(question_id))
+            vocabularies.append(vocabulary)
+            expected.append(answer)
+            choice_codes.append([vocabulary[_normalize(choice)] for choice in choices])
+        return cls(test_id, ids, vocabularies, expected, choice_codes)
+
+    def __len__(self) -> int:
+        return len(self.question_ids)
+
+    def encode(self, answers_list: List[Optional[Dict[str, Any]]]) -> np.ndarray:
+        """Matrice (soumissions x questions) des indices de choix donnés."""
+        matrix = np.full((len(answers_list), len(self)), MISSING, dtype=np.int16)
+        for row, answers in enumerate(answers_list):
+            if not answers:
+                continue
+            for column, question_id in enumerate(self.question_ids):
+                value = answers.get(question_id)
+                if value is None:
+                    continue
+                if isinstance(value, int) and not isinstance(value, bool):
+                    # Réponse donnée par indice de choix
+                    codes = self.choice_codes[column]
+                    matrix[row, column] = codes[value] if 0 <= value < len(codes) else UNKNOWN
+                else:
+                    matrix[row, column] = self.vocabularies[column].get(_normalize(value), UNKNOWN)
+        return matrix
+
+    def score(self, answers_list: List[Optional[Dict[str, Any]]]) -> np.ndarray:
+        """Scores sur 100 (arrondis) de toutes les soumissions en une seule comparaison vectorisée."""
+        correct = (self.encode(answers_list) == self.expected).sum(axis=1)
+        return np.rint(correct * 100.0 / len(self)).astype(np.int64)
+
+
+# Corrigés par test, invalidés quand le test ou l'une de ses questions change
+answer_keys = TTLCache(maxsize=ANSWER_KEY_CACHE_MAXSIZE, ttl=ANSWER_KEY_CACHE_TTL)
+
+
+async def _load_answer_key(supabase: Repository, test_id: str) -> Tuple[Optional[AnswerKey], Optional[List[str]]]:
+    response = await supabase.table("tests").select("id,question_ids").eq("id", test_id).single().execute()
+    if getattr(response, "error", None):
+        raise RuntimeError(str(response.error))
+    if not response.data:
+        return None, None
+    question_ids = [str(q) for q in response.data.get("question_ids") or []]
+    questions: List[Dict[str, Any]] = []
+    if question_ids:
+        response = await supabase.table("question_bank").select("id,choices,answer").in_("id", question_ids).execute()
+        if getattr(response, "error", None):
+            raise RuntimeError(str(response.error))
+        questions = response.data
+    tags = [row_tag("tests", test_id)] + [row_tag("question_bank", q) for q in question_ids]
+    return AnswerKey.from_questions(test_id, question_ids, questions), tags
+
+
+async def get_answer_key(supabase: Repository, test_id: str, refresh: bool = False) -> Optional[AnswerKey]:
+    """Corrigé du test (None si le test n'existe pas), chargé une fois puis servi depuis le cache."""
+    if refresh:
+        answer_keys.invalidate(row_tag("tests", test_id))
+    return await answer_keys.get_or_load(test_id, lambda: _load_answer_key(supabase, test_id))
+
+
+def invalidate_answer_keys(table: str, ids: List[Any]):
+    answer_keys.invalidate(*(row_tag(table, row_id) for row_id in ids))
+
+
+def score_rows(key: AnswerKey, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Renvoie les lignes dont le score recalculé diffère du score enregistré, avec le nouveau score."""
+    if not rows or not len(key):
+        return []
+    scores = key.score([row.get("answers") for row in rows])
+    previous = np.array([-1 if row.get("score") is None else row["score"] for row in rows], dtype=np.int64)
+    changed = np.flatnonzero(scores != previous)
+    return [{**rows[i], "score": int(scores[i])} for i in changed]
+
+
+async def rescore_test(supabase: Repository, test_id: str, chunk_size: int = RESCORE_CHUNK_SIZE) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Recalcule les scores de toutes les soumissions d'un test avec le corrigé rechargé ; seules les lignes modifiées sont réécrites."""
+    key = await get_answer_key(supabase, test_id, refresh=True)
+    if key is None:
+        raise LookupError(test_id)
+    stats = {"test_id": test_id, "questions": len(key), "scored": 0, "updated": 0}
+    updated: List[Dict[str, Any]] = []
+    if not len(key):
+        return stats, updated
+    try:
+        build = lambda: supabase.table("test_submissions").select("id,answers,score,created_at").eq("test_id", test_id)
+        async for rows in fetch_chunks(build, chunk_size):
+            stats["scored"] += len(rows)
+            # UPDATE de la seule colonne score, un par valeur de score du paquet : les autres colonnes
+            # (et une soumission modifiée entre-temps) ne sont pas réécrites avec les lignes lues
+            by_score: Dict[int, List[str]] = {}
+            for row in score_rows(key, rows):
+                by_score.setdefault(row["score"], []).append(row["id"])
+            responses = await asyncio.gather(
+                *(supabase.table("test_submissions").update({"score": score}).in_("id", ids).execute() for score, ids in by_score.items())
+            )
+            for response in responses:
+                if getattr(response, "error", None):
+                    raise RuntimeError(str(response.error))
+                stats["updated"] += len(response.data)
+                updated.extend(response.data)
+    except ExportError as exc:
+        raise RuntimeError(str(exc))
+    return stats, updated
@@ -0,0 +1,358 @@
+import asyncio
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import orjson
+
+from app.services.metrics import observe_upstream
+from app.services.repository import QueryBuilder, QueryResponse, Repository
+
+# Index créés avec chaque table : clés étrangères et filtres de visibilité utilisés par les routes.
+# is_hidden seul est peu sélectif : il est indexé derrière course_id, comme le filtrent les routes.
+TABLE_INDEXES: Dict[str, Tuple[Tuple[str, ...], ...]] = {
+    "lessons": (("course_id", "is_hidden"),),
+    "exercises": (("course_id", "is_hidden"), ("lesson_id",)),
+    "tests": (("course_id",),),
+    "projects": (("course_id",),),
+    "submissions": (("user_id",), ("exercise_id",)),
+    "test_submissions": (("user_id",), ("test_id",)),
+    "project_submissions": (("user_id",), ("project_id",)),
+    "user_progress": (("user_id", "lesson_id"), ("lesson_id",)),
+}
+
+# Valeurs par défaut des colonnes du schéma Supabase (les filtres is_hidden / is_published en dépendent)
+TABLE_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "courses": {"is_hidden": False, "is_published": False, "nblessons": 0, "nbexercices": 0},
+    "lessons": {"is_hidden": False},
+    "exercises": {"is_hidden": False},
+    "tests": {"is_published": False},
+    "projects": {"is_published": False},
+}
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_COMPARISONS = {"eq": "=", "neq": "<>", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+class QueryError(Exception):
+    pass
+
+
+def _identifier(name: str) -> str:
+    if not _IDENTIFIER.match(name):
+        raise QueryError(f"Identifiant invalide : {name}")
+    return name
+
+
+def _column(name: str) -> str:
+    # Les lignes sont stockées en JSON : même expression que celle des index pour qu'ils servent
+    if _identifier(name) == "id":
+        return "id"
+    return f"json_extract(data, '$.{name}')"
+
+
+def _param(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (str, int, float)) or value is None:
+        return value
+    return str(value)
+
+
+def _dumps(row: Dict[str, Any]) -> bytes:
+    return orjson.dumps(row, default=str)
+
+
+def _coerce(text: str) -> Any:
+    # Valeurs textuelles des arbres or() (curseurs de pagination) : type deviné comme PostgREST le ferait
+    if text in ("true", "false"):
+        return text == "true"
+    if text == "null":
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        try:
+            return float(text)
+        except ValueError:
+            return text
+
+
+def _unquote(text: str) -> str:
+    if len(text) >= 2 and text[0] == '"' and text[-1] == '"':
+        return text[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return text
+
+
+def _split_top(text: str) -> List[str]:
+    # Découpe sur les virgules hors parenthèses et hors guillemets
+    parts, depth, quoted, escaped, current = [], 0, False, False, []
+    for char in text:
+        if escaped:
+            escaped = False
+        elif char == "\\" and quoted:
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == "," and depth == 0 and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    if current:
+        parts.append("".join(current))
+    return parts
+
+
+def _condition(column: str, operator: str, value: Any, params: List[Any]) -> str:
+    expression = _column(column)
+    if operator in _COMPARISONS:
+        if value is None:
+            return "0"
+        params.append(_param(value))
+        return f"{expression} {_COMPARISONS[operator]} ?"
+    if operator == "in":
+        values = list(value)
+        if not values:
+            return "0"
+        params.extend(_param(item) for item in values)
+        return f"{expression} IN ({','.join('?' * len(values))})"
+    if operator in ("ilike", "like"):
+        # SQLite : LIKE insensible à la casse (ASCII) ; like sensible via GLOB
+        pattern = str(value)
+        if operator == "like":
+            params.append(pattern.replace("%", "*"))
+            return f"{expression} GLOB ?"
+        params.append(pattern.replace("*", "%"))
+        return f"{expression} LIKE ?"
+    if operator == "is":
+        if value is None:
+            return f"{expression} IS NULL"
+        return f"{expression} = {1 if value else 0}"
+    raise QueryError(f"Opérateur non supporté : {operator}")
+
+
+def _tree(text: str, conjunction: str, params: List[Any]) -> str:
+    """Arbre logique PostgREST (« a.gt.1,and(a.eq.1,id.gt.x) ») traduit en SQL."""
+    parts = []
+    for part in _split_top(text):
+        nested = re.match(r"^(not\.)?(and|or)\((.*)\)$", part)
+        if nested:
+            sql = _tree(nested.group(3), nested.group(2), params)
+            parts.append(f"NOT ({sql})" if nested.group(1) else f"({sql})")
+            continue
+        column, _, rest = part.partition(".")
+        negate = rest.startswith("not.")
+        if negate:
+            rest = rest[4:]
+        operator, _, raw = rest.partition(".")
+        if operator == "in":
+            value: Any = [_coerce(_unquote(item)) for item in _split_top(raw[1:-1])]
+        elif operator in ("ilike", "like"):
+            value = _unquote(raw)
+        else:
+            value = _coerce(_unquote(raw))
+        sql = _condition(column, operator, value, params)
+        parts.append(f"NOT ({sql})" if negate else sql)
+    return f" {'AND' if conjunction == 'and' else 'OR'} ".join(parts) or "1"
+
+
+def _where(query: QueryBuilder, params: List[Any]) -> str:
+    conditions = []
+    for column, operator, value in query.filters:
+        if column in ("or", "and") and not operator:
+            conditions.append(f"({_tree(value[1:-1], column, params)})")
+        else:
+            conditions.append(_condition(column, operator, value, params))
+    return " WHERE " + " AND ".join(conditions) if conditions else ""
+
+
+def _order(query: QueryBuilder) -> str:
+    if not query.orders:
+        return ""
+    # Postgres : NULLS LAST en croissant, NULLS FIRST en décroissant
+    terms = [f"{_column(column)} {'DESC NULLS FIRST' if desc else 'ASC NULLS LAST'}" for column, desc in query.orders]
+    return " ORDER BY " + ", ".join(terms)
+
+
+def _projector(columns: str):
+    names = [name.strip() for name in columns.split(",") if name.strip()]
+    if not names or "*" in names:
+        return None
+    for name in names:
+        _identifier(name)
+    return lambda row: {name: row.get(name) for name in names}
+
+
+class SQLiteRepository(Repository):
+    """Backend SQLite embarqué (WAL) : une ligne = (id, document JSON), filtres traduits en json_extract indexés.
+
+    Les requêtes tournent dans un petit pool de threads, chacun avec sa connexion ; les écritures
+    sont sérialisées par SQLite (BEGIN IMMEDIATE + busy_timeout).
+    """
+
+    def __init__(self, path: str, threads: int = 4, busy_timeout: float = 5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        # Une base en mémoire n'est pas partagée entre connexions : un seul thread
+        self.threads = 1 if path == ":memory:" else max(1, threads)
+        self.max_in_flight = self.threads
+        self.in_flight = 0
+        self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="sqlite")
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._tables: set = set()
+        self._schema_lock = threading.Lock()
+
+    # --- connexions et schéma ---
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+            self._local.connection = connection
+            with self._schema_lock:
+                self._connections.append(connection)
+        return connection
+
+    def _ensure_table(self, connection: sqlite3.Connection, table: str) -> str:
+        if table in self._tables:
+            return table
+        with self._schema_lock:
+            if table not in self._tables:
+                name = _identifier(table)
+                connection.execute(f'CREATE TABLE IF NOT EXISTS "{name}" (id PRIMARY KEY, data TEXT NOT NULL)')
+                for columns in TABLE_INDEXES.get(name, ()):
+                    expressions = ", ".join(_column(column) for column in columns)
+                    connection.execute(f'CREATE INDEX IF NOT EXISTS "ix_{name}_{"_".join(columns)}" ON "{name}" ({expressions})')
+                self._tables.add(table)
+        return table
+
+    # --- exécution ---
+    async def execute(self, query: QueryBuilder) -> QueryResponse:
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        self.in_flight += 1
+        try:
+            result = await loop.run_in_executor(self._executor, self._execute, query)
+        finally:
+            self.in_flight -= 1
+        observe_upstream(query.table, query.operation, time.perf_counter() - started, result.data, result.error)
+        return result
+
+    def _execute(self, query: QueryBuilder) -> QueryResponse:
+        connection = self._connection()
+        try:
+            table = self._ensure_table(connection, query.table)
+            if query.operation == "select":
+                return self._select(connection, table, query)
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                if query.operation in ("insert", "upsert"):
+                    rows = self._write(connection, table, query)
+                elif query.operation == "update":
+                    rows = self._update(connection, table, query)
+                else:
+                    rows = self._delete(connection, table, query)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        except QueryError as exc:
+            return QueryResponse(error=f"400: {exc}")
+        except sqlite3.IntegrityError as exc:
+            return QueryResponse(error=f"409: {exc}")
+        except sqlite3.Error as exc:
+            return QueryResponse(error=f"{type(exc).__name__}: {exc}")
+        project = _projector(query.columns)
+        data: Any = [project(row) for row in rows] if project else rows
+        if query.is_single:
+            data = data[0] if data else None
+        return QueryResponse(data=data)
+
+    def _select(self, connection: sqlite3.Connection, table: str, query: QueryBuilder) -> QueryResponse:
+        params: List[Any] = []
+        where = _where(query, params)
+        sql = f'SELECT data FROM "{table}"{where}{_order(query)}'
+        page_params = list(params)
+        if query.limit_value is not None or query.offset:
+            sql += " LIMIT ? OFFSET ?"
+            page_params += [query.limit_value if query.limit_value is not None else -1, query.offset or 0]
+        rows = [orjson.loads(data) for (data,) in connection.execute(sql, page_params)]
+        count = None
+        if query.count:
+            count = connection.execute(f'SELECT COUNT(*) FROM "{table}"{where}', params).fetchone()[0]
+        project = _projector(query.columns)
+        data: Any = [project(row) for row in rows] if project else rows
+        if query.is_single:
+            data = data[0] if data else None
+        return QueryResponse(data=data, count=count)
+
+    def _matching(self, connection: sqlite3.Connection, table: str, query: QueryBuilder) -> List[Tuple[Any, Dict[str, Any]]]:
+        params: List[Any] = []
+        sql = f'SELECT id, data FROM "{table}"{_where(query, params)}'
+        return [(row_id, orjson.loads(data)) for row_id, data in connection.execute(sql, params)]
+
+    def _write(self, connection: sqlite3.Connection, table: str, query: QueryBuilder) -> List[Dict[str, Any]]:
+        payload = query.payload if isinstance(query.payload, list) else [query.payload]
+        conflict: Sequence[str] = [c.strip() for c in (query.on_conflict or "id").split(",")] if query.operation == "upsert" else ()
+        now = datetime.now(timezone.utc).isoformat()
+        written = []
+        for item in payload:
+            row = {key: _param(value) if isinstance(value, (datetime, date)) else value for key, value in item.items()}
+            existing = self._find(connection, table, conflict, row) if conflict else None
+            if existing is not None:
+                # resolution=merge-duplicates : les colonnes fournies remplacent celles de la ligne existante
+                old_id, current = existing
+                current.update(row)
+                connection.execute(f'UPDATE "{table}" SET id = ?, data = ? WHERE id = ?', (current["id"], _dumps(current), old_id))
+                written.append(current)
+                continue
+            # Valeurs par défaut des tables Supabase
+            row.setdefault("id", str(uuid.uuid4()))
+            row.setdefault("created_at", now)
+            for column, value in TABLE_DEFAULTS.get(table, {}).items():
+                row.setdefault(column, value)
+            connection.execute(f'INSERT INTO "{table}" (id, data) VALUES (?, ?)', (row["id"], _dumps(row)))
+            written.append(row)
+        return written
+
+    def _find(self, connection: sqlite3.Connection, table: str, columns: Sequence[str], row: Dict[str, Any]) -> Optional[Tuple[Any, Dict[str, Any]]]:
+        if any(column not in row for column in columns):
+            return None
+        params = [_param(row[column]) for column in columns]
+        where = " AND ".join(f"{_column(column)} = ?" for column in columns)
+        found = connection.execute(f'SELECT id, data FROM "{table}" WHERE {where} LIMIT 1', params).fetchone()
+        return (found[0], orjson.loads(found[1])) if found else None
+
+    def _update(self, connection: sqlite3.Connection, table: str, query: QueryBuilder) -> List[Dict[str, Any]]:
+        changes = {key: _param(value) if isinstance(value, (datetime, date)) else value for key, value in query.payload.items()}
+        updated = []
+        for row_id, row in self._matching(connection, table, query):
+            row.update(changes)
+            connection.execute(f'UPDATE "{table}" SET id = ?, data = ? WHERE id = ?', (row.get("id", row_id), _dumps(row), row_id))
+            updated.append(row)
+        return updated
+
+    def _delete(self, connection: sqlite3.Connection, table: str, query: QueryBuilder) -> List[Dict[str, Any]]:
+        rows = self._matching(connection, table, query)
+        connection.executemany(f'DELETE FROM "{table}" WHERE id = ?', [(row_id,) for row_id, _ in rows])
+        return [row for _, row in rows]
+
+    async def close(self):
+        self._executor.shutdown(wait=True)
+        with self._schema_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
@@ -1,14 +1,150 @@
 import os
-from supabase import create_client, Client
+import threading
+from typing import Optional
+
+import httpx
 from dotenv import load_dotenv
 
+from app.services.metrics import registry
+from app.services.repository import PostgrestRepository, Repository
+from app.services.sqlite_repository import SQLiteRepository
+
 load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+# Backend de stockage : "supabase" (PostgREST) ou "sqlite" (fichier local, nœud unique / hors ligne)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "vba.sqlite3")
+SQLITE_THREADS = int(os.getenv("SQLITE_THREADS", "4"))
 
-if not SUPABASE_URL or not SUPABASE_KEY:
+if STORAGE_BACKEND not in ("supabase", "sqlite"):
+    raise ValueError("STORAGE_BACKEND doit valoir supabase ou sqlite")
+if STORAGE_BACKEND == "supabase" and (not SUPABASE_URL or not SUPABASE_KEY):
     raise ValueError("Les variables SUPABASE_URL et SUPABASE_KEY doivent être définies dans le fichier .env")
 
-def get_supabase() -> Client:
-    return create_client(SUPABASE_URL, SUPABASE_KEY) 
\ No newline at end of file
+# Réglages du pool de connexions HTTP vers Supabase (un pool par worker)
+POOL_MAX_CONNECTIONS = int(os.getenv("SUPABASE_POOL_MAX_CONNECTIONS", "20"))
+POOL_MAX_KEEPALIVE = int(os.getenv("SUPABASE_POOL_MAX_KEEPALIVE", "10"))
+POOL_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_POOL_KEEPALIVE_EXPIRY", "30"))
+POOL_TIMEOUT = float(os.getenv("SUPABASE_POOL_TIMEOUT", "5"))
+CONNECT_TIMEOUT = float(os.getenv("SUPABASE_CONNECT_TIMEOUT", "5"))
+REQUEST_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "10"))
+# Nombre maximal de requêtes PostgREST simultanées par worker
+MAX_IN_FLIGHT = int(os.getenv("SUPABASE_MAX_IN_FLIGHT", "100"))
+
+
+class PoolStats:
+    """Compteurs du pool : réutilisation (hit), nouvelle connexion (miss), attente (wait)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+
+    def record(self, kind: str):
+        with self._lock:
+            setattr(self, kind, getattr(self, kind) + 1)
+
+    def reset(self):
+        with self._lock:
+            self.hits = self.misses = self.waits = 0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "waits": self.waits}
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedTransport(httpx.AsyncHTTPTransport):
+    """Transport httpx qui classe chaque requête selon l'état du pool avant l'envoi."""
+
+    def __init__(self, stats: PoolStats, **kwargs):
+        super().__init__(**kwargs)
+        self._stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self._stats.record(self._classify())
+        return await super().handle_async_request(request)
+
+    def _classify(self) -> str:
+        pool = self._pool
+        connections = list(getattr(pool, "connections", []))
+        if any(conn.is_available() for conn in connections):
+            return "hits"
+        max_connections = getattr(pool, "_max_connections", None)
+        if max_connections is None or len(connections) < max_connections:
+            return "misses"
+        return "waits"
+
+
+_repository: Optional[Repository] = None
+_lock = threading.Lock()
+
+registry.callback_gauge("supabase_requests_in_flight", "Requêtes Supabase en cours.", lambda: _repository.in_flight if _repository else 0)
+
+
+def _build_http_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=POOL_MAX_KEEPALIVE,
+        keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT, pool=POOL_TIMEOUT)
+    transport = InstrumentedTransport(pool_stats, limits=limits)
+    return httpx.AsyncClient(transport=transport, timeout=timeout)
+
+
+def init_supabase() -> Repository:
+    """Crée le repository partagé du worker (appelé au démarrage de l'application)."""
+    global _repository
+    with _lock:
+        if _repository is None:
+            if STORAGE_BACKEND == "sqlite":
+                _repository = SQLiteRepository(SQLITE_PATH, threads=SQLITE_THREADS)
+            else:
+                _repository = PostgrestRepository(
+                    _build_http_client(),
+                    f"{SUPABASE_URL.rstrip('/')}/rest/v1",
+                    SUPABASE_KEY,
+                    max_in_flight=MAX_IN_FLIGHT,
+                )
+        return _repository
+
+
+async def close_supabase():
+    """Ferme les connexions keep-alive ou la base SQLite (appelé à l'arrêt de l'application)."""
+    global _repository
+    with _lock:
+        repository = _repository
+        _repository = None
+    if repository is not None:
+        await repository.close()
+
+
+def get_repository() -> Repository:
+    # Accès hors requête (tâches de fond, scripts) : crée le repository à la demande
+    if _repository is None:
+        return init_supabase()
+    return _repository
+
+
+async def get_supabase() -> Repository:
+    # Dépendance FastAPI : renvoie le repository partagé du worker
+    return get_repository()
+
+
+def get_pool_stats() -> dict:
+    repository = _repository
+    return {
+        **pool_stats.snapshot(),
+        "in_flight": repository.in_flight if repository else 0,
+        "max_in_flight": MAX_IN_FLIGHT,
+        "max_connections": POOL_MAX_CONNECTIONS,
+        "max_keepalive_connections": POOL_MAX_KEEPALIVE,
+        "keepalive_expiry": POOL_KEEPALIVE_EXPIRY,
+        "pool_timeout": POOL_TIMEOUT,
+    }
@@ -0,0 +1,367 @@
+import asyncio
+import glob
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import orjson
+
+from app.services.metrics import UPSTREAM_BUCKETS, registry
+from app.services.repository import Repository
+
+try:
+    import fcntl
+except ImportError:  # hors Unix : pas de verrou, un seul worker par répertoire de journal
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Écriture différée (optionnelle) des soumissions : acquittées une fois journalisées sur disque,
+# puis regroupées en insertions multi-lignes vers Supabase par une tâche de fond.
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() in ("1", "true", "yes")
+WRITE_BEHIND_DIR = os.getenv("WRITE_BEHIND_DIR", "write_behind")
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "0.05"))
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500"))
+WRITE_BEHIND_MAX_BUFFER = int(os.getenv("WRITE_BEHIND_MAX_BUFFER", "100000"))
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", "5"))
+WRITE_BEHIND_COMPACT_BYTES = int(os.getenv("WRITE_BEHIND_COMPACT_BYTES", str(1024 * 1024)))
+
+# Valeurs par défaut que Supabase remplirait à l'insertion : fixées avant l'acquittement
+DEFAULT_TIMESTAMPS = {"submissions": "created_at", "test_submissions": "created_at", "project_submissions": "created_at"}
+
+write_flushed = registry.counter("write_behind_flushed_rows_total", "Lignes différées écrites dans Supabase, par table.", ("table",))
+write_errors = registry.counter("write_behind_flush_errors_total", "Échecs d'écriture groupée vers Supabase, par table.", ("table",))
+write_rejected = registry.counter("write_behind_rejected_rows_total", "Lignes refusées par Supabase (4xx), mises de côté.", ("table",))
+write_duration = registry.histogram("write_behind_flush_duration_seconds", "Durée d'une écriture groupée.", ("table",), UPSTREAM_BUCKETS)
+
+
+class WriteEntry:
+    __slots__ = ("seq", "table", "row", "on_conflict", "appended_at", "flushed")
+
+    def __init__(self, seq: int, table: str, row: Dict[str, Any], on_conflict: str):
+        self.seq = seq
+        self.table = table
+        self.row = row
+        self.on_conflict = on_conflict
+        self.appended_at = time.monotonic()
+        # True une fois la ligne dans Supabase, False si elle a été refusée
+        self.flushed: Optional[asyncio.Future] = None
+
+    def record(self) -> Dict[str, Any]:
+        return {"seq": self.seq, "table": self.table, "on_conflict": self.on_conflict, "row": self.row}
+
+
+def _read_log(path: str) -> List[Dict[str, Any]]:
+    """Entrées non encore écrites d'un journal (celles après le dernier repère « flushed »)."""
+    entries: List[Dict[str, Any]] = []
+    flushed = 0
+    with open(path, "rb") as log:
+        for line in log:
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                # Dernière ligne tronquée par un arrêt brutal : jamais acquittée
+                continue
+            if "flushed" in record:
+                flushed = max(flushed, record["flushed"])
+            else:
+                entries.append(record)
+    return [entry for entry in entries if entry["seq"] > flushed]
+
+
+class WriteBuffer:
+    """Tampon d'écriture différée adossé à un journal local en ajout seul.
+
+    `append` écrit la ligne dans le journal et attend un fsync (partagé entre les écritures
+    concurrentes) avant d'acquitter ; le flusher envoie ensuite les lignes par paquets
+    (upsert sur l'identifiant, donc rejouable sans doublon) toutes les `flush_interval`
+    secondes ou dès `batch_size` lignes. Au démarrage, les journaux laissés par un worker
+    arrêté sont repris. Chaque worker a son propre fichier, verrouillé tant qu'il vit.
+    """
+
+    def __init__(self, directory: str, flush_interval: float = 0.05, batch_size: int = 500, max_buffer: int = 100000, max_attempts: int = 5, compact_bytes: int = 1024 * 1024):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_buffer = max_buffer
+        self.max_attempts = max_attempts
+        self.compact_bytes = compact_bytes
+        self.enabled = False
+        self.path: Optional[str] = None
+        self._log = None
+        self._buffer: Deque[WriteEntry] = deque()
+        self._seq = 0
+        self._synced = 0
+        self._sync_task: Optional[asyncio.Task] = None
+        self._kick: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._supabase: Optional[Repository] = None
+        self.appended = 0
+        self.flushed = 0
+        self.rejected = 0
+        self.fallbacks = 0
+        self.replayed = 0
+        self.last_flush_at: Optional[float] = None
+
+    # --- cycle de vie ---
+    async def start(self, supabase: Repository) -> List[WriteEntry]:
+        """Ouvre le journal du worker, reprend les journaux orphelins et lance le flusher ; renvoie les entrées rejouées."""
+        self._supabase = supabase
+        self._kick = asyncio.Event()
+        self._full = asyncio.Event()
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, f"{os.getpid()}-{uuid.uuid4().hex[:8]}.log")
+        self._log = open(self.path, "ab")
+        if fcntl is not None:
+            fcntl.flock(self._log.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self.enabled = True
+        replayed = await self._replay_orphans()
+        self._flusher = asyncio.create_task(self._flush_loop())
+        return replayed
+
+    async def stop(self, timeout: float = 10):
+        """Dernière vidange ; le journal n'est supprimé que si tout a été écrit."""
+        if not self.enabled:
+            return
+        self.enabled = False
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        if self._sync_task is not None:
+            await asyncio.gather(self._sync_task, return_exceptions=True)
+        try:
+            await asyncio.wait_for(self._drain(), timeout)
+        except (asyncio.TimeoutError, RuntimeError) as exc:
+            logger.warning("Écriture différée : %d lignes restent dans %s (%s)", len(self._buffer), self.path, exc)
+        self._log.close()
+        if not self._buffer:
+            os.remove(self.path)
+
+    async def _replay_orphans(self) -> List[WriteEntry]:
+        replayed: List[WriteEntry] = []
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.log"))):
+            if path == self.path:
+                continue
+            try:
+                orphan = open(path, "rb")
+            except OSError:
+                continue
+            with orphan:
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(orphan.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        continue  # journal d'un worker vivant
+                if os.fstat(orphan.fileno()).st_nlink == 0:
+                    continue  # déjà repris par un autre worker pendant qu'on attendait le verrou
+                records = _read_log(path)
+                # Recopiées dans notre journal avant de supprimer l'orphelin
+                entries = [self._write(record["table"], record["row"], record.get("on_conflict", "id")) for record in records]
+                if entries:
+                    await self._sync(self._seq)
+                os.remove(path)
+            for entry in entries:
+                self._push(entry)
+            replayed.extend(entries)
+        if replayed:
+            self.replayed += len(replayed)
+            logger.info("Écriture différée : %d lignes rejouées depuis les journaux précédents", len(replayed))
+        return replayed
+
+    # --- journal ---
+    def _write(self, table: str, row: Dict[str, Any], on_conflict: str) -> WriteEntry:
+        self._seq += 1
+        entry = WriteEntry(self._seq, table, row, on_conflict)
+        entry.flushed = asyncio.get_running_loop().create_future()
+        self._log.write(orjson.dumps(entry.record(), default=str) + b"\n")
+        return entry
+
+    async def _sync(self, seq: int):
+        # fsync groupé : une seule synchronisation couvre toutes les lignes écrites avant elle
+        while self._synced < seq:
+            if self._sync_task is None:
+                self._sync_task = asyncio.create_task(self._fsync())
+            task = self._sync_task
+            await asyncio.shield(task)
+
+    async def _fsync(self):
+        target = self._seq
+        try:
+            self._log.flush()
+            await asyncio.get_running_loop().run_in_executor(None, os.fsync, self._log.fileno())
+            self._synced = target
+        finally:
+            self._sync_task = None
+
+    def _push(self, entry: WriteEntry):
+        self._buffer.append(entry)
+        self._kick.set()
+        if len(self._buffer) >= self.batch_size:
+            self._full.set()
+
+    def prepare(self, table: str, data: Dict[str, Any], on_conflict: str = "id") -> Dict[str, Any]:
+        """Ligne à passer à `append`, identifiant et horodatage fixés (inchangée si le mode est désactivé).
+
+        En cas de repli (None renvoyé par `append`), c'est cette ligne qu'il faut écrire directement :
+        une ligne déjà partie dans le journal sera rejouée sur le même identifiant, sans doublon.
+        """
+        if not self.enabled:
+            return data
+        row = dict(data)
+        if on_conflict == "id":
+            # Identifiant fixé dès l'acquittement : le rejeu réécrit la même ligne
+            row.setdefault("id", str(uuid.uuid4()))
+        timestamp = DEFAULT_TIMESTAMPS.get(table)
+        if timestamp:
+            row.setdefault(timestamp, datetime.now(timezone.utc).isoformat())
+        return row
+
+    async def append(self, table: str, data: Dict[str, Any], on_conflict: str = "id") -> Optional[WriteEntry]:
+        """Journalise une ligne et l'acquitte ; None si le mode est désactivé ou indisponible (écriture directe)."""
+        if not self.enabled or len(self._buffer) >= self.max_buffer:
+            if self.enabled:
+                self.fallbacks += 1
+            return None
+        row = self.prepare(table, data, on_conflict)
+        try:
+            entry = self._write(table, row, on_conflict)
+            await self._sync(entry.seq)
+        except OSError:
+            # Journal inutilisable : la ligne (peut-être déjà écrite, en entier ou non, dans le journal) part
+            # directement ; l'appelant écrit la ligne de `prepare`, même identifiant, donc sans doublon au rejeu
+            logger.exception("Écriture différée : journal %s indisponible", self.path)
+            self.fallbacks += 1
+            return None
+        self.appended += 1
+        self._push(entry)
+        return entry
+
+    # --- vidange ---
+    async def _flush_loop(self):
+        failures = 0
+        while True:
+            await self._kick.wait()
+            if len(self._buffer) < self.batch_size:
+                # On laisse les lignes s'accumuler pendant flush_interval, sauf si un paquet se remplit
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._kick.clear()
+            self._full.clear()
+            while self._buffer:
+                try:
+                    await self._flush_batch(failures)
+                    failures = 0
+                except RuntimeError as exc:
+                    failures += 1
+                    delay = min(5.0, self.flush_interval * 2 ** failures)
+                    logger.warning("Écriture différée : échec (%s), nouvel essai dans %.2f s", exc, delay)
+                    await asyncio.sleep(delay)
+            self._compact()
+
+    async def _drain(self):
+        while self._buffer:
+            await self._flush_batch(0)
+
+    async def _flush_batch(self, failures: int):
+        batch = [self._buffer[i] for i in range(min(self.batch_size, len(self._buffer)))]
+        # Regroupement par table et colonnes (PostgREST exige les mêmes clés dans un insert multiple)
+        groups: Dict[Tuple[str, str, Tuple[str, ...]], List[WriteEntry]] = {}
+        for entry in batch:
+            groups.setdefault((entry.table, entry.on_conflict, tuple(sorted(entry.row))), []).append(entry)
+        rejected: List[WriteEntry] = []
+        isolate = failures >= self.max_attempts
+        for (table, on_conflict, _), entries in groups.items():
+            if isolate:
+                # Échecs répétés : ligne par ligne, pour isoler une ligne refusée sans bloquer les autres
+                for entry in entries:
+                    rejected.extend(await self._upsert(table, on_conflict, [entry], isolate=True))
+            else:
+                rejected.extend(await self._upsert(table, on_conflict, entries))
+        for _ in batch:
+            self._buffer.popleft()
+        for entry in batch:
+            if not entry.flushed.done():
+                entry.flushed.set_result(entry not in rejected)
+        self.flushed += len(batch) - len(rejected)
+        self.last_flush_at = time.time()
+        # Repère de progression : au rejeu, tout ce qui précède est déjà dans Supabase
+        self._log.write(orjson.dumps({"flushed": batch[-1].seq}) + b"\n")
+
+    async def _upsert(self, table: str, on_conflict: str, entries: List[WriteEntry], isolate: bool = False) -> List[WriteEntry]:
+        # Une seule ligne par clé de conflit (Postgres refuse de modifier deux fois la même ligne) : la dernière l'emporte
+        columns = on_conflict.split(",")
+        rows = {tuple(entry.row.get(column) for column in columns): entry.row for entry in entries}
+        started = time.perf_counter()
+        response = await self._supabase.table(table).upsert(list(rows.values()), on_conflict=on_conflict).execute()
+        write_duration.observe((table,), time.perf_counter() - started)
+        error = getattr(response, "error", None)
+        if not error:
+            write_flushed.inc((table,), len(entries))
+            return []
+        write_errors.inc((table,))
+        if isolate and len(entries) == 1 and error[:1] == "4":
+            # Ligne refusée par la base (contrainte, colonne inconnue...) : mise de côté plutôt que perdue
+            self._dead_letter(entries[0], error)
+            return entries
+        raise RuntimeError(f"{table}: {error}")
+
+    def _dead_letter(self, entry: WriteEntry, error: str):
+        self.rejected += 1
+        write_rejected.inc((entry.table,))
+        logger.error("Écriture différée : ligne %s de %s refusée (%s)", entry.row.get("id"), entry.table, error)
+        with open(os.path.join(self.directory, "rejected.ndjson"), "ab") as dead:
+            dead.write(orjson.dumps({**entry.record(), "error": error}, default=str) + b"\n")
+
+    def _compact(self):
+        # Tout est écrit et synchronisé : le journal peut repartir de zéro
+        if self._buffer or self._sync_task is not None or self._synced < self._seq:
+            return
+        if self._log.tell() < self.compact_bytes:
+            return
+        self._log.flush()
+        self._log.truncate(0)
+
+    def pending(self, table: str) -> List[Dict[str, Any]]:
+        """Lignes acquittées mais pas encore écrites dans la table (à ajouter à une lecture de reconstruction)."""
+        return [entry.row for entry in self._buffer if entry.table == table]
+
+    # --- suivi ---
+    def lag(self) -> float:
+        return time.monotonic() - self._buffer[0].appended_at if self._buffer else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "log": self.path,
+            "buffered": len(self._buffer),
+            "lag_seconds": round(self.lag(), 3),
+            "appended": self.appended,
+            "flushed": self.flushed,
+            "rejected": self.rejected,
+            "fallbacks": self.fallbacks,
+            "replayed": self.replayed,
+            "last_flush_at": self.last_flush_at,
+            "flush_interval": self.flush_interval,
+            "batch_size": self.batch_size,
+        }
+
+
+write_buffer = WriteBuffer(
+    WRITE_BEHIND_DIR,
+    flush_interval=WRITE_BEHIND_FLUSH_INTERVAL,
+    batch_size=WRITE_BEHIND_BATCH_SIZE,
+    max_buffer=WRITE_BEHIND_MAX_BUFFER,
+    max_attempts=WRITE_BEHIND_MAX_ATTEMPTS,
+    compact_bytes=WRITE_BEHIND_COMPACT_BYTES,
+)
+
+registry.callback_gauge("write_behind_buffered_rows", "Lignes acquittées en attente d'écriture dans Supabase.", lambda: len(write_buffer._buffer))
+registry.callback_gauge("write_behind_flush_lag_seconds", "Âge de la plus ancienne ligne en attente d'écriture.", write_buffer.lag)
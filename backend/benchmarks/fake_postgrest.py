@@ -0,0 +1,338 @@
+"""Serveur PostgREST minimal en mémoire pour les benchmarks (aucune dépendance externe).
+
+Supporte le sous-ensemble utilisé par app/services/repository.py : select de colonnes, filtres
+eq/neq/gt/gte/lt/lte/in/ilike/like/is et arbres or()/and(), order, limit/offset, Content-Range,
+insert, upsert (on_conflict), update et delete. Une latence artificielle peut être injectée.
+Comme PostgREST (db-max-rows), une lecture renvoie au plus `max_rows` lignes, sans erreur.
+
+    python -m benchmarks.fake_postgrest --port 54321 --latency 5 --jitter 2 --submissions 5000
+"""
+import argparse
+import functools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+from urllib.parse import parse_qsl, urlsplit
+
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+
+def _coerce(value: str) -> Any:
+    if value == "true":
+        return True
+    if value == "false":
+        return False
+    if value == "null":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        return value[1:-1].replace('\\"', '"')
+    return value
+
+
+def _split_top(text: str) -> List[str]:
+    # Découpe sur les virgules hors parenthèses et hors guillemets
+    parts, depth, quoted, current = [], 0, False, ""
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == "," and depth == 0 and not quoted:
+            parts.append(current)
+            current = ""
+        else:
+            current += char
+    if current:
+        parts.append(current)
+    return parts
+
+
+@functools.lru_cache(maxsize=256)
+def _in_items(value: str) -> frozenset:
+    # Liste in.(...) analysée une fois, pas à chaque ligne filtrée
+    return frozenset(_unquote(item) for item in _split_top(value[1:-1]))
+
+
+def _comparable(cell: Any, value: str) -> Any:
+    if isinstance(cell, bool) or cell is None:
+        return _coerce(value)
+    if isinstance(cell, (int, float)):
+        coerced = _coerce(value)
+        return coerced if isinstance(coerced, (int, float)) else value
+    return value
+
+
+def _match(row: Dict[str, Any], column: str, expression: str) -> bool:
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    operator, _, value = expression.partition(".")
+    cell = row.get(column)
+    if operator == "in":
+        items = _in_items(value)
+        result = cell is not None and str(cell) in items
+    elif operator in ("ilike", "like"):
+        pattern = re.escape(_unquote(value)).replace(r"\*", ".*").replace("%", ".*")
+        result = cell is not None and re.fullmatch(pattern, str(cell), re.I if operator == "ilike" else 0) is not None
+    elif operator == "is":
+        result = cell is _coerce(value)
+    else:
+        value = _unquote(value)
+        other = _comparable(cell, value)
+        if operator == "eq":
+            result = cell == other
+        elif operator == "neq":
+            result = cell != other
+        elif cell is None or other is None:
+            result = False
+        else:
+            a, b = (cell, other) if not isinstance(cell, str) else (cell, str(other))
+            result = {"gt": a > b, "gte": a >= b, "lt": a < b, "lte": a <= b}[operator]
+    return not result if negate else result
+
+
+def _match_tree(row: Dict[str, Any], expression: str, conjunction: str) -> bool:
+    results = []
+    for part in _split_top(expression):
+        nested = re.match(r"^(and|or)\((.*)\)$", part)
+        if nested:
+            results.append(_match_tree(row, nested.group(2), nested.group(1)))
+        else:
+            column, _, rest = part.partition(".")
+            results.append(_match(row, column, rest))
+    return all(results) if conjunction == "and" else any(results)
+
+
+class Store:
+    def __init__(self):
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.lock = threading.Lock()
+
+    def filter(self, table: str, params: List[tuple]) -> List[Dict[str, Any]]:
+        rows = self.tables.get(table, [])
+        for key, value in params:
+            if key in RESERVED_PARAMS:
+                continue
+            if key in ("or", "and"):
+                rows = [row for row in rows if _match_tree(row, value[1:-1], key)]
+            else:
+                rows = [row for row in rows if _match(row, key, value)]
+        return rows
+
+
+def _project(rows: List[Dict[str, Any]], params: Dict[str, str]) -> List[Dict[str, Any]]:
+    columns = params.get("select", "*")
+    if not columns or columns == "*":
+        return [dict(row) for row in rows]
+    names = [name.strip() for name in _split_top(columns)]
+    return [{name: row.get(name) for name in names} for row in rows]
+
+
+def _sort(rows: List[Dict[str, Any]], order: str) -> List[Dict[str, Any]]:
+    for spec in reversed(order.split(",")):
+        column, _, direction = spec.partition(".")
+        descending = direction.startswith("desc")
+        # NULL en dernier en ordre croissant, en premier en ordre décroissant (comme Postgres)
+        present = sorted((row for row in rows if row.get(column) is not None), key=lambda row: row[column], reverse=descending)
+        missing = [row for row in rows if row.get(column) is None]
+        rows = missing + present if descending else present + missing
+    return rows
+
+
+def make_handler(store: Store, latency: float, jitter: float, max_rows: int = 1000):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _delay(self):
+            if latency or jitter:
+                time.sleep(max(0.0, random.gauss(latency, jitter)) / 1000)
+
+        def _send(self, code: int, body: Any, headers: Dict[str, str] = None):
+            payload = json.dumps(body, default=str).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _parse(self):
+            url = urlsplit(self.path)
+            return url.path.rsplit("/", 1)[-1], parse_qsl(url.query, keep_blank_values=True)
+
+        def _body(self) -> Any:
+            length = int(self.headers.get("Content-Length", 0))
+            return json.loads(self.rfile.read(length) or b"null")
+
+        def do_GET(self):
+            self._delay()
+            table, params = self._parse()
+            options = dict(params)
+            with store.lock:
+                rows = list(store.filter(table, params))
+            if "order" in options:
+                rows = _sort(rows, options["order"])
+            total = len(rows)
+            offset = int(options.get("offset", 0))
+            limit = min(int(options["limit"]), max_rows) if "limit" in options else max_rows
+            rows = rows[offset:offset + limit]
+            self._send(200, _project(rows, options), {"Content-Range": f"{offset}-{offset + len(rows) - 1}/{total}"})
+
+        def do_POST(self):
+            self._delay()
+            table, params = self._parse()
+            options = dict(params)
+            body = self._body()
+            rows = body if isinstance(body, list) else [body]
+            merge = "merge-duplicates" in self.headers.get("Prefer", "")
+            conflict = options.get("on_conflict", "id").split(",")
+            output = []
+            with store.lock:
+                target = store.tables.setdefault(table, [])
+                index = {tuple(row.get(c) for c in conflict): row for row in target} if merge else {}
+                for row in rows:
+                    row = dict(row)
+                    existing = index.get(tuple(row.get(c) for c in conflict)) if merge else None
+                    if existing is not None:
+                        existing.update(row)
+                        output.append(existing)
+                        continue
+                    row.setdefault("id", str(uuid.uuid4()))
+                    row.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+                    target.append(row)
+                    if merge:
+                        index[tuple(row.get(c) for c in conflict)] = row
+                    output.append(row)
+                output = _project(output, options)
+            self._send(201, output)
+
+        def do_PATCH(self):
+            self._delay()
+            table, params = self._parse()
+            body = self._body()
+            with store.lock:
+                rows = store.filter(table, params)
+                for row in rows:
+                    row.update(body)
+                output = _project(rows, dict(params))
+            self._send(200, output)
+
+        def do_DELETE(self):
+            self._delay()
+            table, params = self._parse()
+            with store.lock:
+                rows = store.filter(table, params)
+                removed = {id(row) for row in rows}
+                store.tables[table] = [row for row in store.tables.get(table, []) if id(row) not in removed]
+                output = _project(rows, dict(params))
+            self._send(200, output)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def seed(store: Store, courses: int = 10, lessons: int = 12, exercises: int = 8, questions: int = 200, submissions: int = 5000, users: int = 500, rng_seed: int = 42):
+    """Données déterministes : identifiants c{i}, l{i}, e{i}, q{i}, t{i}, p{i}, s{i}, utilisateurs u{i}."""
+    rng = random.Random(rng_seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    paragraph = "Sub Exemple()\n    MsgBox \"Bonjour\"\nEnd Sub\n" * 40
+    tables = store.tables
+    tables["courses"] = [
+        {"id": f"c{i}", "title": f"Cours {i}", "description": "VBA " * 20, "content": {"intro": paragraph}, "thumbnail_url": None,
+         "order_index": i, "is_published": True, "is_hidden": False, "difficulty": "beginner", "estimated_hours": 4,
+         "teacher_id": "teacher", "nblessons": lessons, "nbexercices": exercises, "created_at": (start + timedelta(days=i)).isoformat()}
+        for i in range(courses)
+    ]
+    tables["lessons"] = [
+        {"id": f"l{i}", "title": f"Leçon {i}", "content": paragraph * 3, "course_id": f"c{i // lessons}", "order_index": i % lessons,
+         "is_hidden": False, "created_at": (start + timedelta(hours=i)).isoformat()}
+        for i in range(courses * lessons)
+    ]
+    tables["exercises"] = [
+        {"id": f"e{i}", "title": f"Exercice {i}", "description": "Écrire une macro", "vba_template": paragraph, "expected_output": "42",
+         "test_cases": [{"input": str(n), "expected_output": "42"} for n in range(3)], "hints": ["Utiliser MsgBox"], "difficulty": "beginner",
+         "max_score": 100, "time_limit": None, "course_id": f"c{i // exercises}", "lesson_id": f"l{(i // exercises) * lessons + i % exercises}",
+         "type": "code", "is_hidden": False, "created_at": (start + timedelta(hours=i)).isoformat()}
+        for i in range(courses * exercises)
+    ]
+    types = ["qcm", "qcm", "text", "code"]
+    tables["question_bank"] = [
+        {"id": f"q{i}", "question": f"Question {i}", "type": types[i % 4], "choices": ["A", "B", "C", "D"] if types[i % 4] == "qcm" else None,
+         "answer": "B" if types[i % 4] != "code" else None, "created_by": "teacher", "created_at": (start + timedelta(minutes=i)).isoformat()}
+        for i in range(questions)
+    ]
+    tables["tests"] = [
+        {"id": f"t{i}", "title": f"Examen {i}", "description": None, "course_id": f"c{i}", "start_date": None,
+         "end_date": "2030-01-01T00:00:00+00:00", "is_published": True, "question_ids": [f"q{(i * 10 + n) % questions}" for n in range(10)],
+         "created_at": (start + timedelta(days=i)).isoformat()}
+        for i in range(courses)
+    ]
+    tables["projects"] = [
+        {"id": f"p{i}", "title": f"Projet {i}", "description": None, "course_id": f"c{i}", "is_published": True,
+         "created_at": (start + timedelta(days=i)).isoformat()}
+        for i in range(courses)
+    ]
+    tables["submissions"] = [
+        {"id": f"s{i}", "user_id": f"u{rng.randrange(users)}", "exercise_id": f"e{rng.randrange(courses * exercises)}", "code": paragraph[:200],
+         "output": rng.choice(["42", "41", ""]), "score": rng.choice([None, 50, 100]), "feedback": None,
+         "created_at": (start + timedelta(seconds=i * 37)).isoformat()}
+        for i in range(submissions)
+    ]
+    tables["test_submissions"] = [
+        {"id": f"ts{i}", "user_id": f"u{rng.randrange(users)}", "test_id": f"t{rng.randrange(courses)}",
+         "answers": {f"q{n}": rng.choice("ABCD") for n in range(10)}, "score": None, "created_at": (start + timedelta(seconds=i * 53)).isoformat()}
+        for i in range(submissions // 2)
+    ]
+    tables["project_submissions"] = []
+    tables["user_progress"] = [
+        {"id": f"up{i}", "user_id": f"u{i % users}", "lesson_id": f"l{rng.randrange(courses * lessons)}",
+         "completed_at": (start + timedelta(minutes=i)).isoformat()}
+        for i in range(submissions)
+    ]
+
+
+def serve(port: int, latency: float = 0.0, jitter: float = 0.0, max_rows: int = 1000, **sizes) -> ThreadingHTTPServer:
+    store = Store()
+    seed(store, **sizes)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(store, latency, jitter, max_rows))
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency", type=float, default=0.0, help="latence moyenne injectée par requête (ms)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="écart-type de la latence (ms)")
+    parser.add_argument("--max-rows", type=int, default=1000, help="lignes au plus par lecture (db-max-rows de PostgREST)")
+    parser.add_argument("--courses", type=int, default=10)
+    parser.add_argument("--submissions", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=500)
+    args = parser.parse_args()
+    server = serve(args.port, args.latency, args.jitter, args.max_rows, courses=args.courses, submissions=args.submissions, users=args.users)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
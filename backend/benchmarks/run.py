@@ -0,0 +1,280 @@
+"""Benchmark de l'API contre un PostgREST factice : débit et latences p50/p95/p99 par route.
+
+Lance le faux PostgREST (données générées, latence injectée) et l'application (uvicorn) dans des
+processus séparés, rejoue un mélange de trafic puis compare le résultat à une référence enregistrée.
+
+    python -m benchmarks.run --mix browse --duration 20 --concurrency 32
+    python -m benchmarks.run --mix mixed --save-baseline     # enregistre la référence
+    python -m benchmarks.run --mix mixed                     # échoue (code 1) en cas de régression
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+TEACHER = {"Authorization": "Bearer bench-teacher"}
+
+# Une étape = (nom de route, méthode, url, options httpx)
+Step = Tuple[str, str, str, Dict[str, Any]]
+
+
+class Scenario:
+    """Générateur de requêtes pondérées à partir des identifiants des données générées."""
+
+    def __init__(self, rng: random.Random, courses: int, lessons: int, exercises: int, submissions: int, users: int):
+        self.rng = rng
+        self.courses = courses
+        self.lessons = lessons
+        self.exercises = exercises
+        self.submissions = submissions
+        self.users = users
+
+    def _course(self) -> str:
+        return f"c{self.rng.randrange(self.courses)}"
+
+    def _user(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer u{self.rng.randrange(self.users)}"}
+
+    # --- navigation dans le catalogue ---
+    def courses_list(self) -> Step:
+        return "GET /courses", "GET", "/courses?fields=summary", {}
+
+    def course_tree(self) -> Step:
+        return "GET /courses/{id}/tree", "GET", f"/courses/{self._course()}/tree", {}
+
+    def course_tree_progress(self) -> Step:
+        return "GET /courses/{id}/tree?progress", "GET", f"/courses/{self._course()}/tree?progress=true", {"headers": self._user()}
+
+    def lesson(self) -> Step:
+        return "GET /lessons/{id}", "GET", f"/lessons/l{self.rng.randrange(self.courses * self.lessons)}", {"headers": {"Accept-Encoding": "gzip"}}
+
+    def exercises_list(self) -> Step:
+        return "GET /exercises", "GET", f"/exercises?course_id={self._course()}&fields=summary", {}
+
+    def tests_list(self) -> Step:
+        return "GET /tests", "GET", "/tests", {}
+
+    def dashboard(self) -> Step:
+        return "GET /dashboard/overview", "GET", "/dashboard/overview", {"headers": self._user()}
+
+    # --- rush de fin d'examen ---
+    def submit_test(self) -> Step:
+        test = self.rng.randrange(self.courses)
+        answers = {f"q{(test * 10 + n) % 200}": self.rng.choice("ABCD") for n in range(10)}
+        body = {"user_id": "ignored", "test_id": f"t{test}", "answers": answers}
+        return "POST /test_submissions", "POST", "/test_submissions", {"json": body, "headers": self._user()}
+
+    def submit_exercise(self) -> Step:
+        body = {"user_id": "ignored", "exercise_id": f"e{self.rng.randrange(self.courses * self.exercises)}", "code": "Sub A()\nEnd Sub", "output": self.rng.choice(["42", "41"])}
+        return "POST /submissions", "POST", "/submissions", {"json": body, "headers": self._user()}
+
+    def my_submissions(self) -> Step:
+        return "GET /submissions/me", "GET", "/submissions/me", {"headers": self._user()}
+
+    # --- correction par les enseignants ---
+    def grade_batch(self) -> Step:
+        ids = self.rng.sample(range(self.submissions), 50)
+        body = [{"id": f"s{i}", "score": self.rng.randrange(101), "feedback": "ok"} for i in ids]
+        return "PUT /submissions/grade", "PUT", "/submissions/grade", {"json": body, "headers": TEACHER}
+
+    def grade_one(self) -> Step:
+        return "PUT /submissions/{id}/grade", "PUT", f"/submissions/s{self.rng.randrange(self.submissions)}/grade?score=80&feedback=ok", {"headers": TEACHER}
+
+    def submission(self) -> Step:
+        return "GET /submissions/{id}", "GET", f"/submissions/s{self.rng.randrange(self.submissions)}", {"headers": TEACHER}
+
+    def export(self) -> Step:
+        return "GET /exports/submissions", "GET", f"/exports/submissions?format=ndjson&course_id={self._course()}", {"headers": TEACHER}
+
+
+MIXES: Dict[str, List[Tuple[str, int]]] = {
+    "browse": [("courses_list", 3), ("course_tree", 3), ("course_tree_progress", 1), ("lesson", 5), ("exercises_list", 2), ("tests_list", 1), ("dashboard", 1)],
+    "deadline": [("submit_test", 5), ("submit_exercise", 4), ("my_submissions", 1), ("dashboard", 1)],
+    "grading": [("grade_batch", 2), ("grade_one", 3), ("submission", 4), ("export", 1)],
+}
+MIXES["mixed"] = MIXES["browse"] + MIXES["deadline"] + [(name, max(1, weight // 2)) for name, weight in MIXES["grading"]]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(samples: Dict[str, List[float]], errors: Dict[str, int], elapsed: float) -> Dict[str, Any]:
+    routes = {}
+    for route, durations in sorted(samples.items()):
+        values = sorted(durations)
+        routes[route] = {
+            "count": len(values),
+            "errors": errors.get(route, 0),
+            "rps": round(len(values) / elapsed, 2),
+            "mean_ms": round(sum(values) / len(values), 2) if values else 0.0,
+            "p50_ms": round(percentile(values, 0.50), 2),
+            "p95_ms": round(percentile(values, 0.95), 2),
+            "p99_ms": round(percentile(values, 0.99), 2),
+        }
+    total = sum(len(v) for v in samples.values())
+    return {"elapsed_s": round(elapsed, 2), "requests": total, "errors": sum(errors.values()), "rps": round(total / elapsed, 2), "routes": routes}
+
+
+async def drive(base_url: str, mix: str, duration: float, concurrency: int, scenario: Scenario, warmup: float) -> Dict[str, Any]:
+    names, weights = zip(*MIXES[mix])
+    steps: List[Callable[[], Step]] = [getattr(scenario, name) for name in names]
+    samples: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        async def user(deadline: float, record: bool):
+            while time.perf_counter() < deadline:
+                route, method, url, options = scenario.rng.choices(steps, weights)[0]()
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, url, **options)
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                if record:
+                    samples.setdefault(route, []).append((time.perf_counter() - started) * 1000)
+                    if failed:
+                        errors[route] = errors.get(route, 0) + 1
+
+        if warmup:
+            deadline = time.perf_counter() + warmup
+            await asyncio.gather(*(user(deadline, False) for _ in range(concurrency)))
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(user(deadline, True) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return summarize(samples, errors, elapsed)
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], threshold: float, min_delta_ms: float) -> List[str]:
+    """Régressions : p95 d'une route ou débit global dégradés au-delà du seuil (et d'un écart absolu minimal)."""
+    regressions = []
+    if result["rps"] < baseline["rps"] * (1 - threshold):
+        regressions.append(f"débit global {result['rps']} req/s < référence {baseline['rps']} req/s")
+    for route, stats in result["routes"].items():
+        reference = baseline["routes"].get(route)
+        if reference is None:
+            continue
+        limit = max(reference["p95_ms"] * (1 + threshold), reference["p95_ms"] + min_delta_ms)
+        if stats["p95_ms"] > limit:
+            regressions.append(f"{route} : p95 {stats['p95_ms']} ms > référence {reference['p95_ms']} ms")
+        if stats["errors"] > reference["errors"] and stats["errors"] / max(1, stats["count"]) > 0.01:
+            regressions.append(f"{route} : {stats['errors']} erreurs (référence {reference['errors']})")
+    return regressions
+
+
+def print_report(result: Dict[str, Any], baseline: Optional[Dict[str, Any]]):
+    header = f"{'route':38} {'n':>7} {'err':>5} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'p95 réf':>8}"
+    print(header)
+    print("-" * len(header))
+    for route, stats in result["routes"].items():
+        reference = (baseline or {}).get("routes", {}).get(route, {}).get("p95_ms", "")
+        print(f"{route:38} {stats['count']:>7} {stats['errors']:>5} {stats['rps']:>8} {stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8} {reference:>8}")
+    print(f"\n{result['requests']} requêtes en {result['elapsed_s']} s : {result['rps']} req/s, {result['errors']} erreurs")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(url: str, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} ne répond pas")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mix", choices=sorted(MIXES), default="mixed")
+    parser.add_argument("--duration", type=float, default=20, help="durée mesurée (s)")
+    parser.add_argument("--warmup", type=float, default=3, help="échauffement non mesuré (s)")
+    parser.add_argument("--concurrency", type=int, default=32, help="utilisateurs virtuels simultanés")
+    parser.add_argument("--latency", type=float, default=5, help="latence Supabase injectée (ms)")
+    parser.add_argument("--jitter", type=float, default=1, help="écart-type de la latence injectée (ms)")
+    parser.add_argument("--courses", type=int, default=10)
+    parser.add_argument("--submissions", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=1, help="workers uvicorn")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="enregistre ce résultat comme référence du mélange")
+    parser.add_argument("--threshold", type=float, default=0.2, help="dégradation tolérée (0.2 = 20 %%)")
+    parser.add_argument("--min-delta", type=float, default=2.0, help="écart absolu de p95 ignoré (ms)")
+    parser.add_argument("--output", type=Path, help="écrit le résultat JSON dans ce fichier")
+    args = parser.parse_args()
+
+    fake_port, app_port = _free_port(), _free_port()
+    env = {
+        **os.environ,
+        "SUPABASE_URL": f"http://127.0.0.1:{fake_port}",
+        "SUPABASE_KEY": "bench",
+        "AUTH_DEV_TOKENS": "true",
+        "AUTH_DEV_TEACHER_TOKEN": TEACHER["Authorization"].split(" ", 1)[1],
+    }
+    env.pop("DATABASE_URL", None)
+    fake = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_postgrest", "--port", str(fake_port), "--latency", str(args.latency), "--jitter", str(args.jitter),
+         "--courses", str(args.courses), "--submissions", str(args.submissions), "--users", str(args.users)],
+        cwd=BACKEND_DIR,
+    )
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(app_port), "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    try:
+        _wait_ready(f"http://127.0.0.1:{fake_port}/rest/v1/courses?limit=1")
+        _wait_ready(f"http://127.0.0.1:{app_port}/ping")
+        scenario = Scenario(random.Random(args.seed), args.courses, 12, 8, args.submissions, args.users)
+        result = asyncio.run(drive(f"http://127.0.0.1:{app_port}", args.mix, args.duration, args.concurrency, scenario, args.warmup))
+    finally:
+        for process in (app, fake):
+            process.terminate()
+        for process in (app, fake):
+            process.wait(timeout=10)
+
+    result["config"] = {key: getattr(args, key) for key in ("mix", "duration", "concurrency", "latency", "jitter", "courses", "submissions", "workers")}
+    baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    baseline = baselines.get(args.mix)
+    print_report(result, baseline)
+    if args.output:
+        args.output.write_text(json.dumps(result, indent=2))
+    if args.save_baseline:
+        baselines[args.mix] = result
+        args.baseline.write_text(json.dumps(baselines, indent=2, ensure_ascii=False) + "\n")
+        print(f"Référence « {args.mix} » enregistrée dans {args.baseline}")
+        return 0
+    if baseline is None:
+        print(f"Aucune référence « {args.mix} » : lancer avec --save-baseline pour en créer une")
+        return 0
+    if baseline.get("config") != result["config"]:
+        print("Attention : configuration différente de celle de la référence")
+    regressions = compare(result, baseline, args.threshold, args.min_delta)
+    for regression in regressions:
+        print(f"RÉGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
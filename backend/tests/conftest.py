@@ -0,0 +1,30 @@
+import os
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from benchmarks.fake_postgrest import Store, make_handler
+
+# Tests hors ligne : backend SQLite et jetons de développement, fixés avant l'import de l'application
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", os.path.join(tempfile.mkdtemp(), "vba.sqlite3"))
+os.environ.setdefault("AUTH_DEV_TOKENS", "true")
+
+
+@pytest.fixture
+def postgrest():
+    """Faux PostgREST plafonné à 1000 lignes par lecture (db-max-rows), comme Supabase : (tables, fabrique de repository)."""
+    from app.services.repository import PostgrestRepository
+
+    store = Store()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(store, 0.0, 0.0, max_rows=1000))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/rest/v1"
+    # Un client HTTP par appel : chaque test crée sa propre boucle d'événements
+    yield store.tables, lambda: PostgrestRepository(httpx.AsyncClient(), url, "test-key")
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,51 @@
+import asyncio
+import hashlib
+import time
+
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services import auth
+
+SECRET = "secret-de-test-suffisamment-long-pour-hs256"
+
+
+@pytest.fixture(autouse=True)
+def hs256(monkeypatch):
+    monkeypatch.setattr(auth, "SUPABASE_JWT_SECRET", SECRET)
+    monkeypatch.setattr(auth, "JWT_LEEWAY", 0)
+    auth.claims_cache.clear()
+
+
+def token(expires_in, **claims):
+    payload = {"sub": "u1", "aud": "authenticated", "exp": int(time.time()) + expires_in, **claims}
+    return jwt.encode(payload, SECRET, algorithm="HS256")
+
+
+def test_valid_token_maps_role_from_app_metadata():
+    claims = asyncio.run(auth.verify_token(token(60, app_metadata={"role": "teacher"})))
+    assert auth.user_from_claims(claims) == {"user_id": "u1", "email": None, "role": "teacher"}
+
+
+def test_expired_token_is_rejected():
+    with pytest.raises(auth.AuthError):
+        asyncio.run(auth.verify_token(token(-5)))
+
+
+def test_cached_claims_expire_with_the_token():
+    short = token(1)
+    asyncio.run(auth.verify_token(short))
+    assert auth.claims_cache.get(hashlib.sha256(short.encode()).hexdigest())[0]
+    time.sleep(1.1)
+    # L'entrée du cache expire avec le jeton : nouvelle vérification, qui échoue
+    with pytest.raises(auth.AuthError):
+        asyncio.run(auth.verify_token(short))
+
+
+def test_expired_token_gets_401():
+    from app.main import app
+
+    with TestClient(app) as client:
+        response = client.get("/user_progress/me", headers={"Authorization": f"Bearer {token(-5)}"})
+    assert response.status_code == 401 and response.headers["www-authenticate"] == "Bearer"
@@ -0,0 +1,35 @@
+import asyncio
+
+from app.services.bulk import bulk_grade
+from app.services.sqlite_repository import SQLiteRepository
+
+
+def test_bulk_grade_sends_one_update_per_distinct_grade(tmp_path):
+    async def scenario():
+        repository = SQLiteRepository(str(tmp_path / "vba.sqlite3"), threads=1)
+        try:
+            rows = [{"user_id": f"u{i}", "exercise_id": "e1", "code": f"code {i}", "score": None} for i in range(150)]
+            inserted = (await repository.table("submissions").insert(rows).execute()).data
+            updates = []
+            execute = repository.execute
+
+            async def counting_execute(query):
+                if query.operation == "update":
+                    updates.append(query)
+                return await execute(query)
+
+            repository.execute = counting_execute
+            grades = [{"id": row["id"], "score": [0, 50, 100][i % 3], "feedback": ""} for i, row in enumerate(inserted)]
+            grades.append({"id": "inconnue", "score": 100, "feedback": ""})
+            result = await bulk_grade(repository, "submissions", grades, chunk_size=100)
+            stored = (await repository.table("submissions").select("id,score,code").execute()).data
+            return result, updates, stored
+        finally:
+            await repository.close()
+
+    result, updates, stored = asyncio.run(scenario())
+    # 2 paquets x 3 notes distinctes
+    assert len(updates) == 6
+    assert result["graded"] == 150 and [item["status"] for item in result["results"]][-1] == "not_found"
+    by_code = {row["code"]: row["score"] for row in stored}
+    assert all(by_code[f"code {i}"] == [0, 50, 100][i % 3] for i in range(150))
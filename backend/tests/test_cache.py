@@ -0,0 +1,84 @@
+import asyncio
+
+from app.services import cache as cache_module
+from app.services.cache import KeyedLocks, TTLCache, row_tag, scope_tag
+
+
+def test_invalidate_drops_only_tagged_entries():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("lesson", 1, tags=[row_tag("lessons", "l1"), scope_tag("lessons", "c1")])
+    cache.set("course", 2, tags=[row_tag("courses", "c1")])
+
+    assert cache.invalidate(scope_tag("lessons", "c1")) == 1
+    assert cache.get("lesson") == (False, None)
+    assert cache.get("course") == (True, 2)
+
+
+def test_entries_expire_and_lru_evicts(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=5)
+    cache.get("a")
+    cache.set("c", 3)
+    # b, le moins récemment utilisé, est évincé
+    assert cache.get("b") == (False, None) and cache.evictions == 1
+    now[0] += 11
+    assert cache.get("a") == (False, None)
+
+
+def test_concurrent_loads_share_one_loader():
+    calls = []
+
+    async def scenario():
+        cache = TTLCache(maxsize=10, ttl=60)
+
+        async def load():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "valeur", []
+
+        values = await asyncio.gather(*(cache.get_or_load("k", load) for _ in range(5)))
+        # Deuxième passage : servi depuis le cache
+        values.append(await cache.get_or_load("k", load))
+        return values, cache
+
+    values, cache = asyncio.run(scenario())
+    assert values == ["valeur"] * 6 and len(calls) == 1
+    assert (cache.misses, cache.coalesced, cache.hits) == (1, 4, 1)
+
+
+def test_invalidation_during_load_is_not_cached():
+    async def scenario():
+        cache = TTLCache(maxsize=10, ttl=60)
+
+        async def load():
+            # Écriture concurrente pendant la lecture : la valeur lue est peut-être déjà périmée
+            cache.invalidate(row_tag("courses", "c1"))
+            return "ancienne", [row_tag("courses", "c1")]
+
+        value = await cache.get_or_load("k", load)
+        return value, cache.get("k")
+
+    assert asyncio.run(scenario()) == ("ancienne", (False, None))
+
+
+def test_keyed_locks_serialize_per_key_and_are_released():
+    async def scenario():
+        locks = KeyedLocks()
+        order = []
+
+        async def worker(key, name):
+            async with locks.hold(key):
+                order.append(f"{name}+")
+                await asyncio.sleep(0.01)
+                order.append(f"{name}-")
+
+        await asyncio.gather(worker("u1", "a"), worker("u1", "b"), worker("u2", "c"))
+        return order, len(locks)
+
+    order, remaining = asyncio.run(scenario())
+    assert order.index("a-") < order.index("b+")
+    assert order.index("c+") < order.index("a-")
+    assert remaining == 0
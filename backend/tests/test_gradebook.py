@@ -0,0 +1,37 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.services.cache import catalog_cache
+from app.services.gradebook import build_gradebook
+
+
+def test_gradebook_reads_every_attempt_past_upstream_row_cap(postgrest):
+    tables, make_repository = postgrest
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    tables["courses"] = [{"id": "c1", "title": "VBA"}]
+    tables["exercises"] = [{"id": "e1", "title": "Boucles", "course_id": "c1", "is_hidden": False, "created_at": start.isoformat()}]
+    tables["tests"] = []
+    tables["test_submissions"] = []
+    # 2500 élèves, une tentative notée chacun : au-delà des 1000 lignes par réponse de PostgREST
+    scores = [i % 101 for i in range(2500)]
+    tables["submissions"] = [
+        {"id": f"s{i:05d}", "user_id": f"u{i:05d}", "exercise_id": "e1", "score": score, "created_at": (start + timedelta(seconds=i)).isoformat()}
+        for i, score in enumerate(scores)
+    ]
+    catalog_cache.clear()
+
+    async def build():
+        repository = make_repository()
+        try:
+            return await build_gradebook(repository, "c1")
+        finally:
+            await repository.close()
+
+    gradebook = asyncio.run(build())
+    stats = gradebook["stats"][0]
+    assert len(gradebook["students"]) == 2500
+    assert stats["graded"] == 2500
+    assert stats["median"] == round(float(np.median(scores)), 2)
+    assert stats["mean"] == round(float(np.mean(scores)), 2)
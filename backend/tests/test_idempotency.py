@@ -0,0 +1,47 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    from app.main import app
+    from app.services import supabase_client
+    from app.services.idempotency import idempotency_store
+
+    monkeypatch.setattr(supabase_client, "SQLITE_PATH", os.path.join(str(tmp_path), "api.sqlite3"))
+    idempotency_store.clear()
+    with TestClient(app) as client:
+        yield client
+
+
+def teacher(key):
+    from app.services import auth
+
+    return {"Authorization": f"Bearer {auth.AUTH_DEV_TEACHER_TOKEN}", "Idempotency-Key": key}
+
+
+def test_retry_replays_the_stored_response(client):
+    first = client.post("/courses", json={"title": "VBA"}, headers=teacher("k1"))
+    retry = client.post("/courses", json={"title": "VBA"}, headers=teacher("k1"))
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json() and retry.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+    assert [row["id"] for row in client.get("/courses").json()] == [first.json()["id"]]
+
+
+def test_key_reused_for_another_request_is_rejected(client):
+    assert client.post("/courses", json={"title": "VBA"}, headers=teacher("k2")).status_code == 201
+    assert client.post("/courses", json={"title": "Excel"}, headers=teacher("k2")).status_code == 422
+    assert client.post("/courses?draft=1", json={"title": "VBA"}, headers=teacher("k2")).status_code == 422
+    # Autre appelant : espace de clés distinct
+    other = {"Authorization": "Bearer u1", "Idempotency-Key": "k2"}
+    assert client.post("/courses", json={"title": "VBA"}, headers=other).status_code == 403
+
+
+def test_key_is_ignored_without_token(client):
+    responses = [client.post("/courses", json={"title": "VBA"}, headers={"Idempotency-Key": "k3"}) for _ in range(2)]
+    assert [response.status_code for response in responses] == [401, 401]
+    assert all("idempotent-replayed" not in response.headers for response in responses)
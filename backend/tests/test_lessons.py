@@ -0,0 +1,35 @@
+import os
+
+from fastapi.testclient import TestClient
+
+
+def test_reorder_keeps_concurrent_content_edits(tmp_path, monkeypatch):
+    from app.main import app
+    from app.services import auth, supabase_client
+
+    monkeypatch.setattr(supabase_client, "SQLITE_PATH", os.path.join(str(tmp_path), "api.sqlite3"))
+    teacher = {"Authorization": f"Bearer {auth.AUTH_DEV_TEACHER_TOKEN}"}
+    with TestClient(app) as client:
+        course_id = client.post("/courses", json={"title": "VBA"}, headers=teacher).json()["id"]
+        lessons = [
+            client.post("/lessons", json={"title": f"L{i}", "content": "v1", "course_id": course_id, "order_index": i}, headers=teacher).json()["id"]
+            for i in range(3)
+        ]
+        repository = supabase_client.get_repository()
+        execute = repository.execute
+
+        async def edit_after_read(query):
+            response = await execute(query)
+            if query.table == "lessons" and query.operation == "select" and ("course_id", f"eq.{course_id}") in query.build_params():
+                # Modification de contenu arrivée entre la lecture et l'écriture du réordonnancement
+                await execute(repository.table("lessons").update({"content": "v2"}).eq("id", lessons[0]))
+            return response
+
+        monkeypatch.setattr(repository, "execute", edit_after_read)
+        reordered = client.put(f"/courses/{course_id}/lessons/order", json={"lesson_ids": list(reversed(lessons))}, headers=teacher)
+        assert reordered.json() == {"success": True, "updated": 2}
+        monkeypatch.setattr(repository, "execute", execute)
+
+        rows = client.get(f"/courses/{course_id}/lessons").json()
+        assert [row["id"] for row in rows] == list(reversed(lessons))
+        assert client.get(f"/lessons/{lessons[0]}").json()["content"] == "v2"
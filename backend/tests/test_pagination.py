@@ -0,0 +1,72 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.services.export import fetch_chunks
+from app.services.pagination import fetch_all
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def seed_submissions(tables, count):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    tables["submissions"] = [
+        {"id": f"s{i:05d}", "user_id": f"u{i % 7}", "exercise_id": "e1", "score": i % 101, "created_at": (start + timedelta(seconds=i)).isoformat()}
+        for i in range(count)
+    ]
+
+
+def test_export_chunks_go_past_upstream_row_cap(postgrest):
+    tables, make_repository = postgrest
+    seed_submissions(tables, 2500)
+
+    async def export():
+        repository = make_repository()
+        try:
+            # Taille demandée au-dessus du plafond : bornée pour que la ligne de plus tienne sous les 1000 lignes
+            return [chunk async for chunk in fetch_chunks(lambda: repository.table("submissions").select("id,created_at"), chunk_size=1000)]
+        finally:
+            await repository.close()
+
+    chunks = run(export())
+    ids = [row["id"] for chunk in chunks for row in chunk]
+    assert len(ids) == 2500 and len(set(ids)) == 2500
+    assert max(len(chunk) for chunk in chunks) < 1000
+
+
+def test_fetch_all_goes_past_upstream_row_cap(postgrest):
+    tables, make_repository = postgrest
+    seed_submissions(tables, 2500)
+
+    async def read():
+        repository = make_repository()
+        try:
+            return await fetch_all(lambda: repository.table("submissions").select("id").eq("user_id", "u3"), page_size=1000)
+        finally:
+            await repository.close()
+
+    rows = run(read())
+    assert sorted(row["id"] for row in rows) == sorted(row["id"] for row in tables["submissions"] if row["user_id"] == "u3")
+
+
+def test_dashboard_rebuild_counts_every_row(postgrest):
+    from app.services.dashboard_summary import SummaryStore
+
+    tables, make_repository = postgrest
+    seed_submissions(tables, 1500)
+    for row in tables["submissions"]:
+        row["user_id"] = "u1"
+    tables["user_progress"] = []
+    tables["test_submissions"] = []
+
+    async def rebuild():
+        repository = make_repository()
+        try:
+            return await SummaryStore().rebuild(repository, "u1")
+        finally:
+            await repository.close()
+
+    summary = run(rebuild())
+    assert len(summary.scores) == 1500
+    assert summary.average_score == round(sum(i % 101 for i in range(1500)) / 1500, 2)
@@ -0,0 +1,56 @@
+import os
+
+from fastapi.testclient import TestClient
+
+
+def test_summary_survives_catalog_edits_without_rescanning(tmp_path, monkeypatch):
+    from app.main import app
+    from app.services import auth, progress_summary, supabase_client
+
+    monkeypatch.setattr(supabase_client, "SQLITE_PATH", os.path.join(str(tmp_path), "api.sqlite3"))
+    progress_summary.lesson_index_cache.clear()
+    store = progress_summary.ProgressStore()
+    monkeypatch.setattr(progress_summary, "progress_store", store)
+    monkeypatch.setattr("app.api.user_progress.progress_store", store)
+    # Compte les lectures de user_progress (reconstructions des masques)
+    scans = []
+    fetch_all = progress_summary.fetch_all
+
+    async def counting_fetch_all(build_query, *args, **kwargs):
+        if build_query().table == "user_progress":
+            scans.append(1)
+        return await fetch_all(build_query, *args, **kwargs)
+
+    monkeypatch.setattr(progress_summary, "fetch_all", counting_fetch_all)
+
+    teacher = {"Authorization": f"Bearer {auth.AUTH_DEV_TEACHER_TOKEN}"}
+    student = {"Authorization": "Bearer u1"}
+    with TestClient(app) as client:
+        course_id = client.post("/courses", json={"title": "VBA"}, headers=teacher).json()["id"]
+        lessons = [
+            client.post("/lessons", json={"title": f"L{i}", "course_id": course_id, "order_index": i}, headers=teacher).json()["id"]
+            for i in range(3)
+        ]
+        client.post("/user_progress", json={"user_id": "u1", "lesson_id": lessons[0]}, headers=student)
+
+        def summary():
+            courses = client.get("/user_progress/me/summary", headers=student).json()["courses"]
+            return {key: courses[0][key] for key in ("completed_lessons", "total_lessons", "next_lesson_id")}
+
+        assert summary() == {"completed_lessons": 1, "total_lessons": 3, "next_lesson_id": lessons[1]}
+        index = progress_summary.lesson_index_cache.get(("course", course_id))[1]
+
+        # Modification de contenu : l'index du cours est conservé
+        client.put(f"/lessons/{lessons[1]}", json={"title": "L1 bis", "course_id": course_id, "order_index": 1}, headers=teacher)
+        assert progress_summary.lesson_index_cache.get(("course", course_id))[1] is index
+
+        # Réordonnancement, masquage et nouvelle leçon : masques recalculés en mémoire
+        client.put(f"/courses/{course_id}/lessons/order", json={"lesson_ids": [lessons[2], lessons[0], lessons[1]]}, headers=teacher)
+        assert summary() == {"completed_lessons": 1, "total_lessons": 3, "next_lesson_id": lessons[2]}
+        client.delete(f"/lessons/{lessons[2]}", headers=teacher)
+        assert summary() == {"completed_lessons": 1, "total_lessons": 2, "next_lesson_id": lessons[1]}
+        extra = client.post("/lessons", json={"title": "L3", "course_id": course_id, "order_index": 5}, headers=teacher).json()["id"]
+        client.post("/user_progress", json={"user_id": "u1", "lesson_id": extra}, headers=student)
+        assert summary() == {"completed_lessons": 2, "total_lessons": 3, "next_lesson_id": lessons[1]}
+
+    assert len(scans) == 1
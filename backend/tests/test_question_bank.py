@@ -0,0 +1,40 @@
+import asyncio
+import os
+
+from fastapi.testclient import TestClient
+
+from app.services.question_pool import QuestionPool
+
+
+def test_sample_hides_answers_from_non_teachers(tmp_path, monkeypatch):
+    from app.main import app
+    from app.services import auth, supabase_client
+    from app.services.question_pool import question_pool
+
+    monkeypatch.setattr(supabase_client, "SQLITE_PATH", os.path.join(str(tmp_path), "api.sqlite3"))
+    question_pool.invalidate()
+    teacher = {"Authorization": f"Bearer {auth.AUTH_DEV_TEACHER_TOKEN}"}
+    with TestClient(app) as client:
+        created = client.post("/question_bank", json={"question": "1 + 1 ?", "type": "text", "answer": "2"}, headers=teacher)
+        assert created.status_code == 201
+
+        for headers in ({}, {"Authorization": "Bearer u1"}):
+            for path in ("/question_bank/sample", "/question_bank"):
+                rows = client.get(path, headers=headers).json()
+                assert [row["question"] for row in rows] == ["1 + 1 ?"] and "answer" not in rows[0]
+        assert client.get("/question_bank/sample", headers=teacher).json()[0]["answer"] == "2"
+
+
+def test_pool_loads_the_whole_bank_past_upstream_row_cap(postgrest):
+    tables, make_repository = postgrest
+    tables["question_bank"] = [{"id": f"q{i:05d}", "type": "qcm" if i % 3 else "text"} for i in range(2500)]
+
+    async def load():
+        repository = make_repository()
+        try:
+            return await QuestionPool().buckets(repository)
+        finally:
+            await repository.close()
+
+    buckets = asyncio.run(load())
+    assert {t: len(ids) for t, ids in buckets.items()} == {"text": 834, "qcm": 1666}
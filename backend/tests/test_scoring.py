@@ -0,0 +1,35 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.services.scoring import rescore_test
+
+
+def test_rescore_updates_only_scores_past_upstream_row_cap(postgrest):
+    tables, make_repository = postgrest
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    tables["tests"] = [{"id": "t1", "question_ids": ["q1", "q2"]}]
+    tables["question_bank"] = [
+        {"id": "q1", "choices": ["A", "B", "C"], "answer": "B"},
+        {"id": "q2", "choices": ["oui", "non"], "answer": "oui"},
+    ]
+    # 2500 soumissions notées avec un ancien corrigé (score 0) : au-delà des 1000 lignes par réponse de PostgREST
+    tables["test_submissions"] = [
+        {"id": f"ts{i:05d}", "user_id": f"u{i}", "test_id": "t1", "answers": {"q1": "ABC"[i % 3], "q2": 0}, "score": 0,
+         "feedback": "relu", "created_at": (start + timedelta(seconds=i)).isoformat()}
+        for i in range(2500)
+    ]
+
+    async def rescore():
+        repository = make_repository()
+        try:
+            return await rescore_test(repository, "t1")
+        finally:
+            await repository.close()
+
+    stats, updated = asyncio.run(rescore())
+    assert stats["scored"] == 2500
+    expected = {f"ts{i:05d}": 100 if i % 3 == 1 else 50 for i in range(2500)}
+    assert {row["id"]: row["score"] for row in tables["test_submissions"]} == expected
+    assert stats["updated"] == len(updated) == 2500
+    # Colonnes non lues par le recalcul : intactes
+    assert all(row["feedback"] == "relu" for row in tables["test_submissions"])
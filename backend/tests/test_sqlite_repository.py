@@ -0,0 +1,63 @@
+import asyncio
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services.sqlite_repository import SQLiteRepository
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+@pytest.fixture
+def repository(tmp_path):
+    repository = SQLiteRepository(str(tmp_path / "vba.sqlite3"), threads=1)
+    yield repository
+    run(repository.close())
+
+
+def test_insert_fills_schema_defaults(repository):
+    inserted = run(repository.table("courses").insert({"title": "VBA"}).execute())
+    row = inserted.data[0]
+    assert row["id"] and row["created_at"]
+    assert row["is_hidden"] is False and row["is_published"] is False
+
+
+def test_inserted_rows_are_listed_by_visibility_filters(repository):
+    course = run(repository.table("courses").insert({"title": "VBA"}).execute()).data[0]
+    run(repository.table("exercises").insert({"title": "Boucles", "course_id": course["id"], "type": "code"}).execute())
+
+    courses = run(repository.table("courses").select("*").eq("is_hidden", False).execute())
+    exercises = run(repository.table("exercises").select("*").eq("course_id", course["id"]).eq("is_hidden", False).execute())
+    assert [row["id"] for row in courses.data] == [course["id"]]
+    assert [row["title"] for row in exercises.data] == ["Boucles"]
+
+
+def test_upsert_keeps_existing_columns(repository):
+    row = run(repository.table("lessons").insert({"title": "Intro", "course_id": "c1", "is_hidden": True}).execute()).data[0]
+    run(repository.table("lessons").upsert({"id": row["id"], "title": "Introduction"}, on_conflict="id").execute())
+    stored = run(repository.table("lessons").select("*").eq("id", row["id"]).single().execute()).data
+    assert stored["title"] == "Introduction" and stored["is_hidden"] is True
+
+
+def test_api_create_then_list(tmp_path, monkeypatch):
+    # Application complète sur le backend SQLite (voir conftest.py), base propre à ce test
+    from app.main import app
+    from app.services import auth, supabase_client
+
+    monkeypatch.setattr(supabase_client, "SQLITE_PATH", os.path.join(str(tmp_path), "api.sqlite3"))
+
+    teacher = {"Authorization": f"Bearer {auth.AUTH_DEV_TEACHER_TOKEN}"}
+    with TestClient(app) as client:
+        course = client.post("/courses", json={"title": "VBA"}, headers=teacher)
+        assert course.status_code == 201
+        course_id = course.json()["id"]
+        exercise = client.post(
+            "/exercises", json={"title": "Boucles", "description": "", "course_id": course_id, "type": "code"}, headers=teacher
+        )
+        assert exercise.status_code == 201
+
+        assert [row["id"] for row in client.get("/courses").json()] == [course_id]
+        assert [row["title"] for row in client.get("/exercises", params={"course_id": course_id}).json()] == ["Boucles"]
@@ -0,0 +1,40 @@
+import asyncio
+
+from app.services.sqlite_repository import SQLiteRepository
+from app.services.write_behind import WriteBuffer
+
+
+def test_fallback_after_log_failure_replays_without_duplicate(tmp_path):
+    async def scenario():
+        repository = SQLiteRepository(str(tmp_path / "vba.sqlite3"), threads=1)
+        directory = str(tmp_path / "write_behind")
+        try:
+            crashed = WriteBuffer(directory)
+            await crashed.start(repository)
+
+            async def failing_fsync():
+                # Ligne déjà écrite dans le journal, mais la synchronisation échoue
+                crashed._log.flush()
+                crashed._sync_task = None
+                raise OSError("disque plein")
+
+            crashed._fsync = failing_fsync
+            data = crashed.prepare("submissions", {"user_id": "u1", "exercise_id": "e1", "code": "Sub A()"})
+            assert await crashed.append("submissions", data) is None
+            # Repli de l'appelant : écriture directe de la ligne préparée (même identifiant que dans le journal)
+            await repository.table("submissions").insert(data).execute()
+            # Arrêt brutal : journal laissé sur disque, verrou relâché
+            crashed._flusher.cancel()
+            crashed._log.close()
+
+            survivor = WriteBuffer(directory)
+            replayed = await survivor.start(repository)
+            await survivor.stop()
+            rows = (await repository.table("submissions").select("id").execute()).data
+            return data, replayed, rows
+        finally:
+            await repository.close()
+
+    data, replayed, rows = asyncio.run(scenario())
+    assert [entry.row["id"] for entry in replayed] == [data["id"]]
+    assert [row["id"] for row in rows] == [data["id"]]